@@ -1,9 +1,9 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.jobstores.base import JobLookupError
 import time
 import pytz
-from datetime import datetime
+from datetime import datetime, timedelta
 from binance.um_futures import UMFutures
 from dotenv import load_dotenv
 import os
@@ -13,21 +13,62 @@ from decimal import Decimal, ROUND_DOWN
 from decimal import Decimal, ROUND_HALF_UP
 from telegram_bot import enviar_telegram
 from reportes import verificar_salida_programada
+from libro_trades import libro_trades
+from diario import diario, formatear_digesto, ZONA_AR
+from stream_usuario import StreamUsuario
+from filtros import ServicioFiltros, MANTENIMIENTO_DEFECTO
+from posiciones import GestorPosiciones, PENDIENTE_ENTRADA, EJECUTADA, PROTEGIDA, CERRADA, CANCELADA
+from persistencia import AlmacenEstado
+from coordinacion import Liderazgo
+from ejecutor import EjecutorSenales, Senal, nuevo_id
+from idempotencia import IndiceIdempotencia, clave_senal
+from cuenta import CacheCuenta
+from metricas import metricas, ClienteInstrumentado
+from cliente_binance import ClienteBinance, es_reintentable, espera_reintento
+from mercado import MercadoLocal, GuardiaEntrada
+from temporizador import Temporizador
+from exposicion import MonitorExposicion
+from riesgo import MotorRiesgo
+from stops import GestorStops
+import estrategia
+from requests.adapters import HTTPAdapter
+import queue
 import logging
-import sys
+import registro
+import threading
+from collections import deque
+
+# Inicio del import del módulo: para medir el arranque en frío
+inicio_import = time.perf_counter()
 
 app = Flask(__name__)
 
-estado_orden = {
-    "activa": False,
-    "order_id": None,
-    "timestamp_inicio": None,
-    "symbol": None,
-    "side": None,
-    "qty": None,
-    "sl_distance": None,
-    "tp_factor": None
-}
+# Serializa el reporte de salidas (stream y monitor pueden detectar la misma)
+lock_salidas = threading.Lock()
+
+# Serializa los reemplazos del SL (trailing y ajuste de cantidad por TPs ejecutados)
+lock_stop = threading.Lock()
+
+# Fills que llegaron por stream antes de que la posición quedara registrada
+fills_sin_posicion = deque(maxlen=100)
+
+# Salidas avisadas por stream que todavía no se pudieron reportar: symbol -> {orderId}
+salidas_pendientes = {}
+
+# Con más símbolos que esto conviene una sola consulta de órdenes abiertas de toda la cuenta
+MAX_SIMBOLOS_CONSULTA_INDIVIDUAL = 10
+
+# Espera entre intentos del cierre de emergencia de una posición que quedó sin SL
+REINTENTO_CIERRE_MS = 5000
+
+# Binance exige que goodTillDate esté al menos 600 s en el futuro
+GTD_MINIMO_MS = 600 * 1000
+# Con GTD la alarma local queda de respaldo, un poco después del vencimiento en Binance
+GRACIA_GTD_MS = 2000
+
+# Vencimiento de las entradas pendientes: una alarma por orden, sin polling
+vencimientos = Temporizador("vencimientos")
+
 # Silenciar logs de apscheduler
 logging.getLogger('apscheduler').setLevel(logging.WARNING)
 
@@ -36,11 +77,7 @@ scheduler = BackgroundScheduler()
 
 
 # === Funciones auxiliares ===
-logging.basicConfig(
-    level=logging.INFO,  # nivel mínimo de logs a mostrar (INFO y superiores)
-    format='%(asctime)s - %(levelname)s - %(message)s',  # formato con fecha, nivel y mensaje
-    handlers=[logging.StreamHandler(sys.stdout)]  # salida a consola, que Render captura
-)
+registro.configurar()
 
 logger = logging.getLogger()
 
@@ -50,11 +87,6 @@ def obtener_fecha_hora_arg():
     return datetime.now(zona_ar).strftime("%Y-%m-%d %H:%M:%S")
 
 
-def ajustar_precision(valor, tick_size_str):
-    tick = Decimal(tick_size_str)
-    return float((Decimal(str(valor)) / tick).to_integral_value(rounding=ROUND_HALF_UP) * tick)
-
-
 # Ruta al .env
 dotenv_path = os.path.join(os.getcwd(), ".env")
 
@@ -66,80 +98,208 @@ api_key = os.getenv("BINANCE_API_KEY")
 api_secret = os.getenv("BINANCE_API_SECRET")
 webhook_secret = os.getenv("WEBHOOK_SECRET")
 base_url = os.getenv("BINANCE_BASE_URL")
+ws_url = os.getenv("BINANCE_WS_URL", "wss://fstream.binance.com")
+usar_stream = os.getenv("USAR_STREAM_USUARIO", "1") != "0"
+# ENTRADA_GTD=1: la entrada se envía con timeInForce GTD y Binance la da de baja al vencer
+usar_gtd = os.getenv("ENTRADA_GTD", "0") == "1"
+# Escalera de TP por defecto, p. ej. "0.5@1,0.3@2" (50% a 1R, 30% a 2R, el resto queda con el SL, que sigue al precio si STOP_TRAILING_R está activo);
+# vacío = un solo TP por toda la posición a tp_factor. La señal puede mandar su propia `tp_escalera`
+escalera_tp = os.getenv("TP_ESCALERA", "")
+# Hora (Argentina) del resumen diario por Telegram; vacío lo desactiva
+hora_digesto = os.getenv("DIGESTO_HORA", "23:55")
+ruta_lock_lider = os.getenv("LOCK_LIDER", "bot.lock")
+# "cola": el webhook responde al instante y ejecuta en segundo plano | "sincrono": como antes
+modo_webhook = os.getenv("WEBHOOK_MODO", "cola")
+# Hilos que ejecutan señales de la cola (las de un mismo símbolo siempre van de a una y en orden)
+hilos_ejecutor = int(os.getenv("EJECUTOR_HILOS", "4"))
+
+# Segundos que una señal espera a que termine el warm-up antes de rechazarse
+espera_arranque = float(os.getenv("ESPERA_ARRANQUE_S", "30"))
 
-# Leer e imprimir
-if os.getenv("BINANCE_API_KEY"):
-    logger.info("🔑 BINANCE_API_KEY cargada correctamente.")
-else:
-    logger.error("❌ BINANCE_API_KEY no encontrada.")
 
-if os.getenv("BINANCE_API_SECRET"):
-    logger.info("🔐 BINANCE_API_SECRET cargada correctamente.")
-else:
-    logger.error("❌ BINANCE_API_SECRET no encontrada.")
+# Leer e imprimir
+def verificar_entorno():
+    if os.getenv("BINANCE_API_KEY"):
+        logger.info("🔑 BINANCE_API_KEY cargada correctamente.")
+    else:
+        logger.error("❌ BINANCE_API_KEY no encontrada.")
 
-if os.getenv("WEBHOOK_SECRET"):
-    logger.info("📩 WEBHOOK_SECRET cargado correctamente.")
-else:
-    logger.warning("⚠️ WEBHOOK_SECRET no definido.")
+    if os.getenv("BINANCE_API_SECRET"):
+        logger.info("🔐 BINANCE_API_SECRET cargada correctamente.")
+    else:
+        logger.error("❌ BINANCE_API_SECRET no encontrada.")
 
-logger.info("⚠️.... SISTEMA REINICIADO CORRECTAMENTE....")
+    if os.getenv("WEBHOOK_SECRET"):
+        logger.info("📩 WEBHOOK_SECRET cargado correctamente.")
+    else:
+        logger.warning("⚠️ WEBHOOK_SECRET no definido.")
 
 
 # 📦 Crear cliente Binance con variables de entorno
-client = UMFutures(key=api_key, secret=api_secret, base_url=base_url)
+# BINANCE_SIMULADO=1 usa el exchange simulado en memoria (pruebas locales y benchmark.py)
+exchange_simulado = None
+if os.getenv("BINANCE_SIMULADO") == "1":
+    from simulador import ExchangeSimulado
+    exchange_simulado = ExchangeSimulado.desde_entorno()
+    logger.warning("🧪 Usando el exchange SIMULADO, no se envían órdenes a Binance.")
+
+# Todas las llamadas pasan por la capa con presupuesto de peso, prioridades y reintentos
+client = ClienteBinance(ClienteInstrumentado(exchange_simulado or UMFutures(key=api_key, secret=api_secret, base_url=base_url)))
 
 
 #client = UMFutures(key=api_key, secret=api_secret, base_url="https://testnet.binancefuture.com")
 
+# Pool de conexiones reutilizables para las consultas REST en paralelo
+client.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+# 💾 Estado de todas las posiciones que maneja el bot (una por símbolo), persistido en disco
+gestor = GestorPosiciones(AlmacenEstado(os.getenv("ESTADO_DB", "estado.db")))
+
+# 📈 Mark price, bid/ask y velas de 1m en memoria (streams públicos, en todos los workers)
+mercado = MercadoLocal(
+    simbolos=[s for s in os.getenv("MERCADO_SIMBOLOS", "").split(",") if s],
+    stream_url=ws_url,
+)
+guardia_entrada = GuardiaEntrada(mercado)
+
+
+def iniciar_mercado():
+    if exchange_simulado is not None:
+        mercado.conectar_local(exchange_simulado.suscribir_mercado)
+    elif os.getenv("USAR_STREAM_MERCADO", "1") != "0":
+        mercado.iniciar()
+
+
+# 📐 Filtros de precio/cantidad por símbolo (exchange_info cacheado, se carga en el warm-up)
+filtros = ServicioFiltros(client)
+
+
+def mantenimiento_simbolo(symbol, notional):
+    try:
+        return filtros.obtener(symbol).mantenimiento(notional)
+    except Exception:
+        return MANTENIMIENTO_DEFECTO, 0.0
+
+
+# 📊 PnL no realizado, R y distancia a liquidación en vivo, con cada mark price del stream.
+# Todos los workers lo calculan; las alertas las manda solo el líder
+exposicion = MonitorExposicion(
+    mantenimiento=mantenimiento_simbolo,
+    alertar=lambda mensaje: liderazgo.es_lider and enviar_telegram(mensaje),
+)
+mercado.suscribir_mark(exposicion.on_mark)
+
+# 🧮 Riesgo abierto, nocional y PnL del día de toda la cartera: cada señal se chequea en memoria
+motor_riesgo = MotorRiesgo()
+
+
+def sincronizar_estado():
+    # Cambios del almacén compartido; los contadores de riesgo se recalculan solo si hubo alguno
+    if gestor.sincronizar():
+        actualizar_riesgo()
+
 
-# Funcion para colocar una orden STOP LIMIT en BINANCE intentandolo 3 veces con 1 seg de delay
+def actualizar_riesgo():
+    # Solo cuando el gestor informa cambios: cierres, cancelaciones o entradas de otros workers
+    motor_riesgo.reconstruir(
+        gestor.activas(),
+        precio=mercado.precio_referencia,
+        pnl_dia=diario.reporte_periodo("dia")["pnl_neto"],
+    )
 
-def colocar_orden_stop_limit(symbol, side, qty, stop_price, limit_price, intentos=3, espera_segundos=1):
-    logger.info("✨ Intentando colocar orden STOP LIMIT...")
-    logger.info(f"Symbol: {symbol}, Side: {side}, Qty: {qty}, Stop: {stop_price}, Limit: {limit_price}")
 
-    qty_str = str(ajustar_precision(qty, '0.001'))
-    stop_str = str(ajustar_precision(stop_price, '0.10'))
-    limit_str = str(ajustar_precision(limit_price, '0.10'))
+# Funcion para colocar una orden STOP LIMIT en BINANCE intentandolo hasta 3 veces si el error es transitorio
+
+def buscar_orden_cliente(symbol, client_order_id):
+    """La orden con ese newClientOrderId, o None si Binance no la tiene."""
+    try:
+        return client.query_order(symbol=symbol, origClientOrderId=client_order_id)
+    except ClientError as e:
+        if e.error_code == -2013:  # Order does not exist
+            return None
+        raise
+
+
+def colocar_orden_stop_limit(symbol, side, qty, stop_price, limit_price, intentos=3, client_order_id=None, vence_ms=None):
+    """
+    Con `client_order_id` la orden es idempotente: ante un error de estado desconocido
+    (timeout, -1000/-1001/-1007, 5xx) se consulta por ese id antes de reenviarla, así que
+    también esos errores se reintentan sin riesgo de duplicar la orden.
+    Con `vence_ms` la orden es GTD: Binance la da de baja sola a esa hora.
+    """
+    logger.info("✨ Intentando colocar orden STOP LIMIT: %s %s qty=%s stop=%s limit=%s",
+                symbol, side, qty, stop_price, limit_price, extra={"symbol": symbol})
+
+    params = {
+        "symbol": symbol,
+        "side": side,
+        "type": "STOP",
+        "timeInForce": "GTC",
+        "quantity": filtros.ajustar_cantidad(symbol, qty),
+        "stopPrice": filtros.ajustar_precio(symbol, stop_price),
+        "price": filtros.ajustar_precio(symbol, limit_price),
+    }
+    if client_order_id:
+        params["newClientOrderId"] = client_order_id
+    if vence_ms:
+        params["timeInForce"] = "GTD"
+        params["goodTillDate"] = vence_ms
 
     for intento in range(1, intentos + 1):
         try:
-            logger.info(f"🔄 Intento {intento}/{intentos}")
-            orden = client.new_order(
-                symbol=symbol,
-                side=side,
-                type="STOP",
-                timeInForce="GTC",
-                quantity=qty_str,
-                stopPrice=stop_str,
-                price=limit_str
-            )
+            logger.debug("🔄 Intento %d/%d", intento, intentos)
+            # El intento anterior pudo haber llegado a Binance: solo se reenvía si no está
+            if intento > 1 and client_order_id:
+                existente = buscar_orden_cliente(symbol, client_order_id)
+                if existente is not None and existente.get("status") not in ("CANCELED", "EXPIRED", "REJECTED"):
+                    metricas.incrementar("ordenes_recuperadas_total")
+                    logger.warning("♻️ La orden %s ya estaba en Binance (%s), no se reenvía", client_order_id, existente["orderId"],
+                                   extra={"symbol": symbol, "order_id": existente["orderId"]})
+                    return existente["orderId"]
+
+            orden = client.new_order(**params)
 
-            logger.info(f"✅ Orden colocada: {orden}")
+            logger.info("✅ Orden colocada (%s)", orden.get("orderId"), extra={"symbol": symbol, "order_id": orden.get("orderId")})
+            logger.debug("Respuesta de Binance: %s", orden)
 
             if 'orderId' not in orden or orden.get('orderId') is None:
-                msg = f"❌ Binance no devolvió un orderId. Respuesta: {orden}"
-                logger.error(msg)
-                enviar_telegram(msg)
+                logger.error("❌ Binance no devolvió un orderId para %s", symbol, extra={"symbol": symbol})
+                enviar_telegram(f"❌ Binance no devolvió un orderId. Respuesta: {orden}")
                 return None
 
             return orden['orderId']
 
         except ClientError as e:
+            if e.error_code == -4116 and client_order_id:
+                # ClientOrderId duplicado: la orden ya existe (un intento anterior sí llegó)
+                existente = buscar_orden_cliente(symbol, client_order_id)
+                if existente is not None:
+                    metricas.incrementar("ordenes_recuperadas_total")
+                    return existente["orderId"]
+
             msg = f"❌ ClientError Binance (intento {intento}): {e.error_code} - {e.error_message}"
             logger.error(msg)
             enviar_telegram(msg)
+            # Filtros, margen, precio, etc.: reintentar no cambia el resultado
+            if not es_reintentable(e, orden=not client_order_id):
+                return None
+            metricas.incrementar("orden_reintentos_total", motivo=e.error_code)
 
         except Exception as e:
+            # Sin respuesta de Binance no se sabe si la orden quedó colocada: sin client_order_id
+            # reintentar podría duplicarla
             msg = f"❌ Error inesperado al colocar orden (intento {intento}): {str(e)}"
             logger.exception(msg)
             enviar_telegram(msg)
+            if not client_order_id or not es_reintentable(e):
+                return None
+            metricas.incrementar("orden_reintentos_total", motivo=type(e).__name__)
 
         # Esperar antes del próximo intento, si no es el último
         if intento < intentos:
-            logger.info(f"⏳ Esperando {espera_segundos} segundo(s) antes de reintentar...")
-            time.sleep(espera_segundos)
+            espera = espera_reintento(intento)
+            logger.info("⏳ Esperando %.2f segundo(s) antes de reintentar...", espera)
+            time.sleep(espera)
 
     logger.error("❌ No se pudo colocar la orden después de múltiples intentos.")
     return None
@@ -150,45 +310,39 @@ def verificar_estado_orden(symbol, order_id):
 
 def cancelar_orden(symbol, order_id):
     client.cancel_order(symbol=symbol, orderId=order_id)
-    logger.info(f"❌ Orden cancelada ({order_id})")
+    logger.info("❌ Orden cancelada (%s)", order_id)
 
-def han_pasado_5_velas(timestamp_inicio):
-    ahora = int(time.time() * 1000)
-    diferencia = ahora - timestamp_inicio
-    minutos_pasados = diferencia // (60 * 1000)
-    minutos_faltantes = 60 - minutos_pasados
+def programar_vencimiento(posicion):
+    """Agenda (solo en el líder) una alarma a la hora exacta en que vence la entrada pendiente."""
+    vence_ms = posicion.timestamp_inicio + estrategia.ESPERA_ENTRADA_MS
+    if usar_gtd:
+        vence_ms += GRACIA_GTD_MS
+    vencimientos.programar(posicion.order_id, vence_ms, vencer_entrada, posicion.symbol, posicion.order_id)
 
-    if minutos_faltantes > 0:
-        #logger.info(f"⌛️ Aún no pasaron 5 velas. Faltan {minutos_faltantes} min.")
-        return False
-    else:
-        logger.info("⏱ Han pasado 6 velas (60 min).")
-        return True
 
+def vencer_entrada(symbol, order_id):
+    posicion = gestor.obtener(symbol)
+    if posicion is None or posicion.order_id != order_id or posicion.estado != PENDIENTE_ENTRADA:
+        return
+    logger.info("⏱ Han pasado 6 velas (60 min).", extra={"symbol": symbol, "order_id": order_id})
+    cancelar_por_vencimiento(posicion)
 
-def get_position(symbol):
-    try:
-        positions = client.get_position_risk(symbol=symbol)
-        for pos in positions:
-            if abs(float(pos['positionAmt'])) > 0:
-                return pos
-        return None
-    except ClientError as e:
-        return None
 
-def cerrar_si_sin_sl(symbol: str):
+@client.trading
+def cerrar_si_sin_sl(symbol: str) -> bool:
+    """Cancela las órdenes de `symbol` y cierra a mercado la posición. Devuelve False si no se pudo."""
     try:
         # Cancelar todas las órdenes abiertas antes de una nueva entrada
-        client.cancel_open_orders(symbol="BTCUSDT")
-        logger.info(f"🚫 Todas las órdenes abiertas en {symbol} fueron canceladas")
+        client.cancel_open_orders(symbol=symbol)
+        logger.info("🚫 Todas las órdenes abiertas en %s fueron canceladas", symbol)
 
         # 1. Obtener posición actual
         posiciones = client.get_position_risk(symbol=symbol)
         posicion = next((p for p in posiciones if float(p["positionAmt"]) != 0), None)
 
         if not posicion:
-            logger.info(f"ℹ️ No hay posición abierta en {symbol}.")
-            return
+            logger.info("ℹ️ No hay posición abierta en %s.", symbol)
+            return True
 
 
         # 2. Cerrar la posición por seguridad
@@ -208,141 +362,705 @@ def cerrar_si_sin_sl(symbol: str):
             symbol=symbol,
             side=lado,
             type="MARKET",
-            quantity=round(cantidad, 3)
+            quantity=filtros.ajustar_cantidad(symbol, cantidad)
         )
 
-        logger.info(f"✅ Posición cerrada por seguridad: {cierre}")
+        logger.info("✅ Posición cerrada por seguridad (%s, %s)", cierre.get("orderId"), cierre.get("status"),
+                    extra={"symbol": symbol, "order_id": cierre.get("orderId")})
+        logger.debug("Respuesta de Binance: %s", cierre)
+        return True
 
     except Exception as e:
         error_msg = f"❌ Error al cerrar posición en {symbol}: {e}"
         logger.error(error_msg)
         enviar_telegram(error_msg)
+        return False
+
+
+def cerrar_posicion_desprotegida(posicion):
+    """
+    Cierre de emergencia de una posición del gestor que quedó sin SL. Solo pasa a CERRADA
+    cuando el cierre se confirmó; si falló, la posición se conserva y se reintenta.
+    """
+    if gestor.obtener(posicion.symbol) is not posicion or posicion.estado not in (EJECUTADA, PROTEGIDA):
+        return
+    if cerrar_si_sin_sl(posicion.symbol):
+        gestor.transicion(posicion, posicion.estado, CERRADA)
+        return
+    logger.warning("🔁 Cierre de emergencia de %s pendiente, reintento en %.0fs", posicion.symbol, REINTENTO_CIERRE_MS / 1000)
+    vencimientos.programar(("cierre", posicion.symbol), int(time.time() * 1000) + REINTENTO_CIERRE_MS,
+                           cerrar_posicion_desprotegida, posicion)
+
+
+
+# === Lógica principal: ciclo de vida de las posiciones ===
+
+def orden_desde_evento(orden):
+    """Convierte un ORDER_TRADE_UPDATE al formato de query_order (solo los campos que se usan)."""
+    return {
+        "orderId": int(orden["i"]),
+        "status": orden["X"],
+        "side": orden["S"],
+        "avgPrice": orden["ap"],
+        "origQty": orden["q"],
+        "executedQty": orden["z"],
+        "updateTime": orden["T"],
+    }
+
+
+def colocar_proteccion(symbol, opposite, sl_price, patas_tp):
+    """
+    Envía el SL y los TP (`patas_tp`: [(cantidad, precio)]) en un solo batchOrders. Cada orden
+    se evalúa por separado: si alguna fue rechazada se reintenta sola una vez. Sin SL se lanza
+    excepción (la posición se cierra); un TP que no se pudo colocar queda en None y esa parte
+    de la posición sigue protegida por el SL.
+    """
+    sl_params = {
+        "symbol": symbol,
+        "side": opposite,
+        "type": "STOP_MARKET",
+        "stopPrice": filtros.ajustar_precio(symbol, sl_price),
+        "closePosition": "true",
+    }
+    tp_params = [
+        {
+            "symbol": symbol,
+            "side": opposite,
+            "type": "LIMIT",
+            "quantity": filtros.ajustar_cantidad(symbol, cantidad),
+            "price": filtros.ajustar_precio(symbol, precio),
+            "timeInForce": "GTC",
+            "reduceOnly": "true",
+        }
+        for cantidad, precio in patas_tp
+    ]
+
+    resultados = client.new_batch_order(batchOrders=[sl_params, *tp_params])
+    ordenes = []
+
+    for i, (params, resultado) in enumerate(zip([sl_params, *tp_params], resultados)):
+        nombre = "SL" if i == 0 else ("TP" if len(tp_params) == 1 else f"TP{i}")
+        if resultado.get("orderId") is not None:
+            ordenes.append(resultado)
+            continue
+
+        logger.warning("⚠️ %s rechazado en el batch (%s: %s), reintentando solo", nombre, resultado.get('code'), resultado.get('msg'))
+        metricas.incrementar("orden_reintentos_total", motivo=resultado.get("code"))
+        try:
+            ordenes.append(client.new_order(**params))
+        except ClientError as e:
+            if nombre == "SL":
+                raise
+            ordenes.append(None)
+            enviar_telegram(f"⚠️ No se pudo colocar el {nombre} en `{symbol}`: {e.error_message}. Esa parte queda con SL.")
+
+    return ordenes[0], ordenes[1:]
+
+
+@client.trading
+def procesar_entrada_ejecutada(posicion, orden_ejecutada=None):
+    # Proteger la posición nunca espera al presupuesto de monitoreo, aunque el fill lo detecte el monitor
+    if not gestor.transicion(posicion, PENDIENTE_ENTRADA, EJECUTADA):
+        return
+    vencimientos.cancelar(posicion.order_id)
+
+    inicio = time.perf_counter()
+    symbol = posicion.symbol
+    order_id = posicion.order_id
+    logger.info("✅ Orden ejecutada (%s).", symbol, extra={"symbol": symbol, "order_id": order_id})
+
+    try:
+        # Se reutilizan los datos del evento / consulta que detectó el fill
+        if orden_ejecutada is None:
+            orden_ejecutada = client.query_order(symbol=symbol, orderId=order_id)
+        filled_price = float(orden_ejecutada["avgPrice"])
+        side = orden_ejecutada["side"]
+        qty = float(orden_ejecutada["origQty"])
+        diario.registrar_fill(order_id, filled_price, int(orden_ejecutada.get("updateTime") or 0) or None)
+
+        sl_distance = posicion.sl_distance
+        tp_factor = posicion.tp_factor
+
+        opposite = "SELL" if side == "BUY" else "BUY"
+        filtros_simbolo = filtros.obtener(symbol)
+        redondear = lambda precio: float(filtros_simbolo.precio(precio))
+        sl_price, tp_price = estrategia.precios_salida(
+            filled_price, sl_distance, tp_factor, estrategia.direccion(side), redondear=redondear,
+        )
+        if posicion.escalera:
+            patas = estrategia.patas_tp(
+                filled_price, qty, sl_distance, posicion.escalera, estrategia.direccion(side),
+                cuantizar=lambda cantidad: float(filtros_simbolo.cantidad(cantidad)),
+                redondear=redondear,
+                valida=lambda cantidad, precio: not filtros_simbolo.validar_orden(cantidad, precio),
+            )
+        else:
+            patas = [(qty, tp_price)]
+
+        # STOP LOSS + TAKE PROFIT(s) en una sola llamada
+        sl_order, tp_orders = colocar_proteccion(symbol, opposite, sl_price, patas)
+        patas_tp = [
+            {"order_id": orden["orderId"], "qty": cantidad, "precio": precio, "llena": False}
+            for (cantidad, precio), orden in zip(patas, tp_orders) if orden
+        ]
+        tp_order = patas_tp[0] if patas_tp else None
+        texto_tp = " | ".join(f"${p['precio']:.2f} x{p['qty']}" for p in patas_tp) if len(patas_tp) > 1 else f"${tp_price:.2f}"
+        stops.registrar(symbol, side, filled_price, sl_price, sl_distance)
+
+        metricas.observar("deteccion_a_proteccion_seconds", time.perf_counter() - inicio)
+        if orden_ejecutada.get("updateTime"):
+            latencia_fill = time.time() - int(orden_ejecutada["updateTime"]) / 1000
+            metricas.observar("fill_a_proteccion_seconds", latencia_fill)
+            logger.info("⏱ Fill → protegida en %.0f ms", latencia_fill * 1000,
+                        extra={"symbol": symbol, "order_id": order_id, "etapa": "proteccion", "latencia_ms": round(latencia_fill * 1000, 1)})
+
+        logger.info("🛡 %s protegida: SL %s | TP %s | tamaño %s | %sx | riesgo %s%%",
+                    symbol, sl_price, texto_tp if tp_order else "N/A", qty, posicion.apalancamiento, posicion.risk_percent,
+                    extra={"symbol": symbol, "order_id": order_id})
+        logger.debug("Órdenes de protección: SL %s | TP %s", sl_order, tp_orders)
+
+
+        # Cuando se completa una entrada se envia un mensaje de TELEGRAM
+
+        fecha = obtener_fecha_hora_arg()
+        mensaje = (
+            f"✅ *Orden ejecutada*\n"
+            f"🕒 Fecha: `{fecha}`\n"
+            f"🪙 Símbolo: `{symbol}`\n"
+            f"📉 Tipo: *{side}*\n"
+            f"💰 Entrada: `${filled_price:.2f}`\n"
+            f"🎯 TP: `{texto_tp}`\n"
+            f"⚠️ SL: `${sl_price:.2f}`\n"
+            f"📊 Tamaño: `{qty}`\n"
+            f"🎯 Apalancamiento: `{posicion.apalancamiento}x`\n"
+            f"📈 Riesgo: `{posicion.risk_percent}%`"
+        )
+
+        # ✅ Actualizamos la posición con la ejecución real
+        gestor.transicion(
+            posicion, EJECUTADA, PROTEGIDA,
+            timestamp_inicio=int(time.time() * 1000),
+            precio_entrada=filled_price,
+            tp_order_id=tp_order["order_id"] if tp_order else None,
+            sl_order_id=sl_order["orderId"],
+            sl_precio=sl_price,
+            patas_tp=patas_tp,
+        )
+        exposicion.sincronizar(gestor.activas())
+
+        enviar_telegram(mensaje)
+
+    except Exception as e:
+        logger.error("❌ Error al colocar SL/TP en %s: %s", symbol, e)
+        cerrar_posicion_desprotegida(posicion)
+
+        fecha = obtener_fecha_hora_arg()
+
+        mensaje = (
+            f"🕒 Fecha: `{fecha}`\n"
+            f"🛑 Error al colocar SL/TP en `{symbol}`"
+        )
+
+        enviar_telegram(mensaje)
+
+
+def cancelar_por_vencimiento(posicion, expirada=False):
+    """
+    Da de baja la entrada que no se ejecutó a tiempo. Con `expirada` Binance ya la venció
+    (GTD) y solo se actualiza el estado.
+    """
+    if posicion.estado != PENDIENTE_ENTRADA:
+        return
+    vencimientos.cancelar(posicion.order_id)
+
+    if not expirada:
+        try:
+            cancelar_orden(posicion.symbol, posicion.order_id)
+        except ClientError as e:
+            if e.error_code != -2011:  # Unknown order sent
+                raise
+            # Ya no estaba abierta: pudo ejecutarse justo antes del vencimiento
+            orden = client.query_order(symbol=posicion.symbol, orderId=posicion.order_id)
+            if orden["status"] == "FILLED":
+                procesar_entrada_ejecutada(posicion, orden)
+                return
+
+    if not gestor.transicion(posicion, PENDIENTE_ENTRADA, CANCELADA):
+        return
+    diario.registrar_cancelacion(posicion.order_id)
+    logger.info("❌ Orden cancelada por tiempo (%s).", posicion.symbol)
+    # Cuando se cancela la Orden STOP LIMIT por tiempo envia un mensaje a TELEGRAM
+
+    fecha = obtener_fecha_hora_arg()
+
+    mensaje = (
+        f"❌ *STOP LIMIT cancelada*\n"
+        f"🕒 Fecha: `{fecha}`\n"
+        f"🪙 Símbolo: `{posicion.symbol}`\n"
+        f"🛑 Por vencimiento del tiempo"
+    )
+
+    enviar_telegram(mensaje)
+
+
+def reportar_salida(posicion):
+    with lock_salidas:
+        if posicion.estado != PROTEGIDA:
+            return
+        # Si los trades de la salida aún no aparecen se reintenta en el próximo tick del monitor
+        # (con el stream activo, a través de salidas_pendientes)
+        with metricas.cronometro("tick_seconds", tarea="verificar_salida"):
+            salida = verificar_salida_programada(client, posicion.a_dict())
+        if not salida:
+            # Puede ser una pata de la escalera de TP (el libro de trades ya quedó sincronizado)
+            actualizar_patas_tp(posicion)
+            return
+        cerrada = gestor.transicion(posicion, PROTEGIDA, CERRADA)
+
+    if cerrada:
+        stops.quitar(posicion.symbol)
+        salidas_pendientes.pop(posicion.symbol, None)
+        # Para el diario: todos los trades de la operación, ya sincronizados. timestamp_inicio
+        # es el momento de la protección: la comisión de la entrada se suma por su orderId
+        pnl, comision = libro_trades.pnl_operacion(posicion.symbol, posicion.order_id, posicion.timestamp_inicio)
+        diario.registrar_salida(posicion.order_id, salida["tipo"], pnl, comision)
+        motor_riesgo.registrar_pnl(pnl - comision)
+
+        # Se cancela la pata de salida que haya quedado abierta
+        try:
+            client.cancel_open_orders(symbol=posicion.symbol)
+        except ClientError as e:
+            logger.info("⚠️ No se pudieron cancelar las órdenes restantes en %s: %s", posicion.symbol, e)
+
 
+# === Break-even y trailing del SL ===
 
+def reemplazar_stop(symbol, nuevo_sl):
+    """Callback del gestor de stops: mueve el SL de `symbol` a `nuevo_sl` por lo que queda abierto."""
+    posicion = gestor.obtener(symbol)
+    if posicion is None or posicion.estado != PROTEGIDA:
+        stops.quitar(symbol)
+        return False
+    return mover_stop(posicion, nuevo_sl)
 
-# === Lógica principal: ciclo automático ===
 
-def ciclo_bot():
-    if estado_orden["activa"]:
-        symbol = estado_orden["symbol"]
-        order_id = estado_orden["order_id"]
+def mover_stop(posicion, precio=None):
+    """
+    Reemplaza el SL por uno en `precio` (por defecto, el vigente) por lo que queda abierto:
+    primero coloca el nuevo y recién después cancela el anterior, así la posición nunca queda
+    sin stop. Binance no admite dos STOP_MARKET con closePosition del mismo lado, por eso el
+    reemplazo es reduceOnly con la cantidad. Devuelve True si el SL quedó reemplazado.
+    """
+    with lock_stop:
+        # Precio y cantidad se leen con el lock: el trailing y los TP parciales mueven el mismo SL
+        return _mover_stop(posicion, precio or posicion.sl_precio, posicion.qty_abierta())
 
-        estado = verificar_estado_orden(symbol, order_id)
 
-        if estado == 'FILLED':
-            logger.info("✅ Orden ejecutada.")
-            estado_orden["activa"] = False
+def _mover_stop(posicion, precio, cantidad):
+    symbol = posicion.symbol
+    opposite = "SELL" if posicion.side == "BUY" else "BUY"
 
+    try:
+        nuevo = client.new_order(
+            symbol=symbol,
+            side=opposite,
+            type="STOP_MARKET",
+            stopPrice=filtros.ajustar_precio(symbol, precio),
+            quantity=filtros.ajustar_cantidad(symbol, cantidad),
+            reduceOnly="true",
+        )
+    except ClientError as e:
+        if e.error_code == -2021:  # el mark ya está del otro lado del nuevo stop: queda el anterior
+            return False
+        if e.error_code == -2022:  # ReduceOnly rechazada: la posición ya se cerró
+            stops.quitar(symbol)
+            return False
+        raise
+
+    try:
+        client.cancel_order(symbol=symbol, orderId=posicion.sl_order_id)
+    except Exception as e:
+        estado = "FILLED" if isinstance(e, ClientError) and e.error_code == -2011 else _estado_orden(symbol, posicion.sl_order_id)
+        if estado != "CANCELED":
+            # El anterior sigue vivo (o ya se ejecutó y la salida se reporta por el camino normal):
+            # el nuevo sobra, nunca quedan dos SL en Binance
+            logger.warning("⚠️ No se pudo cancelar el SL anterior de %s (%s): se deja el vigente", symbol, e)
+            if estado == "FILLED":
+                stops.quitar(symbol)
             try:
-                orden_ejecutada = client.query_order(symbol=symbol, orderId=order_id)
-                filled_price = float(orden_ejecutada["avgPrice"])
-                side = orden_ejecutada["side"]
-                qty = float(orden_ejecutada["origQty"])
-
-                sl_distance = estado_orden["sl_distance"]
-                tp_factor = estado_orden["tp_factor"]
-
-                opposite = "SELL" if side == "BUY" else "BUY"
-                sl_price = round(filled_price - sl_distance if side == "BUY" else filled_price + sl_distance, 2)
-                tp_price = round(filled_price + sl_distance * tp_factor if side == "BUY" else filled_price - sl_distance * tp_factor, 2)
-
-
-                scheduler.remove_job("ciclo_bot")
-
-                # STOP LOSS
-                sl_order = client.new_order(
-                    symbol=symbol,
-                    side=opposite,
-                    type="STOP_MARKET",
-                    stopPrice=str(ajustar_precision(sl_price, '0.10')),
-                    closePosition=True
-                )
-                logger.info(f"SL colocado: {sl_price}")
-
-                #time.sleep(2)
-
-                # TAKE PROFIT
-                tp_order = client.new_order(
-                    symbol=symbol,
-                    side=opposite,
-                    type="LIMIT",
-                    quantity=str(ajustar_precision(qty, '0.001')),
-                    price=str(ajustar_precision(tp_price, '0.10')),
-                    timeInForce="GTC",
-                    reduceOnly=True
-                )
-                logger.info(f"TP colocado: {tp_price}")
-                logger.info(f"Tamaño: {qty}")
-                logger.info(f"Apalancamiento: {estado_orden.get('apalancamiento', 'N/A')}x")
-                logger.info(f"Riesgo: {estado_orden.get('risk_percent', 'N/A')}%")
-
-
-                # Cuando se completa una entrada se envia un mensaje de TELEGRAM
-
-                fecha = obtener_fecha_hora_arg()
-                mensaje = (
-                    f"✅ *Orden ejecutada*\n"
-                    f"🕒 Fecha: `{fecha}`\n"
-                    f"📉 Tipo: *{side}*\n"
-                    f"💰 Entrada: `${filled_price:.2f}`\n"
-                    f"🎯 TP: `${tp_price:.2f}`\n"
-                    f"⚠️ SL: `${sl_price:.2f}`\n"
-                    f"📊 Tamaño: `{qty}`\n"
-                    f"🎯 Apalancamiento: `{estado_orden.get('apalancamiento', 'N/A')}x`\n"
-                    f"📈 Riesgo: `{estado_orden.get('risk_percent', 'N/A')}%`"
-                )
-
-                # ✅ Actualizamos el estado_orden con ejecución real
-                estado_orden["timestamp_inicio"] = int(time.time() * 1000)
-                estado_orden["tp_order_id"] = tp_order["orderId"]
-
-                enviar_telegram(mensaje)
-                #scheduler.remove_job("ciclo_bot")
-                
-                scheduler.add_job(lambda: verificar_salida_programada(client, estado_orden, scheduler, job_id="verif_salida"), 'interval', seconds=60, id="verif_salida")
-
-            except Exception as e:
-                logger.error(f"❌ Error al colocar SL/TP: {e}")
-                cerrar_si_sin_sl("BTCUSDT")
-
-                fecha = obtener_fecha_hora_arg()
-
-                mensaje = (
-                    f"🕒 Fecha: `{fecha}`\n"
-                    f"🛑 Error al colocar SL/TP"
-                )
+                client.cancel_order(symbol=symbol, orderId=nuevo["orderId"])
+            except Exception as e_nuevo:
+                logger.error("❌ Quedaron dos SL en %s, no se pudo cancelar %s: %s", symbol, nuevo["orderId"], e_nuevo)
+                enviar_telegram(f"⚠️ Quedaron dos SL en {symbol}: revisar la orden {nuevo['orderId']}")
+            return False
 
-                enviar_telegram(mensaje)
+    gestor.actualizar(posicion, sl_order_id=nuevo["orderId"], sl_precio=float(precio), sl_cantidad=float(cantidad))
+    return True
 
 
+def _estado_orden(symbol, order_id):
+    """Estado de la orden en Binance, o None si tampoco se puede consultar."""
+    try:
+        return client.query_order(symbol=symbol, orderId=order_id)["status"]
+    except Exception:
+        return None
 
 
+def seguir_stop(posicion):
+    # Posición protegida retomada tras un reinicio: sigue desde el SL vigente
+    direccion = estrategia.direccion(posicion.side)
+    sl = posicion.sl_precio or posicion.precio_entrada - direccion * posicion.sl_distance
+    stops.registrar(posicion.symbol, posicion.side, posicion.precio_entrada, sl, posicion.sl_distance)
+
+
+# 🪜 SL a break-even y trailing con cada mark price (solo las posiciones que protege este proceso)
+stops = GestorStops(reemplazar=reemplazar_stop, tick=lambda symbol: filtros.obtener(symbol).tick_size)
+mercado.suscribir_mark(stops.on_mark)
+
+
+def actualizar_patas_tp(posicion):
+    """
+    Marca las patas de TP ya ejecutadas según el libro local de trades y achica el SL a lo que
+    queda abierto (si es reduceOnly: un SL closePosition ya cierra solo el resto).
+    """
+    if not posicion.patas_tp:
+        return
+    opposite = "SELL" if posicion.side == "BUY" else "BUY"
+    ejecutadas = libro_trades.fills_por_orden(posicion.symbol, posicion.timestamp_inicio, opposite)
+    patas = [
+        dict(p, llena=True) if not p["llena"] and ejecutadas.get(p["order_id"], 0) >= p["qty"] - 1e-9 else p
+        for p in posicion.patas_tp
+    ]
+    if patas == posicion.patas_tp:
+        return
+    gestor.actualizar(posicion, patas_tp=patas)
+
+    restante = posicion.qty_abierta()
+    llenas = sum(p["llena"] for p in patas)
+    logger.info("🎯 TP parcial en %s: %s/%s patas ejecutadas, quedan %s", posicion.symbol, llenas, len(patas), restante)
+    enviar_telegram(
+        f"🎯 *TP parcial* en `{posicion.symbol}`\n"
+        f"✅ Patas ejecutadas: `{llenas}/{len(patas)}`\n"
+        f"📊 Queda abierto: `{restante}`"
+    )
+    if posicion.sl_cantidad and posicion.sl_cantidad > restante > 0:
+        mover_stop(posicion)
+
+
+def obtener_ordenes_abiertas(simbolos):
+    """Ids de órdenes abiertas de los símbolos dados, con la menor cantidad de llamadas posible."""
+    if len(simbolos) > MAX_SIMBOLOS_CONSULTA_INDIVIDUAL:
+        ordenes = client.get_open_orders()
+    else:
+        ordenes = [o for s in simbolos for o in client.get_open_orders(symbol=s)]
+    return {int(o["orderId"]) for o in ordenes}
 
-        elif han_pasado_5_velas(estado_orden["timestamp_inicio"]):
-            cancelar_orden(symbol, order_id)
-            logger.info("❌ Orden cancelada por tiempo.")
-            estado_orden["activa"] = False
-            # Cuando se cancela la Orden STOP LIMIT por tiempo envia un mensaje a TELEGRAM
 
-            fecha = obtener_fecha_hora_arg()
+@metricas.cronometrar("tick_seconds", tarea="monitor_posiciones")
+@client.monitoreo
+def monitor_posiciones(forzar_polling=False):
+    # Incorpora las entradas registradas por los otros workers
+    sincronizar_estado()
+    posiciones = gestor.activas()
+    exposicion.sincronizar(posiciones)
+    if not posiciones:
+        return
 
-            mensaje = (
-                f"❌ *STOP LIMIT cancelada*\n"
-                f"🕒 Fecha: `{fecha}`\n"
-                f"🛑 Por vencimiento del tiempo"
-            )
+    pendientes = [p for p in posiciones if p.estado == PENDIENTE_ENTRADA]
 
-            enviar_telegram(mensaje)
-            scheduler.remove_job("ciclo_bot")
+    for posicion in pendientes:
+        if posicion.order_id in fills_sin_posicion:
+            procesar_entrada_ejecutada(posicion)
+        else:
+            # Las entradas de otros workers llegan por sincronizar: su vencimiento queda agendado
+            programar_vencimiento(posicion)
+
+    # Salidas avisadas por stream cuyos trades aún no estaban en /userTrades: con el stream
+    # activo no hay otro camino que las vuelva a intentar
+    for symbol, ordenes in list(salidas_pendientes.items()):
+        posicion = gestor.obtener(symbol)
+        if posicion is None or posicion.estado != PROTEGIDA or not ordenes & posicion.ordenes_salida():
+            salidas_pendientes.pop(symbol, None)
+            continue
+        try:
+            reportar_salida(posicion)
+        except Exception as e:
+            logger.error("❌ Error reportando la salida de %s: %s", symbol, e)
 
-# === Scheduler que ejecuta 5 segundos ===
-if not scheduler.get_job("ciclo_bot"):
-    scheduler.add_job(ciclo_bot, 'interval', seconds=5, id="ciclo_bot")
-    logger.info("⏱ Tarea 'ciclo_bot' programada.")
+    # Con el stream activo los fills llegan por evento
+    if stream_usuario.activo and not forzar_polling:
+        return
 
-#Inicia funcion de proteccion ante REINICIO INESPERADO DE RENDER
+    posiciones = [p for p in gestor.activas() if p.estado in (PENDIENTE_ENTRADA, PROTEGIDA)]
+    if not posiciones:
+        return
 
-cerrar_si_sin_sl("BTCUSDT")
+    try:
+        abiertas = obtener_ordenes_abiertas({p.symbol for p in posiciones})
+    except Exception as e:
+        logger.error("❌ Error al consultar órdenes abiertas: %s", e)
+        return
+
+    for posicion in posiciones:
+        try:
+            if posicion.estado == PENDIENTE_ENTRADA and posicion.order_id not in abiertas:
+                # La entrada dejó de estar abierta: se confirma si fue ejecutada
+                orden = client.query_order(symbol=posicion.symbol, orderId=posicion.order_id)
+                if orden["status"] == 'FILLED':
+                    procesar_entrada_ejecutada(posicion, orden)
+                elif orden["status"] == 'EXPIRED':
+                    cancelar_por_vencimiento(posicion, expirada=True)
+                else:
+                    gestor.transicion(posicion, PENDIENTE_ENTRADA, CANCELADA)
+                    vencimientos.cancelar(posicion.order_id)
+                    diario.registrar_cancelacion(posicion.order_id)
+
+            elif posicion.estado == PROTEGIDA and not posicion.ordenes_salida() <= abiertas:
+                reportar_salida(posicion)
+        except Exception as e:
+            logger.error("❌ Error monitoreando %s: %s", posicion.symbol, e)
+
+
+def enviar_digesto():
+    enviar_telegram(formatear_digesto(diario.reporte_periodo("dia"), diario.reporte_periodo("semana")))
+
+
+def asegurar_monitor():
+    try:
+        if not scheduler.running:
+            scheduler.start()
+            logger.info("🚀 Scheduler iniciado.")
+
+        if not scheduler.get_job("monitor_posiciones"):
+            scheduler.add_job(monitor_posiciones, 'interval', seconds=5, id="monitor_posiciones")
+            logger.info("⏱ Tarea 'monitor_posiciones' programada.")
+
+        if hora_digesto and not scheduler.get_job("digesto_diario"):
+            hora, minuto = hora_digesto.split(":")
+            scheduler.add_job(enviar_digesto, 'cron', hour=int(hora), minute=int(minuto), timezone=ZONA_AR, id="digesto_diario")
+            logger.info("⏱ Tarea 'digesto_diario' programada (%s).", hora_digesto)
+    except JobLookupError as e:
+            logger.error("⚠️ Error al buscar job: %s", e)
+    except Exception as e:
+            logger.error("❌ Error al iniciar el scheduler o agregar el job: %s", e)
+
+
+# === Eventos del user-data stream ===
+
+def on_evento_orden(orden):
+    cuenta.on_evento_orden(orden)
+    if orden.get("X") == "EXPIRED":
+        # Entrada GTD vencida en Binance
+        posicion = gestor.buscar_por_orden(int(orden["i"]))
+        if posicion is not None and posicion.estado == PENDIENTE_ENTRADA and posicion.order_id == int(orden["i"]):
+            cancelar_por_vencimiento(posicion, expirada=True)
+        return
+    if orden.get("X") != "FILLED":
+        return
+
+    posicion = gestor.buscar_por_orden(int(orden["i"]))
+    if posicion is None:
+        # Puede ser una entrada que otro worker acaba de registrar
+        sincronizar_estado()
+        posicion = gestor.buscar_por_orden(int(orden["i"]))
+    if posicion is None:
+        fills_sin_posicion.append(int(orden["i"]))
+        return
+
+    # Los callbacks corren en el hilo del websocket: el trabajo REST va en otro hilo
+    if posicion.estado == PENDIENTE_ENTRADA and int(orden["i"]) == posicion.order_id:
+        logger.info("📡 Fill de entrada recibido por stream (%s)", posicion.symbol)
+        threading.Thread(target=procesar_entrada_ejecutada, args=(posicion, orden_desde_evento(orden)), daemon=True).start()
+
+    elif posicion.estado == PROTEGIDA:
+        logger.info("📡 Salida recibida por stream (%s)", posicion.symbol)
+        # Queda pendiente hasta que se reporte (o se marque la pata de TP): lo reintenta el monitor
+        salidas_pendientes.setdefault(posicion.symbol, set()).add(int(orden["i"]))
+        threading.Thread(target=reportar_salida, args=(posicion,), daemon=True).start()
+
+
+def on_evento_cuenta(datos):
+    cuenta.on_evento_cuenta(datos)
+    exposicion.on_evento_cuenta(datos)
+    # Los demás workers no tienen stream de usuario: leen balance y posiciones del almacén
+    try:
+        gestor.almacen.guardar_cuenta(datos)
+    except Exception as e:
+        logger.error("❌ No se pudo compartir el ACCOUNT_UPDATE: %s", e)
+
+
+# Último cambio de la cuenta del almacén que ya recibió el monitor de exposición de este worker
+_ultima_cuenta = 0
+
+
+def sincronizar_cuenta():
+    """En los seguidores, lleva al monitor de exposición los ACCOUNT_UPDATE que guardó el líder."""
+    global _ultima_cuenta
+    if liderazgo.es_lider:
+        return
+    datos, _ultima_cuenta = gestor.almacen.cuenta_desde(_ultima_cuenta)
+    if datos:
+        exposicion.on_evento_cuenta(datos)
+
+
+def reconciliar_tras_reconexion():
+    # Los eventos perdidos mientras el stream estuvo caído se recuperan con una consulta REST
+    cuenta.invalidar()
+    monitor_posiciones(forzar_polling=True)
+
+
+stream_usuario = StreamUsuario(
+    client,
+    on_orden=on_evento_orden,
+    on_cuenta=on_evento_cuenta,
+    on_config=lambda datos: cuenta.on_evento_config(datos),
+    on_reconexion=reconciliar_tras_reconexion,
+    stream_url=ws_url,
+)
+
+# 💼 Balance, posición, órdenes abiertas y apalancamiento por símbolo, alimentados por el stream
+cuenta = CacheCuenta(client, stream_activo=lambda: stream_usuario.activo)
+
+
+# === Recuperación del estado tras un reinicio ===
+
+def tiene_stop_protector(ordenes):
+    return any(o["type"] in ("STOP_MARKET", "STOP") and (o.get("closePosition") or o.get("reduceOnly")) for o in ordenes)
+
+
+def recuperar_estado():
+    """
+    Reconcilia el estado persistido con las posiciones y órdenes abiertas en Binance.
+    Las posiciones protegidas se vuelven a monitorear; solo se cierran las que quedaron sin SL.
+    """
+    inicio = time.perf_counter()
+
+    persistidas = gestor.cargar_desde_almacen()
+    abiertas = {p["symbol"]: p for p in client.get_position_risk() if float(p["positionAmt"]) != 0}
+    exposicion.semilla(abiertas.values())
+    ordenes = {}
+    for o in client.get_open_orders():
+        ordenes.setdefault(o["symbol"], []).append(o)
+
+    reanudadas, cerradas = [], []
+
+    for posicion in persistidas:
+        symbol = posicion.symbol
+        ids_abiertos = {int(o["orderId"]) for o in ordenes.get(symbol, [])}
+
+        if posicion.estado == PENDIENTE_ENTRADA:
+            if posicion.order_id in ids_abiertos:
+                programar_vencimiento(posicion)
+                reanudadas.append(symbol)
+            elif symbol in abiertas:
+                # La entrada se ejecutó mientras el bot estaba caído
+                procesar_entrada_ejecutada(posicion)
+                reanudadas.append(symbol)
+            else:
+                gestor.transicion(posicion, PENDIENTE_ENTRADA, CANCELADA)
+                diario.registrar_cancelacion(posicion.order_id)
+
+        elif posicion.estado == PROTEGIDA and symbol not in abiertas:
+            # La salida ocurrió durante la caída: se reporta ahora (o en el próximo tick del monitor)
+            reportar_salida(posicion)
+            reanudadas.append(symbol)
+
+        elif posicion.estado == PROTEGIDA and posicion.sl_order_id in ids_abiertos:
+            seguir_stop(posicion)
+            reanudadas.append(symbol)
+
+        else:
+            # EJECUTADA sin protección confirmada o PROTEGIDA sin SL: se cierra por seguridad
+            cerrar_posicion_desprotegida(posicion)
+            cerradas.append(symbol)
+
+    # Posiciones en Binance que el bot no conoce: solo se cierran si no tienen stop
+    conocidas = {p.symbol for p in persistidas}
+    for symbol in abiertas:
+        if symbol in conocidas:
+            continue
+        if tiene_stop_protector(ordenes.get(symbol, [])):
+            logger.warning("⚠️ Posición desconocida en %s con stop propio, se deja abierta.", symbol)
+        else:
+            cerrar_si_sin_sl(symbol)
+            cerradas.append(symbol)
+
+    actualizar_riesgo()
+
+    duracion_ms = (time.perf_counter() - inicio) * 1000
+    logger.info("♻️ Recuperación completada en %.0f ms. Reanudadas: %s | Cerradas: %s", duracion_ms, reanudadas or '-', cerradas or '-')
+
+
+
+# === Coordinación entre workers: solo el líder corre scheduler, monitor y stream ===
+
+def asumir_liderazgo():
+    #Inicia funcion de proteccion ante REINICIO INESPERADO DE RENDER (o caída del líder anterior)
+    try:
+        recuperar_estado()
+    except Exception as e:
+        logger.error("❌ Error en la recuperación del estado: %s", e)
+        enviar_telegram(f"❌ Error en la recuperación del estado tras reinicio: {e}")
+
+    if usar_stream and exchange_simulado is not None:
+        stream_usuario.conectar_local(exchange_simulado.suscribir)
+    elif usar_stream:
+        stream_usuario.iniciar()
+
+    # === Monitor único de posiciones (cada 5 segundos) ===
+    asegurar_monitor()
+
+
+liderazgo = Liderazgo(ruta_lock_lider, al_asumir=asumir_liderazgo)
+
+
+# === Arranque: la app atiende apenas se crea y el warm-up corre en segundo plano ===
+
+arranque_listo = threading.Event()
+arranque_etapas = {}
+arranque_errores = {}
+_lock_arranque = threading.Lock()
+_hilo_arranque = None
+
+
+def calentar():
+    """
+    Warm-up de cada worker: filtros de exchange_info, streams de mercado y elección de líder
+    (el líder además recupera el estado y arranca scheduler, monitor y stream de usuario).
+    Un error en una etapa se registra y el arranque sigue, como antes con el import.
+    """
+    inicio = time.perf_counter()
+    for nombre, funcion in (("filtros", filtros.cargar), ("mercado", iniciar_mercado), ("liderazgo", liderazgo.iniciar)):
+        inicio_etapa = time.perf_counter()
+        try:
+            funcion()
+        except Exception as e:
+            arranque_errores[nombre] = str(e)
+            logger.error("❌ Error en el arranque (%s): %s", nombre, e)
+        arranque_etapas[nombre] = round((time.perf_counter() - inicio_etapa) * 1000, 1)
+
+    metricas.fijar("arranque_warmup_seconds", time.perf_counter() - inicio)
+    metricas.fijar("arranque_total_seconds", time.perf_counter() - inicio_import)
+    arranque_listo.set()
+    logger.info("✅ Warm-up completo en %.0f ms | etapas (ms): %s", (time.perf_counter() - inicio) * 1000, arranque_etapas)
+
+
+def crear_app():
+    """
+    Fábrica de la app (gunicorn "app:crear_app()"). Devuelve la app lista para atender
+    /ping y encolar señales, y lanza el warm-up una sola vez por proceso; /ready indica
+    cuándo terminó.
+    """
+    global _hilo_arranque
+    with _lock_arranque:
+        if _hilo_arranque is None:
+            verificar_entorno()
+            logger.info("⚠️.... SISTEMA REINICIADO CORRECTAMENTE....")
+            _hilo_arranque = threading.Thread(target=calentar, name="arranque", daemon=True)
+            _hilo_arranque.start()
+            metricas.fijar("arranque_import_seconds", time.perf_counter() - inicio_import)
+            logger.info("🚀 App creada en %.0f ms, warm-up en segundo plano.", (time.perf_counter() - inicio_import) * 1000)
+    return app
 
 
 # === Webhook para control de estado ===
@@ -354,126 +1072,355 @@ def ping_binance():
         return jsonify({
                 "status": "ok",
                 "message": "Bot en línea",
+                "rol": "lider" if liderazgo.es_lider else "seguidor",
                 "timestamp": int(time.time())
         }), 200
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
-# === Webhook para recibir señales ===
 
-@app.route('/webhook', methods=['POST'])
-def webhook():
-    data = request.json
+@app.route('/ready', methods=['GET'])
+def listo():
+    # /ping dice que el proceso vive; /ready, que terminó el warm-up y puede operar
+    estado = {
+        "ready": arranque_listo.is_set(),
+        "rol": "lider" if liderazgo.es_lider else "seguidor",
+        "etapas_ms": arranque_etapas,
+        "errores": arranque_errores,
+    }
+    return jsonify(estado), 200 if arranque_listo.is_set() else 503
+
+# === Pipeline de ejecución de una señal ===
+
+def validar_senal(data):
+    if not isinstance(data, dict):
+        return "JSON inválido"
+
+    side = str(data.get("side", "")).upper()
+    if side not in ("BUY", "SELL", "CLOSE"):
+        return f"side inválido: {data.get('side')}"
+
+    try:
+        for campo in ("entry", "sl_distance", "tp_factor", "risk_percent", "limit_offset"):
+            float(data.get(campo, 0))
+    except (TypeError, ValueError):
+        return f"Valor numérico inválido en '{campo}'"
+
+    if side != "CLOSE" and (float(data.get("entry", 0)) <= 0 or float(data.get("sl_distance", 0)) <= 0):
+        return "entry y sl_distance deben ser mayores a 0"
+
+    try:
+        estrategia.parsear_escalera(data.get("tp_escalera", escalera_tp))
+    except ValueError as e:
+        return f"tp_escalera inválida: {e}"
+
+    return None
 
-    if webhook_secret and data.get("secret") != webhook_secret:
-        return jsonify({"error": "❌ Webhook no autorizado"}), 403
+
+def descartar_senal(senal, resultado, codigo):
+    """
+    Respuesta de una señal rechazada antes de enviar cualquier orden: libera su clave de
+    idempotencia para que el reintento (de TradingView o manual) se ejecute en lugar de
+    contestarse como duplicada.
+    """
+    indice_senales.liberar(clave_senal(senal.datos), senal.id)
+    return resultado, codigo
+
+
+def ejecutar_senal(senal):
+    """Ejecuta el pipeline completo de una señal. Devuelve (resultado, codigo_http)."""
+    data = senal.datos
+
+    # Las señales que llegan durante el arranque esperan filtros y recuperación del estado
+    if not arranque_listo.wait(espera_arranque):
+        return descartar_senal(senal, {"error": "❌ El bot todavía está iniciando, reintentar"}, 503)
 
     symbol = data.get("symbol", "BTCUSDT")
     side = data.get("side", "").upper()
     entry = float(data.get("entry", 0))
     sl_distance = float(data.get("sl_distance", 0))
-    tp_factor = float(data.get("tp_factor", 2.0))
-    risk_percent = float(data.get("risk_percent", 1.0))
+    tp_factor = float(data.get("tp_factor", estrategia.TP_FACTOR))
+    risk_percent = float(data.get("risk_percent", estrategia.RISK_PERCENT))
     limit_offset = float(data.get("limit_offset", 80))
-
-    pos = get_position(symbol)
-    if pos:
+    escalera = estrategia.parsear_escalera(data.get("tp_escalera", escalera_tp)) or None
+
+    # El entry de la señal contra el mercado actual (datos locales, sin REST)
+    if side != "CLOSE":
+        mercado.agregar_simbolo(symbol)
+        entry, error_guardia = guardia_entrada.evaluar(symbol, side, entry)
+        senal.marcar("guardia_entrada")
+        if error_guardia:
+            logger.warning("⛔ Señal rechazada por desvío de precio: %s", error_guardia)
+            metricas.incrementar("senales_rechazadas_total", motivo="desvio_entrada")
+            return descartar_senal(senal, {"error": f"❌ {error_guardia}"}, 400)
+
+    # Estado compartido: lo que registraron el líder y los demás workers
+    sincronizar_estado()
+
+    # Límites de la cartera que no dependen del tamaño, antes de consultar la cuenta
+    if side != "CLOSE":
+        motivo_riesgo = motor_riesgo.verificar(symbol)
+        if motivo_riesgo:
+            logger.warning("⛔ Señal rechazada por riesgo de cartera: %s", motivo_riesgo)
+            metricas.incrementar("senales_rechazadas_total", motivo=f"riesgo_{motivo_riesgo}")
+            return descartar_senal(senal, {"error": f"❌ Límite de riesgo de la cartera: {motivo_riesgo}"}, 400)
+
+    # Posición, balance y órdenes abiertas: desde la cache o en paralelo por REST
+    position_amt, usdt, ordenes_abiertas = cuenta.pre_trade(symbol)
+    senal.marcar("consulta_posicion")
+    if position_amt != 0:
         if side != "CLOSE":
-            return jsonify({"message": "⛔ Ya existe una posición abierta. Solo se permite 'CLOSE'."}), 200
+            return {"message": "⛔ Ya existe una posición abierta. Solo se permite 'CLOSE'."}, 200
         else:
             try:
-                direction = "SELL" if float(pos["positionAmt"]) > 0 else "BUY"
-                qty = abs(float(pos["positionAmt"]))
+                direction = "SELL" if position_amt > 0 else "BUY"
+                qty = abs(position_amt)
                 client.new_order(symbol=symbol, side=direction, type="MARKET", quantity=qty)
-                return jsonify({"message": f"✅ Posición cerrada ({direction})", "qty": qty})
+                cuenta.invalidar_simbolo(symbol)
+                senal.marcar("orden_cierre")
+                return {"message": f"✅ Posición cerrada ({direction})", "qty": qty}, 200
             except ClientError as e:
-                return jsonify({"error": str(e)}), 500
+                return {"error": str(e)}, 500
     else:
         if side == "CLOSE":
-            return jsonify({"message": "ℹ️ No hay posición abierta para cerrar"}), 200
+            return {"message": "ℹ️ No hay posición abierta para cerrar"}, 200
 
         try:
-            # Cancelar todas las órdenes abiertas antes de una nueva entrada
-            client.cancel_open_orders(symbol="BTCUSDT")
-            #client.cancel_all_open_orders(symbol=symbol)
-            logger.info(f"🚫 Todas las órdenes abiertas en {symbol} fueron canceladas")
-
-            balances = client.balance()
-            usdt = next(float(b["availableBalance"]) for b in balances if b["asset"] == "USDT")
-            risk_amount = usdt * (risk_percent / 100)
+            # El tamaño pasa por los límites de la cartera antes de cualquier orden: se aprueba,
+            # se achica o se rechaza, y lo aprobado queda reservado
+            decision = motor_riesgo.reservar(symbol, estrategia.cantidad(usdt, risk_percent, sl_distance), entry, sl_distance, usdt)
+            if not decision.qty:
+                logger.warning("⛔ Señal rechazada por riesgo de cartera: %s", decision.motivo)
+                metricas.incrementar("senales_rechazadas_total", motivo=f"riesgo_{decision.motivo}")
+                return descartar_senal(senal, {"error": f"❌ Límite de riesgo de la cartera: {decision.motivo}"}, 400)
+            if decision.escala < 1:
+                logger.warning("📉 Señal achicada al %.0f%% por riesgo de cartera (%s)", decision.escala * 100, decision.motivo)
+                metricas.incrementar("senales_achicadas_total", motivo=decision.motivo)
+
+            filtros_simbolo = filtros.obtener(symbol)
+            qty = float(filtros_simbolo.cantidad(decision.qty))
+            error_filtros = filtros_simbolo.validar_orden(qty, entry)
+            if error_filtros:
+                motor_riesgo.liberar(symbol)
+                logger.warning("⛔ Señal rechazada por filtros: %s", error_filtros)
+                return descartar_senal(senal, {"error": f"❌ {error_filtros}"}, 400)
+            motor_riesgo.ajustar(symbol, qty, entry, sl_distance)
+
+            # Cancelar todas las órdenes abiertas antes de una nueva entrada (solo si las hay)
+            anterior = gestor.obtener(symbol)
+            reemplaza = anterior is not None and anterior.estado == PENDIENTE_ENTRADA
+            if ordenes_abiertas or reemplaza:
+                cuenta.cancelar_ordenes(symbol)
+                logger.info("🚫 Todas las órdenes abiertas en %s fueron canceladas", symbol)
+            # La entrada pendiente que reemplaza esta señal queda cancelada también en el gestor y el diario
+            if reemplaza and gestor.transicion(anterior, PENDIENTE_ENTRADA, CANCELADA):
+                vencimientos.cancelar(anterior.order_id)
+                diario.registrar_cancelacion(anterior.order_id)
 
-            qty = round(risk_amount / sl_distance, 3)
             position_value = entry * qty
-            leverage = min(math.ceil(position_value / usdt), 125)
-            client.change_leverage(symbol=symbol, leverage=leverage)
-
-            offset = float(data.get("limit_offset", 0))
-
-            # Dividimos el offset recibido
-            offset_stop = offset * 0.3
-            offset_limit = offset * 0.7
-
-            # Calculamos stop_price (30% del offset)
-            stop_price = round(entry + offset_stop if side == "BUY" else entry - offset_stop, 2)
+            apalancamiento_max = min(filtros_simbolo.apalancamiento_max(position_value), motor_riesgo.limites.apalancamiento_max)
+            leverage = estrategia.apalancamiento(position_value, usdt, apalancamiento_max)
+            # Solo se llama a change_leverage si cambió
+            cuenta.asegurar_apalancamiento(symbol, leverage)
+            senal.marcar("pre_trade")
+
+            offset = float(data.get("limit_offset", estrategia.LIMIT_OFFSET))
+
+            # stop_price a 30% del offset y limit_price 70% más allá del stop
+            stop_price, limit_price = estrategia.precios_entrada(
+                entry, offset, estrategia.direccion(side),
+                redondear=lambda precio: float(filtros_simbolo.precio(precio)),
+            )
 
-            # Calculamos limit_price (70% adicional sobre stop_price)
-            limit_price = round(stop_price + offset_limit if side == "BUY" else stop_price - offset_limit, 2)
+            # El vencimiento se cuenta desde el envío de la orden
+            inicio_ms = int(time.time() * 1000)
+            vence_ms = None
+            if usar_gtd and estrategia.ESPERA_ENTRADA_MS >= GTD_MINIMO_MS:
+                vence_ms = inicio_ms + estrategia.ESPERA_ENTRADA_MS
 
             # ✅ Intentamos colocar la orden con reintentos internos
-            order_id = colocar_orden_stop_limit(symbol, side, qty, stop_price, limit_price, intentos=3, espera_segundos=1)
+            order_id = colocar_orden_stop_limit(symbol, side, qty, stop_price, limit_price, intentos=3,
+                                                client_order_id=data.get("client_order_id"), vence_ms=vence_ms)
+            senal.marcar("orden_entrada")
 
             # ❌ Si falla, respondemos con error
             if order_id is None:
-                return jsonify({"error": "❌ No se pudo colocar la orden STOP LIMIT"}), 400
-
+                motor_riesgo.liberar(symbol)
+                return {"error": "❌ No se pudo colocar la orden STOP LIMIT"}, 400
+
+            # Se registra antes de cualquier otra cosa para no perder un fill inmediato del stream
+            cuenta.registrar_orden(symbol, order_id)
+            posicion = gestor.abrir(
+                symbol,
+                order_id=order_id,
+                side=side,
+                qty=qty,
+                sl_distance=sl_distance,
+                tp_factor=tp_factor,
+                risk_percent=risk_percent,
+                apalancamiento=leverage,
+                timestamp_inicio=inicio_ms,
+                escalera=escalera,
+            )
+            motor_riesgo.confirmar(symbol)
+            diario.abrir(
+                order_id, symbol, side, entry, qty,
+                precio_stop=stop_price,
+                sl_distance=sl_distance,
+                tp_factor=tp_factor,
+                risk_percent=risk_percent,
+                apalancamiento=leverage,
+                senal_id=senal.id,
+                ts_senal=senal.recibida,
+                ts_orden=inicio_ms,
+            )
+            if order_id in fills_sin_posicion:
+                threading.Thread(target=procesar_entrada_ejecutada, args=(gestor.obtener(symbol),), daemon=True).start()
 
             fecha = obtener_fecha_hora_arg()
 
             mensaje = (
                     f"✅ *Orden STOP LIMIT colocada*\n"
                     f"🕒 Fecha: `{fecha}`\n"
+                    f"🪙 Símbolo: `{symbol}`\n"
                     f"📉 Tipo: *{side}*\n"
             )
 
             enviar_telegram(mensaje)
-            try:
-                if not scheduler.running:
-                    scheduler.start()
-                    logger.info("🚀 Scheduler iniciado.")
-
-                if not scheduler.get_job("ciclo_bot"):
-                    scheduler.add_job(ciclo_bot, 'interval', seconds=5, id="ciclo_bot")
-                    logger.info("⏱ Tarea 'ciclo_bot' programada.")
-            except JobLookupError as e:
-                    logger.error(f"⚠️ Error al buscar job: {e}")
-            except Exception as e:
-                    logger.error(f"❌ Error al iniciar el scheduler o agregar el job: {e}")
-                    
-
-
-            estado_orden.update({
-                "activa": True,
-                "order_id": order_id,
-                "timestamp_inicio": int(time.time() * 1000),
-                "symbol": symbol,
-                "side": side,
-                "qty": qty,
-                "sl_distance": sl_distance,
-                "tp_factor": tp_factor,
-                "risk_percent": risk_percent,
-                "apalancamiento": leverage
-            })
+            if liderazgo.es_lider:
+                programar_vencimiento(posicion)
+                asegurar_monitor()
 
-            return jsonify({
+            return {
                 "msg": "🟢 Orden STOP_LIMIT colocada",
                 "order_id": order_id,
                 "stop_price": stop_price,
-            })
+                "qty": qty,
+                "escala_riesgo": round(decision.escala, 4),
+            }, 200
 
 
         except Exception as e:
-            logger.error(f"❌ Error general en webhook: {e}")
+            # Sin efecto si la entrada ya quedó registrada
+            motor_riesgo.liberar(symbol)
+            logger.error("❌ Error general en webhook: %s", e)
             enviar_telegram(f"❌ Error general en webhook: {e}")
-            return jsonify({"msg": "⚠️ Ocurrió un error interno, la orden no se ejecutó", "detalle": str(e)}), 200
+            return {"msg": "⚠️ Ocurrió un error interno, la orden no se ejecutó", "detalle": str(e)}, 200
+
+
+ejecutor = EjecutorSenales(ejecutar_senal, almacen=gestor.almacen, hilos=hilos_ejecutor)
+
+# Señales recientes (memoria + SQLite compartido): los reintentos de TradingView no se ejecutan dos veces
+indice_senales = IndiceIdempotencia(gestor.almacen)
 
+
+# === Métricas para Prometheus ===
+
+@app.route('/metrics', methods=['GET'])
+def exportar_metricas():
+    metricas.fijar("senales_en_cola", ejecutor.pendientes())
+    return Response(metricas.exportar(), mimetype="text/plain; version=0.0.4")
+
+
+# === Webhook para recibir señales ===
+
+@app.route('/webhook', methods=['POST'])
+@metricas.cronometrar("webhook_respuesta_seconds")
+def webhook():
+    data = request.get_json(silent=True)
+
+    if webhook_secret and (not isinstance(data, dict) or data.get("secret") != webhook_secret):
+        return jsonify({"error": "❌ Webhook no autorizado"}), 403
+
+    error = validar_senal(data)
+    if error:
+        return jsonify({"error": f"❌ {error}"}), 400
+
+    # El secreto no se guarda junto con la señal
+    datos = {k: v for k, v in data.items() if k != "secret"}
+
+    clave = clave_senal(datos)
+    reserva = indice_senales.reservar(clave, nuevo_id())
+    if reserva.duplicada:
+        logger.warning("🔁 Señal duplicada, ya recibida como %s", reserva.senal_id, extra={"senal_id": reserva.senal_id})
+        return jsonify({
+            "msg": "🔁 Señal duplicada, ya recibida",
+            "signal_id": reserva.senal_id,
+            "status_url": f"/signals/{reserva.senal_id}",
+        }), 200
+    # Misma clave -> mismo newClientOrderId en todos los intentos de la orden de entrada
+    datos["client_order_id"] = reserva.client_order_id
+
+    if modo_webhook == "sincrono":
+        senal = ejecutor.ejecutar(Senal(datos, reserva.senal_id))
+        return jsonify(senal.resultado), senal.codigo
+
+    try:
+        senal = ejecutor.encolar(datos, reserva.senal_id)
+    except queue.Full:
+        indice_senales.liberar(clave, reserva.senal_id)
+        logger.error("❌ Cola de señales llena, señal descartada.")
+        return jsonify({"error": "❌ Cola de señales llena, reintentar"}), 503
+
+    return jsonify({
+        "msg": "📥 Señal recibida",
+        "signal_id": senal.id,
+        "status_url": f"/signals/{senal.id}",
+    }), 202
+
+
+# === Posiciones abiertas en vivo ===
+
+@app.route('/positions', methods=['GET'])
+def posiciones_abiertas():
+    """PnL no realizado, R, distancia a SL / TP / liquidación y margen de cada posición (sin REST)."""
+    sincronizar_estado()
+    exposicion.sincronizar(gestor.activas())
+    sincronizar_cuenta()
+    estado = exposicion.estado()
+    estado["riesgo"] = motor_riesgo.estado()
+    estado["stops"] = stops.seguidos()
+    estado["rol"] = "lider" if liderazgo.es_lider else "seguidor"
+    return jsonify(estado), 200
+
+
+# === Reportes del diario de operaciones ===
+
+@app.route('/report', methods=['GET'])
+def reporte_operaciones():
+    """
+    ?periodo=dia|semana, o ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD; opcionales ?symbol= y
+    ?detalle=1 (incluye las operaciones del rango).
+    """
+    symbol = request.args.get("symbol")
+    desde = request.args.get("desde")
+    if desde:
+        hasta = request.args.get("hasta") or datetime.now(ZONA_AR).date().isoformat()
+        try:
+            inicio = datetime.strptime(desde, "%Y-%m-%d")
+            fin = datetime.strptime(hasta, "%Y-%m-%d")
+        except ValueError:
+            return jsonify({"error": "❌ Fechas inválidas, formato YYYY-MM-DD"}), 400
+        reporte = diario.reporte(desde, hasta, symbol)
+    else:
+        periodo = request.args.get("periodo", "dia")
+        if periodo not in ("dia", "semana"):
+            return jsonify({"error": f"❌ periodo inválido: {periodo}"}), 400
+        reporte = diario.reporte_periodo(periodo, symbol)
+        inicio = datetime.strptime(reporte["desde"], "%Y-%m-%d")
+        fin = datetime.strptime(reporte["hasta"], "%Y-%m-%d")
+
+    if request.args.get("detalle") == "1":
+        desde_ms = int(ZONA_AR.localize(inicio).timestamp() * 1000)
+        hasta_ms = int(ZONA_AR.localize(fin + timedelta(days=1)).timestamp() * 1000) - 1
+        reporte["operaciones_detalle"] = diario.operaciones(desde_ms, hasta_ms, symbol)
+    return jsonify(reporte), 200
+
+
+@app.route('/signals/<senal_id>', methods=['GET'])
+def estado_senal(senal_id):
+    senal = ejecutor.obtener(senal_id)
+    if senal is None:
+        return jsonify({"error": "❌ Señal no encontrada"}), 404
+    return jsonify(senal), 200
@@ -0,0 +1,385 @@
+"""
+Backtest de la estrategia del webhook sobre velas históricas de 1m.
+
+Reproduce las reglas de estrategia.py: tamaño por riesgo, orden STOP LIMIT con el limit_offset
+repartido 30/70, vencimiento de la entrada a los 60 min, SL (STOP_MARKET) y TP (LIMIT) según
+tp_factor, comisiones, una sola posición por símbolo (las señales con posición abierta se
+rechazan y una señal nueva cancela la entrada pendiente) y balance compuesto.
+
+Uso:
+    python backtest.py --velas BTCUSDT-1m.csv --senales senales.csv
+    python backtest.py --velas BTCUSDT-1m.parquet --senales senales.jsonl --tick 0.1 --step 0.001 --salida trades.csv
+
+Velas: CSV de data.binance.vision (open_time, open, high, low, close, ...; con o sin encabezado)
+o Parquet con esas columnas (requiere pandas + pyarrow).
+Señales: CSV con encabezado o JSON por línea, con `time` (ms o ISO 8601) y los mismos campos que
+recibe /webhook (side, entry, sl_distance, tp_factor, risk_percent, limit_offset).
+"""
+import argparse
+import csv
+import heapq
+import json
+import math
+import time
+from datetime import datetime
+import numpy as np
+import estrategia
+
+COMISION_TAKER = 0.0004
+COMISION_MAKER = 0.0002
+BALANCE_INICIAL = 1000.0
+
+# Ventana inicial (en velas) de la búsqueda vectorizada del primer cruce; crece x4 en cada vuelta
+VENTANA_INICIAL = 64
+VENTANA_MAXIMA = 16384
+NUNCA = np.iinfo(np.int64).max
+
+# === Resultado de cada señal ===
+EJECUTADA_TP = "TP"
+EJECUTADA_SL = "SL"
+ABIERTA = "ABIERTA"
+VENCIDA = "VENCIDA"
+CANCELADA = "CANCELADA"
+RECHAZADA = "RECHAZADA"
+
+
+# === Carga de datos ===
+
+def cargar_velas(ruta):
+    """Devuelve un dict de arreglos: tiempo (ms de apertura), apertura, maximo, minimo, cierre."""
+    if ruta.endswith(".parquet"):
+        try:
+            import pandas as pd
+        except ImportError:
+            raise SystemExit("❌ Leer Parquet requiere pandas y pyarrow (pip install pandas pyarrow)")
+        tabla = pd.read_parquet(ruta)
+        columnas = ["open_time", "open", "high", "low", "close"]
+        datos = tabla[columnas].to_numpy(dtype=np.float64)
+    else:
+        with open(ruta) as archivo:
+            primera = archivo.readline()
+        encabezado = not primera.split(",")[0].strip().lstrip("-").isdigit()
+        datos = np.loadtxt(ruta, delimiter=",", usecols=range(5), skiprows=1 if encabezado else 0, ndmin=2)
+
+    tiempo = datos[:, 0].astype(np.int64)
+    # Los archivos nuevos de data.binance.vision vienen en microsegundos
+    if tiempo.size and tiempo[0] > 10 ** 14:
+        tiempo //= 1000
+    orden = np.argsort(tiempo, kind="stable")
+    return {
+        "tiempo": tiempo[orden],
+        "apertura": datos[orden, 1],
+        "maximo": datos[orden, 2],
+        "minimo": datos[orden, 3],
+        "cierre": datos[orden, 4],
+    }
+
+
+def _tiempo_ms(valor):
+    texto = str(valor).strip()
+    if texto.lstrip("-").isdigit():
+        return int(texto)
+    return int(datetime.fromisoformat(texto.replace("Z", "+00:00")).timestamp() * 1000)
+
+
+def cargar_senales(ruta, symbol=None):
+    """Señales ordenadas por tiempo como dict de arreglos (solo BUY/SELL, opcionalmente de un símbolo)."""
+    with open(ruta) as archivo:
+        if ruta.endswith((".jsonl", ".json")):
+            filas = [json.loads(linea) for linea in archivo if linea.strip()]
+        else:
+            filas = list(csv.DictReader(archivo))
+
+    filas = [f for f in filas if str(f.get("side", "")).upper() in ("BUY", "SELL")]
+    if symbol:
+        filas = [f for f in filas if f.get("symbol", symbol) == symbol]
+    filas.sort(key=lambda f: _tiempo_ms(f["time"]))
+
+    def columna(campo, defecto):
+        return np.array([float(f.get(campo) or defecto) for f in filas], dtype=np.float64)
+
+    return {
+        "tiempo": np.array([_tiempo_ms(f["time"]) for f in filas], dtype=np.int64),
+        "direccion": np.array([estrategia.direccion(str(f["side"]).upper()) for f in filas], dtype=np.int64),
+        "entry": columna("entry", 0),
+        "sl_distance": columna("sl_distance", 0),
+        "tp_factor": columna("tp_factor", estrategia.TP_FACTOR),
+        "risk_percent": columna("risk_percent", estrategia.RISK_PERCENT),
+        "limit_offset": columna("limit_offset", estrategia.LIMIT_OFFSET),
+    }
+
+
+# === Búsqueda vectorizada ===
+
+def primer_cruce(valores, desde, hasta, umbral, por_encima):
+    """
+    Para cada señal i, primer índice k en [desde[i], hasta[i]) con valores[k] >= umbral[i]
+    (si por_encima[i]) o valores[k] <= umbral[i]; -1 si no hay. Revisa todas las señales a la
+    vez en ventanas que crecen, así las que cruzan pronto no obligan a mirar toda la serie.
+    """
+    n = len(desde)
+    resultado = np.full(n, -1, dtype=np.int64)
+    if n == 0 or len(valores) == 0:
+        return resultado
+
+    pendientes = np.flatnonzero(desde < hasta)
+    inicio = desde.astype(np.int64).copy()
+    ancho = VENTANA_INICIAL
+    ultimo = len(valores) - 1
+
+    while pendientes.size:
+        indices = inicio[pendientes, None] + np.arange(ancho)
+        validos = indices < hasta[pendientes, None]
+        v = valores[np.minimum(indices, ultimo)]
+        u = umbral[pendientes, None]
+        cruza = np.where(por_encima[pendientes, None], v >= u, v <= u) & validos
+
+        hay = cruza.any(axis=1)
+        posicion = cruza.argmax(axis=1)
+        resultado[pendientes[hay]] = indices[hay, posicion[hay]]
+
+        inicio[pendientes] += ancho
+        pendientes = pendientes[~hay & (inicio[pendientes] < hasta[pendientes])]
+        ancho = min(ancho * 4, VENTANA_MAXIMA)
+
+    return resultado
+
+
+def _primer_cruce_lado(compra, serie_compra, serie_venta, desde, hasta, umbral, sube_en_compra):
+    """
+    `primer_cruce` con `serie_compra` para las señales BUY y `serie_venta` para las SELL.
+    `sube_en_compra`: en BUY se busca valores >= umbral; en SELL, al revés.
+    """
+    resultado = np.full(len(desde), -1, dtype=np.int64)
+    for es_compra, serie in ((True, serie_compra), (False, serie_venta)):
+        indices = np.flatnonzero(compra == es_compra)
+        por_encima = np.full(indices.size, sube_en_compra == es_compra)
+        resultado[indices] = primer_cruce(serie, desde[indices], hasta[indices], umbral[indices], por_encima)
+    return resultado
+
+
+def _redondear(precios, paso):
+    if not paso:
+        return precios
+    return np.floor(precios / paso + 0.5) * paso
+
+
+# === Simulación ===
+
+def simular(velas, senales, balance=BALANCE_INICIAL, tp_factor=None, limit_offset=None, risk_percent=None,
+            espera_ms=estrategia.ESPERA_ENTRADA_MS, comision_taker=COMISION_TAKER, comision_maker=COMISION_MAKER,
+            tick=None, step=None):
+    """
+    Corre el backtest. `tp_factor`, `limit_offset` y `risk_percent` reemplazan a los de las
+    señales si se indican. Devuelve (trades, resumen): trades es un dict de arreglos con una
+    fila por señal.
+    """
+    tiempo = velas["tiempo"]
+    apertura, maximo, minimo, cierre = velas["apertura"], velas["maximo"], velas["minimo"], velas["cierre"]
+    n_velas = len(tiempo)
+    n = len(senales["tiempo"])
+    if n_velas == 0:
+        raise ValueError("No hay velas para simular")
+
+    d = senales["direccion"]
+    compra = d > 0
+    sl_distance = senales["sl_distance"]
+    tp_f = np.full(n, tp_factor, dtype=np.float64) if tp_factor is not None else senales["tp_factor"]
+    offset = np.full(n, limit_offset, dtype=np.float64) if limit_offset is not None else senales["limit_offset"]
+    riesgo = np.full(n, risk_percent, dtype=np.float64) if risk_percent is not None else senales["risk_percent"]
+
+    redondear = lambda precios: _redondear(precios, tick)
+    stop, limite = estrategia.precios_entrada(senales["entry"], offset, d, redondear=redondear)
+
+    # 1. Entrada: la orden vive desde la vela siguiente a la señal hasta el vencimiento
+    desde = np.searchsorted(tiempo, senales["tiempo"], side="left")
+    vence = np.searchsorted(tiempo, senales["tiempo"] + espera_ms, side="left")
+
+    # BUY se dispara cuando el máximo toca el stop; SELL cuando lo toca el mínimo
+    disparo = _primer_cruce_lado(compra, maximo, minimo, desde, vence, stop, True)
+    disparada = disparo >= 0
+    k = np.where(disparada, disparo, 0)
+    # Si la vela abre más allá del stop el precio de disparo es la apertura
+    precio_disparo = np.where(compra, np.maximum(apertura[k], stop), np.minimum(apertura[k], stop))
+    dentro_limite = np.where(compra, precio_disparo <= limite, precio_disparo >= limite)
+
+    # Disparada pero fuera del límite: queda como LIMIT en el libro hasta el vencimiento
+    en_libro = disparada & ~dentro_limite
+    llenado_libro = _primer_cruce_lado(compra, minimo, maximo, np.where(en_libro, k + 1, vence), vence, limite, False)
+
+    vela_entrada = np.where(disparada & dentro_limite, k, llenado_libro)
+    ejecutada = vela_entrada >= 0
+    precio_entrada = np.where(disparada & dentro_limite, precio_disparo, limite)
+    maker_entrada = en_libro
+
+    # 2. Salida: SL y TP desde la vela siguiente a la entrada
+    sl, tp = estrategia.precios_salida(precio_entrada, sl_distance, tp_f, d, redondear=redondear)
+    desde_salida = np.where(ejecutada, vela_entrada + 1, n_velas)
+    fin = np.full(n, n_velas, dtype=np.int64)
+    vela_sl = _primer_cruce_lado(compra, minimo, maximo, desde_salida, fin, sl, False)
+    vela_tp = _primer_cruce_lado(compra, maximo, minimo, desde_salida, fin, tp, True)
+
+    sl_primero = (vela_sl >= 0) & ((vela_tp < 0) | (vela_sl <= vela_tp))   # misma vela: se asume el SL
+    tp_primero = (vela_tp >= 0) & ~sl_primero
+    vela_salida = np.where(sl_primero, vela_sl, np.where(tp_primero, vela_tp, -1))
+    s = np.where(vela_salida >= 0, vela_salida, n_velas - 1)
+    # El STOP_MARKET se ejecuta al SL o a la apertura si la vela saltó más allá del SL
+    precio_sl = np.where(compra, np.minimum(apertura[s], sl), np.maximum(apertura[s], sl))
+    precio_salida = np.where(sl_primero, precio_sl, np.where(tp_primero, tp, cierre[s]))
+    t_entrada = np.where(ejecutada, tiempo[np.maximum(vela_entrada, 0)], NUNCA)
+    t_salida = np.where(ejecutada & (vela_salida >= 0), tiempo[s], NUNCA)
+    # Hasta cuándo la entrada sigue pendiente (una señal nueva la cancelaría)
+    t_fin_entrada = np.where(ejecutada, t_entrada, senales["tiempo"] + espera_ms)
+
+    # 3. Recorrido secuencial por señal (no por vela): una posición a la vez y balance compuesto
+    estado = np.empty(n, dtype=object)
+    cantidad = np.zeros(n)
+    pnl = np.zeros(n)
+    comision = np.zeros(n)
+    balance_tras = np.zeros(n)
+    por_liquidar = []
+    actual = None
+
+    for i in range(n):
+        t = senales["tiempo"][i]
+        while por_liquidar and por_liquidar[0][0] <= t:
+            _, j = heapq.heappop(por_liquidar)
+            balance += pnl[j] - comision[j]
+            balance_tras[j] = balance
+
+        if actual is not None:
+            if t_entrada[actual] <= t < t_salida[actual]:
+                # Ya hay una posición abierta: solo se permitiría CLOSE
+                estado[i] = RECHAZADA
+                continue
+            if t < t_fin_entrada[actual]:
+                # La señal nueva cancela la entrada que seguía pendiente
+                estado[actual] = CANCELADA
+                por_liquidar = [(ts, j) for ts, j in por_liquidar if j != actual]
+                heapq.heapify(por_liquidar)
+                cantidad[actual] = pnl[actual] = comision[actual] = 0
+
+        if not ejecutada[i]:
+            estado[i] = VENCIDA
+            actual = i
+            continue
+
+        q = estrategia.cantidad(balance, riesgo[i], sl_distance[i])
+        if step:
+            q = math.floor(q / step + 1e-9) * step
+        if q <= 0:
+            # Sin balance la orden no pasaría los filtros del exchange
+            estado[i] = RECHAZADA
+            continue
+
+        actual = i
+        cantidad[i] = q
+        pnl[i] = estrategia.pnl(precio_entrada[i], precio_salida[i], q, d[i])
+        comision[i] = q * precio_entrada[i] * (comision_maker if maker_entrada[i] else comision_taker)
+        if tp_primero[i]:
+            comision[i] += q * precio_salida[i] * comision_maker
+            estado[i] = EJECUTADA_TP
+        elif sl_primero[i]:
+            comision[i] += q * precio_salida[i] * comision_taker
+            estado[i] = EJECUTADA_SL
+        else:
+            estado[i] = ABIERTA
+            continue
+        heapq.heappush(por_liquidar, (t_salida[i], i))
+
+    while por_liquidar:
+        _, j = heapq.heappop(por_liquidar)
+        balance += pnl[j] - comision[j]
+        balance_tras[j] = balance
+
+    trades = {
+        "tiempo": senales["tiempo"],
+        "direccion": d,
+        "estado": estado,
+        "stop": stop,
+        "limite": limite,
+        "precio_entrada": np.where(ejecutada, precio_entrada, np.nan),
+        "precio_salida": np.where(ejecutada, precio_salida, np.nan),
+        "tiempo_entrada": np.where(ejecutada, t_entrada, 0),
+        "tiempo_salida": np.where(t_salida < NUNCA, t_salida, 0),
+        "cantidad": cantidad,
+        "pnl": pnl,
+        "comision": comision,
+        "balance": balance_tras,
+    }
+    return trades, resumir(trades, balance)
+
+
+def resumir(trades, balance_final):
+    estado = trades["estado"]
+    cerradas = np.isin(estado, (EJECUTADA_TP, EJECUTADA_SL))
+    ejecutadas = cerradas | (estado == ABIERTA)
+    consideradas = int(np.count_nonzero(estado != RECHAZADA) - np.count_nonzero(estado == CANCELADA))
+
+    neto = (trades["pnl"] - trades["comision"])[cerradas]
+    orden = np.argsort(trades["tiempo_salida"][cerradas], kind="stable")
+    curva = np.concatenate(([0.0], np.cumsum(neto[orden])))
+    drawdown = float(np.max(np.maximum.accumulate(curva) - curva)) if curva.size else 0.0
+
+    return {
+        "senales": int(len(estado)),
+        "ejecutadas": int(np.count_nonzero(ejecutadas)),
+        "tp": int(np.count_nonzero(estado == EJECUTADA_TP)),
+        "sl": int(np.count_nonzero(estado == EJECUTADA_SL)),
+        "abiertas": int(np.count_nonzero(estado == ABIERTA)),
+        "vencidas": int(np.count_nonzero(estado == VENCIDA)),
+        "canceladas": int(np.count_nonzero(estado == CANCELADA)),
+        "rechazadas": int(np.count_nonzero(estado == RECHAZADA)),
+        "tasa_llenado": round(np.count_nonzero(ejecutadas) / float(consideradas), 4) if consideradas else 0.0,
+        "pnl_neto": round(float(neto.sum()), 4),
+        "comisiones": round(float(trades["comision"][cerradas].sum()), 4),
+        "max_drawdown": round(drawdown, 4),
+        "balance_final": round(float(balance_final), 4),
+    }
+
+
+def guardar_trades(trades, ruta):
+    campos = list(trades)
+    with open(ruta, "w", newline="") as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(campos)
+        for fila in zip(*(trades[c] for c in campos)):
+            escritor.writerow(fila)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest de la estrategia del webhook sobre velas de 1m")
+    parser.add_argument("--velas", required=True, help="CSV o Parquet de velas de 1m")
+    parser.add_argument("--senales", required=True, help="CSV o JSONL de señales")
+    parser.add_argument("--symbol", help="usar solo las señales de este símbolo")
+    parser.add_argument("--balance", type=float, default=BALANCE_INICIAL)
+    parser.add_argument("--tp-factor", type=float, help="reemplaza el tp_factor de las señales")
+    parser.add_argument("--limit-offset", type=float, help="reemplaza el limit_offset de las señales")
+    parser.add_argument("--risk-percent", type=float, help="reemplaza el risk_percent de las señales")
+    parser.add_argument("--espera-min", type=float, default=estrategia.ESPERA_ENTRADA_MS / 60000, help="vencimiento de la entrada")
+    parser.add_argument("--tick", type=float, help="tickSize para redondear precios")
+    parser.add_argument("--step", type=float, help="stepSize para redondear cantidades")
+    parser.add_argument("--salida", help="CSV donde guardar el detalle por señal")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    velas = cargar_velas(args.velas)
+    senales = cargar_senales(args.senales, args.symbol)
+    carga = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    trades, resumen = simular(
+        velas, senales, balance=args.balance, tp_factor=args.tp_factor, limit_offset=args.limit_offset,
+        risk_percent=args.risk_percent, espera_ms=int(args.espera_min * 60000), tick=args.tick, step=args.step,
+    )
+    simulacion = time.perf_counter() - inicio
+
+    if args.salida:
+        guardar_trades(trades, args.salida)
+
+    print(json.dumps(resumen, indent=2, ensure_ascii=False))
+    print(f"⏱ {len(velas['tiempo'])} velas y {len(senales['tiempo'])} señales: carga {carga:.2f}s, simulación {simulacion:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Barrido de parámetros de la estrategia sobre el backtest (backtest.py).
+
+Prueba todas las combinaciones de tp_factor, limit_offset, risk_percent y ventana de
+vencimiento de la entrada en un pool de procesos. Las velas se cargan una sola vez en
+memoria compartida (los workers las leen sin copiarlas) y cada resultado se guarda en disco
+con una clave que depende de los datos y de los parámetros, así volver a correr un barrido
+solo calcula las combinaciones nuevas.
+
+Uso:
+    python barrido.py --velas BTCUSDT-1m.csv --senales senales.jsonl \\
+        --tp-factor 1.5,2,2.5,3 --limit-offset 0,20,40,80 --risk-percent 0.5,1 --espera-min 30,60,90
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import backtest
+import estrategia
+
+CARPETA_CACHE = ".barrido_cache"
+PARAMETROS = ("tp_factor", "limit_offset", "risk_percent", "espera_min")
+ORDENES = ("pnl_neto", "max_drawdown", "tasa_llenado", "pnl_sobre_drawdown")
+
+# Estado de cada worker (lo arma `_iniciar_worker`)
+_velas = None
+_senales = None
+_opciones = None
+_memorias = []
+
+
+# === Memoria compartida ===
+
+def _compartir(arreglo):
+    memoria = shared_memory.SharedMemory(create=True, size=max(arreglo.nbytes, 1))
+    copia = np.ndarray(arreglo.shape, dtype=arreglo.dtype, buffer=memoria.buf)
+    copia[:] = arreglo
+    return memoria, (memoria.name, arreglo.shape, arreglo.dtype.str)
+
+
+def _adjuntar(descriptor):
+    nombre, forma, tipo = descriptor
+    memoria = shared_memory.SharedMemory(name=nombre)
+    _memorias.append(memoria)
+    return np.ndarray(forma, dtype=np.dtype(tipo), buffer=memoria.buf)
+
+
+def _iniciar_worker(descriptor_tiempo, descriptor_precios, senales, opciones):
+    global _velas, _senales, _opciones
+    precios = _adjuntar(descriptor_precios)
+    _velas = {
+        "tiempo": _adjuntar(descriptor_tiempo),
+        "apertura": precios[0],
+        "maximo": precios[1],
+        "minimo": precios[2],
+        "cierre": precios[3],
+    }
+    _senales = senales
+    _opciones = opciones
+
+
+def _evaluar(parametros):
+    _, resumen = backtest.simular(
+        _velas, _senales,
+        tp_factor=parametros["tp_factor"],
+        limit_offset=parametros["limit_offset"],
+        risk_percent=parametros["risk_percent"],
+        espera_ms=int(parametros["espera_min"] * 60000),
+        **_opciones,
+    )
+    return parametros, resumen
+
+
+# === Cache en disco ===
+
+def huella_datos(ruta_velas, ruta_senales):
+    """Identifica los archivos de entrada sin releer las velas (tamaño y fecha) y con el contenido de las señales."""
+    estado = os.stat(ruta_velas)
+    h = hashlib.sha256(f"{os.path.abspath(ruta_velas)}|{estado.st_size}|{estado.st_mtime_ns}".encode())
+    with open(ruta_senales, "rb") as archivo:
+        h.update(archivo.read())
+    return h.hexdigest()
+
+
+def clave_cache(huella, parametros, opciones):
+    texto = json.dumps({"datos": huella, "parametros": parametros, "opciones": opciones}, sort_keys=True)
+    return hashlib.sha256(texto.encode()).hexdigest()[:32]
+
+
+def leer_cache(carpeta, clave):
+    try:
+        with open(os.path.join(carpeta, f"{clave}.json")) as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return None
+
+
+def escribir_cache(carpeta, clave, resumen):
+    ruta = os.path.join(carpeta, f"{clave}.json")
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w") as archivo:
+        json.dump(resumen, archivo)
+    os.replace(temporal, ruta)
+
+
+# === Barrido ===
+
+def combinaciones(grilla):
+    """Producto cartesiano de la grilla: una lista de dicts con los PARAMETROS."""
+    valores = [grilla[p] for p in PARAMETROS]
+    return [dict(zip(PARAMETROS, combinacion)) for combinacion in itertools.product(*valores)]
+
+
+def barrer(velas, senales, grilla, opciones=None, huella=None, carpeta_cache=CARPETA_CACHE, procesos=None):
+    """
+    Corre el backtest para cada combinación de la grilla. Devuelve una lista de
+    (parametros, resumen) en el orden de la grilla y cuántos resultados salieron de la cache.
+    """
+    opciones = opciones or {}
+    pendientes = []
+    resultados = {}
+
+    for i, parametros in enumerate(combinaciones(grilla)):
+        clave = clave_cache(huella, parametros, opciones) if huella else None
+        resumen = leer_cache(carpeta_cache, clave) if clave else None
+        if resumen is not None:
+            resultados[i] = (parametros, resumen)
+        else:
+            pendientes.append((i, clave, parametros))
+
+    desde_cache = len(resultados)
+    if pendientes:
+        if huella:
+            os.makedirs(carpeta_cache, exist_ok=True)
+
+        memorias = []
+        try:
+            memoria_tiempo, descriptor_tiempo = _compartir(velas["tiempo"])
+            memorias.append(memoria_tiempo)
+            precios = np.stack([velas["apertura"], velas["maximo"], velas["minimo"], velas["cierre"]])
+            memoria_precios, descriptor_precios = _compartir(precios)
+            memorias.append(memoria_precios)
+            del precios
+
+            with ProcessPoolExecutor(
+                max_workers=procesos,
+                initializer=_iniciar_worker,
+                initargs=(descriptor_tiempo, descriptor_precios, senales, opciones),
+            ) as pool:
+                trabajos = [parametros for _, _, parametros in pendientes]
+                tamano_lote = max(1, len(trabajos) // ((procesos or os.cpu_count() or 1) * 4))
+                for (i, clave, _), (parametros, resumen) in zip(pendientes, pool.map(_evaluar, trabajos, chunksize=tamano_lote)):
+                    resultados[i] = (parametros, resumen)
+                    if clave:
+                        escribir_cache(carpeta_cache, clave, resumen)
+        finally:
+            for memoria in memorias:
+                memoria.close()
+                memoria.unlink()
+
+    return [resultados[i] for i in sorted(resultados)], desde_cache
+
+
+def ranking(resultados, orden="pnl_neto"):
+    filas = []
+    for parametros, resumen in resultados:
+        fila = dict(parametros, **resumen)
+        drawdown = resumen["max_drawdown"]
+        fila["pnl_sobre_drawdown"] = round(resumen["pnl_neto"] / drawdown, 4) if drawdown else None
+        filas.append(fila)
+
+    # El drawdown se ordena de menor a mayor; el resto de mayor a menor
+    ascendente = orden == "max_drawdown"
+    sin_valor = float("inf") if ascendente else float("-inf")
+    filas.sort(key=lambda f: f[orden] if f[orden] is not None else sin_valor, reverse=not ascendente)
+    return filas
+
+
+def imprimir(filas, limite):
+    columnas = list(PARAMETROS) + ["pnl_neto", "max_drawdown", "pnl_sobre_drawdown", "tasa_llenado", "tp", "sl", "balance_final"]
+    print(" | ".join(["#"] + columnas))
+    for posicion, fila in enumerate(filas[:limite], start=1):
+        print(" | ".join([str(posicion)] + [str(fila[c]) for c in columnas]))
+
+
+def _lista(texto):
+    return [float(v) for v in texto.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Barrido de parámetros sobre el backtest")
+    parser.add_argument("--velas", required=True, help="CSV o Parquet de velas de 1m")
+    parser.add_argument("--senales", required=True, help="CSV o JSONL de señales")
+    parser.add_argument("--symbol", help="usar solo las señales de este símbolo")
+    parser.add_argument("--tp-factor", default=str(estrategia.TP_FACTOR))
+    parser.add_argument("--limit-offset", default=str(estrategia.LIMIT_OFFSET))
+    parser.add_argument("--risk-percent", default=str(estrategia.RISK_PERCENT))
+    parser.add_argument("--espera-min", default=str(estrategia.ESPERA_ENTRADA_MS // 60000))
+    parser.add_argument("--balance", type=float, default=backtest.BALANCE_INICIAL)
+    parser.add_argument("--tick", type=float)
+    parser.add_argument("--step", type=float)
+    parser.add_argument("--procesos", type=int, help="workers del pool (por defecto, uno por CPU)")
+    parser.add_argument("--orden", choices=ORDENES, default="pnl_neto")
+    parser.add_argument("--top", type=int, default=20, help="filas a mostrar")
+    parser.add_argument("--salida", help="CSV con el ranking completo")
+    parser.add_argument("--cache", default=CARPETA_CACHE, help="carpeta de la cache de resultados")
+    parser.add_argument("--sin-cache", action="store_true")
+    args = parser.parse_args()
+
+    grilla = {
+        "tp_factor": _lista(args.tp_factor),
+        "limit_offset": _lista(args.limit_offset),
+        "risk_percent": _lista(args.risk_percent),
+        "espera_min": _lista(args.espera_min),
+    }
+    opciones = {"balance": args.balance, "tick": args.tick, "step": args.step}
+
+    inicio = time.perf_counter()
+    velas = backtest.cargar_velas(args.velas)
+    senales = backtest.cargar_senales(args.senales, args.symbol)
+    huella = None if args.sin_cache else huella_datos(args.velas, args.senales) + (args.symbol or "")
+    carga = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    resultados, desde_cache = barrer(velas, senales, grilla, opciones, huella, args.cache, args.procesos)
+    duracion = time.perf_counter() - inicio
+
+    filas = ranking(resultados, args.orden)
+    imprimir(filas, args.top)
+
+    if args.salida:
+        with open(args.salida, "w", newline="") as archivo:
+            escritor = csv.DictWriter(archivo, fieldnames=list(filas[0]) if filas else [])
+            escritor.writeheader()
+            escritor.writerows(filas)
+
+    print(f"⏱ {len(resultados)} combinaciones ({desde_cache} desde cache) en {duracion:.2f}s; carga de datos {carga:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
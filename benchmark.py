@@ -0,0 +1,189 @@
+"""
+Benchmark de punta a punta contra el exchange simulado (simulador.py).
+
+Envía una ráfaga de señales a /webhook, mueve el precio para ejecutar todas las entradas
+y mide, para cada modo de ejecución:
+    - throughput de señales procesadas por segundo
+    - latencia de respuesta del webhook
+    - latencia señal → orden de entrada colocada
+    - latencia fill → SL/TP colocados
+
+Uso:
+    python benchmark.py --senales 50 --latencia 20,60 --latencia-stream 30
+    python benchmark.py --modos cola+stream,sincrono+polling --tasa-error 0.02
+
+Cada modo corre en un proceso aparte porque app.py lee su configuración al importarse.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MODOS = {
+    "cola+stream": {"WEBHOOK_MODO": "cola", "USAR_STREAM_USUARIO": "1"},
+    "cola+polling": {"WEBHOOK_MODO": "cola", "USAR_STREAM_USUARIO": "0"},
+    "sincrono+stream": {"WEBHOOK_MODO": "sincrono", "USAR_STREAM_USUARIO": "1"},
+    "sincrono+polling": {"WEBHOOK_MODO": "sincrono", "USAR_STREAM_USUARIO": "0"},
+}
+
+PRECIO_INICIAL = 100.0
+SECRETO = "benchmark"
+MARCA_RESULTADO = "RESULTADO_BENCHMARK "
+
+
+def _ms(percentiles):
+    return {f"p{int(q * 100)}": round(v * 1000, 2) for q, v in percentiles.items()}
+
+
+def _esperar(condicion, timeout, intervalo=0.01):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(intervalo)
+    return condicion()
+
+
+# === Una corrida (proceso hijo) ===
+
+def correr_modo(modo, senales, concurrencia, timeout):
+    import logging
+    import app as bot
+    from ejecutor import COMPLETADA, FALLIDA
+    from posiciones import PROTEGIDA
+    from metricas import metricas
+
+    logging.getLogger().setLevel(logging.WARNING)
+    bot.crear_app()
+    bot.arranque_listo.wait(timeout)
+    simbolos = list(bot.exchange_simulado.simbolos)[:senales]
+
+    def enviar(symbol):
+        cliente = bot.app.test_client()
+        inicio = time.perf_counter()
+        respuesta = cliente.post("/webhook", json={
+            "secret": SECRETO,
+            "symbol": symbol,
+            "side": "BUY",
+            "entry": PRECIO_INICIAL,
+            "sl_distance": 1,
+            "tp_factor": 2,
+            "risk_percent": 0.1,
+            "limit_offset": 0.5,
+        })
+        return respuesta.status_code, respuesta.get_json(), time.perf_counter() - inicio
+
+    # 1. Ráfaga de señales
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        respuestas = list(pool.map(enviar, simbolos))
+
+    ids = [r[1]["signal_id"] for r in respuestas if r[0] == 202]
+    if ids:
+        _esperar(lambda: all(bot.ejecutor.obtener(i)["estado"] in (COMPLETADA, FALLIDA) for i in ids), timeout)
+    duracion = time.perf_counter() - inicio
+    colocadas = [p.symbol for p in bot.gestor.activas()]
+
+    # 2. El precio cruza el stop de todas las entradas
+    inicio_fills = time.perf_counter()
+    for symbol in colocadas:
+        bot.exchange_simulado.mover_precio(symbol, PRECIO_INICIAL + 0.3)
+    _esperar(lambda: all(p.estado == PROTEGIDA for p in bot.gestor.activas()), timeout)
+    protegidas = sum(1 for p in bot.gestor.activas() if p.estado == PROTEGIDA)
+    duracion_fills = time.perf_counter() - inicio_fills
+
+    return {
+        "modo": modo,
+        "senales": len(simbolos),
+        "ordenes_colocadas": len(colocadas),
+        "protegidas": protegidas,
+        "throughput_senales_s": round(len(simbolos) / duracion, 2),
+        "duracion_fills_s": round(duracion_fills, 3),
+        "webhook_ms": _ms(metricas.percentiles("webhook_respuesta_seconds")),
+        "senal_a_orden_ms": _ms(metricas.percentiles("senal_etapa_seconds", etapa="orden_entrada")),
+        "fill_a_proteccion_ms": _ms(metricas.percentiles("fill_a_proteccion_seconds")),
+        "errores_binance": metricas.total("binance_errores_total"),
+    }
+
+
+# === Orquestación (proceso padre) ===
+
+def lanzar(modo, args):
+    with tempfile.TemporaryDirectory() as carpeta:
+        entorno = dict(
+            os.environ,
+            **MODOS[modo],
+            BINANCE_SIMULADO="1",
+            SIM_SIMBOLOS=str(args.senales),
+            SIM_BALANCE="1000000",
+            SIM_LATENCIA_MS=args.latencia,
+            SIM_LATENCIA_STREAM_MS=str(args.latencia_stream),
+            SIM_TASA_ERROR=str(args.tasa_error),
+            SIM_SEMILLA="7",
+            WEBHOOK_SECRET=SECRETO,
+            TELEGRAM_TOKEN="",
+            ESTADO_DB=":memory:",
+            LIBRO_TRADES_DB=":memory:",
+            DIARIO_DB=":memory:",
+            # Una señal por símbolo a la vez: los límites de cartera se evalúan pero no rechazan
+            RIESGO_POSICIONES_MAX="0",
+            RIESGO_ABIERTO_MAX_PCT="0",
+            RIESGO_NOCIONAL_MAX_X="0",
+            LOCK_LIDER=os.path.join(carpeta, "bot.lock"),
+        )
+        comando = [sys.executable, os.path.abspath(__file__), "--interno", modo,
+                   "--senales", str(args.senales), "--concurrencia", str(args.concurrencia),
+                   "--timeout", str(args.timeout)]
+        salida = subprocess.run(comando, env=entorno, capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    for linea in salida.stdout.splitlines():
+        if linea.startswith(MARCA_RESULTADO):
+            return json.loads(linea[len(MARCA_RESULTADO):])
+    raise RuntimeError(f"El modo {modo} no devolvió resultados:\n{salida.stderr[-2000:]}")
+
+
+def imprimir(resultados):
+    columnas = ("modo", "ordenes", "protegidas", "señales/s", "webhook p50/p99", "señal→orden p50/p99", "fill→SL/TP p50/p99")
+    print(" | ".join(columnas))
+    for r in resultados:
+        def par(clave):
+            p = r[clave]
+            return f"{p.get('p50', '-')}/{p.get('p99', '-')} ms"
+        print(" | ".join([
+            r["modo"], f"{r['ordenes_colocadas']}/{r['senales']}", str(r["protegidas"]),
+            str(r["throughput_senales_s"]), par("webhook_ms"), par("senal_a_orden_ms"), par("fill_a_proteccion_ms"),
+        ]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del bot contra el exchange simulado")
+    parser.add_argument("--senales", type=int, default=50, help="señales por ráfaga (una por símbolo)")
+    parser.add_argument("--concurrencia", type=int, default=16, help="requests simultáneos al webhook")
+    parser.add_argument("--latencia", default="20,60", help="latencia REST simulada en ms (min,max)")
+    parser.add_argument("--latencia-stream", type=float, default=30, help="demora de los eventos del stream en ms")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="probabilidad de error -1001 por llamada")
+    parser.add_argument("--modos", default=",".join(MODOS), help="modos separados por coma")
+    parser.add_argument("--timeout", type=float, default=30, help="espera máxima por fase en segundos")
+    parser.add_argument("--json", action="store_true", help="imprime los resultados en JSON")
+    parser.add_argument("--interno", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        resultado = correr_modo(args.interno, args.senales, args.concurrencia, args.timeout)
+        print(MARCA_RESULTADO + json.dumps(resultado), flush=True)
+        os._exit(0)
+
+    resultados = [lanzar(modo, args) for modo in args.modos.split(",")]
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+    else:
+        imprimir(resultados)
+
+
+if __name__ == "__main__":
+    main()
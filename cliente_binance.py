@@ -0,0 +1,295 @@
+import logging
+import os
+import random
+import threading
+import time
+from functools import wraps
+from binance.error import ClientError, ServerError
+from requests.exceptions import ConnectionError, Timeout
+from metricas import metricas
+
+logger = logging.getLogger()
+
+# Límites por IP / cuenta de futuros USDT-M (GET /fapi/v1/exchangeInfo -> rateLimits)
+LIMITE_PESO_MINUTO = int(os.getenv("BINANCE_LIMITE_PESO", "2400"))
+LIMITE_ORDENES_MINUTO = 1200
+LIMITE_ORDENES_10S = 300
+
+# Fracción del límite de peso que puede usar cada prioridad: el monitoreo deja margen al trading
+UMBRAL_MONITOREO = 0.6
+UMBRAL_TRADING = 0.95
+
+# Backoff exponencial con jitter completo
+ESPERA_BASE = 0.25
+ESPERA_MAX = 8
+REINTENTOS_LECTURA = 3
+
+# === Prioridades ===
+TRADING = "trading"
+MONITOREO = "monitoreo"
+
+METODOS_ORDEN = {"new_order", "new_batch_order", "cancel_order", "cancel_open_orders", "cancel_batch_order"}
+
+# Peso aproximado de cada endpoint, para estimar el consumo entre headers
+PESOS = {
+    "exchange_info": 1,
+    "leverage_brackets": 1,
+    "balance": 5,
+    "account": 5,
+    "get_position_risk": 5,
+    "get_account_trades": 5,
+    "get_open_orders": 1,
+    "get_all_orders": 5,
+    "query_order": 1,
+    "change_leverage": 1,
+    "new_order": 0,
+    "new_batch_order": 5,
+    "cancel_order": 1,
+    "cancel_open_orders": 1,
+}
+PESO_OPEN_ORDERS_TODOS = 40
+
+# === Clasificación de errores de la API ===
+
+# La orden seguro no se procesó: reintentar es seguro incluso para órdenes
+CODIGOS_RECHAZO_TRANSITORIO = {
+    -1003,  # TOO_MANY_REQUESTS
+    -1008,  # servidor sobrecargado
+    -1015,  # TOO_MANY_ORDERS
+    -1021,  # timestamp fuera de recvWindow
+}
+# Estado desconocido: solo se reintentan automáticamente las lecturas
+CODIGOS_TRANSITORIOS_LECTURA = CODIGOS_RECHAZO_TRANSITORIO | {
+    -1000,  # UNKNOWN
+    -1001,  # DISCONNECTED
+    -1007,  # timeout esperando al backend
+}
+
+
+class PesoAgotado(Exception):
+    """No hay presupuesto de peso para una llamada de monitoreo."""
+
+
+def es_reintentable(error, orden=False) -> bool:
+    """
+    Indica si vale la pena reintentar la llamada que lanzó `error`. Los rechazos por filtros,
+    margen, precio, etc. no se reintentan nunca. Para órdenes solo se reintentan los errores
+    que garantizan que Binance no procesó la orden.
+    """
+    if isinstance(error, ClientError):
+        if error.status_code in (418, 429):
+            return True
+        codigos = CODIGOS_RECHAZO_TRANSITORIO if orden else CODIGOS_TRANSITORIOS_LECTURA
+        return error.error_code in codigos
+    if isinstance(error, (ServerError, ConnectionError, Timeout)):
+        return not orden
+    return False
+
+
+def espera_reintento(intento: int) -> float:
+    """Segundos a esperar antes del reintento número `intento` (1, 2, ...): jitter completo."""
+    return random.uniform(0, min(ESPERA_MAX, ESPERA_BASE * 2 ** intento))
+
+
+def _retry_after(error):
+    header = getattr(error, "header", None) or {}
+    valor = header.get("Retry-After") or header.get("retry-after")
+    try:
+        return float(valor) if valor else None
+    except ValueError:
+        return None
+
+
+# === Presupuesto de peso REST ===
+
+class PresupuestoPeso:
+    """
+    Peso usado en el minuto actual según los headers X-MBX-USED-WEIGHT-1M / X-MBX-ORDER-COUNT-*
+    de cada respuesta; entre respuestas se suma el peso estimado de cada llamada. Un 429/418
+    pausa todas las llamadas hasta el Retry-After.
+    """
+
+    def __init__(self, limite_peso=LIMITE_PESO_MINUTO):
+        self.limite_peso = limite_peso
+        self._lock = threading.Lock()
+        self._minuto = self._minuto_actual()
+        self._ventana_10s = int(time.time() // 10)
+        self._peso = 0
+        self._ordenes_minuto = 0
+        self._ordenes_10s = 0
+        self._pausa_hasta = 0.0
+
+    @staticmethod
+    def _minuto_actual():
+        return int(time.time() // 60)
+
+    def _renovar(self):
+        minuto = self._minuto_actual()
+        if minuto != self._minuto:
+            self._minuto = minuto
+            self._peso = 0
+            self._ordenes_minuto = 0
+        ventana = int(time.time() // 10)
+        if ventana != self._ventana_10s:
+            self._ventana_10s = ventana
+            self._ordenes_10s = 0
+
+    @property
+    def peso_usado(self):
+        with self._lock:
+            self._renovar()
+            return self._peso
+
+    def espera_necesaria(self, prioridad, peso=1, orden=False) -> float:
+        """Segundos que hay que esperar antes de gastar `peso` con esta prioridad (0 = ya)."""
+        ahora = time.time()
+        with self._lock:
+            self._renovar()
+            if ahora < self._pausa_hasta:
+                return self._pausa_hasta - ahora
+
+            umbral = UMBRAL_MONITOREO if prioridad == MONITOREO else UMBRAL_TRADING
+            hasta_proximo_minuto = 60 - ahora % 60
+            if self._peso + peso > self.limite_peso * umbral:
+                return hasta_proximo_minuto
+            if orden and (self._ordenes_minuto >= LIMITE_ORDENES_MINUTO * UMBRAL_TRADING
+                          or self._ordenes_10s >= LIMITE_ORDENES_10S * UMBRAL_TRADING):
+                return min(hasta_proximo_minuto, 10 - ahora % 10)
+            return 0.0
+
+    def consumir(self, peso):
+        with self._lock:
+            self._renovar()
+            self._peso += peso
+
+    def pausar(self, segundos):
+        with self._lock:
+            self._pausa_hasta = max(self._pausa_hasta, time.time() + segundos)
+        metricas.incrementar("binance_pausas_total")
+        logger.warning("🚦 Límite de Binance alcanzado, pausa de %.1fs", segundos)
+
+    def leer_headers(self, headers):
+        with self._lock:
+            self._renovar()
+            for header, valor in headers.items():
+                header = header.lower()
+                if header == "x-mbx-used-weight-1m":
+                    self._peso = int(valor)
+                elif header == "x-mbx-order-count-1m":
+                    self._ordenes_minuto = int(valor)
+                elif header == "x-mbx-order-count-10s":
+                    self._ordenes_10s = int(valor)
+            peso = self._peso
+        metricas.fijar("binance_peso_usado", peso)
+
+
+# === Cliente con presupuesto, prioridades y reintentos ===
+
+class ClienteBinance:
+    """
+    Capa única por la que pasan las llamadas a Binance:
+    - Las órdenes siempre tienen prioridad de trading; las lecturas hechas dentro de una función
+      decorada con `monitoreo` solo usan hasta UMBRAL_MONITOREO del peso por minuto, salvo las
+      de funciones decoradas con `trading` (lo que se hace a raíz de un fill).
+    - Las lecturas se reintentan con backoff exponencial y jitter ante errores transitorios.
+    - Las órdenes no se reintentan acá (lo decide quien llama con `es_reintentable`), pero esperan
+      si hay una pausa activa por 429/418.
+    El resto de los atributos se delegan al cliente original.
+    """
+
+    def __init__(self, client, presupuesto=None, reintentos_lectura=REINTENTOS_LECTURA):
+        self._client = client
+        self.presupuesto = presupuesto or PresupuestoPeso()
+        self.reintentos_lectura = reintentos_lectura
+        self._local = threading.local()
+        session = getattr(client, "session", None)
+        if session is not None:
+            session.hooks.setdefault("response", []).append(self._leer_headers)
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._client, nombre)
+        if not callable(atributo) or nombre.startswith("_"):
+            return atributo
+
+        @wraps(atributo)
+        def llamada(*args, **kwargs):
+            return self._llamar(nombre, atributo, args, kwargs)
+
+        return llamada
+
+    @property
+    def prioridad(self):
+        return MONITOREO if getattr(self._local, "monitoreo", False) else TRADING
+
+    def monitoreo(self, funcion):
+        """Decorador: las lecturas de `funcion` usan el presupuesto de monitoreo; sin presupuesto se saltea."""
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if self.presupuesto.espera_necesaria(MONITOREO) > 0:
+                metricas.incrementar("monitoreo_pospuesto_total")
+                logger.warning("⏸ %s pospuesto: peso usado %s/%s", funcion.__name__, self.presupuesto.peso_usado, self.presupuesto.limite_peso)
+                return None
+
+            anterior = getattr(self._local, "monitoreo", False)
+            self._local.monitoreo = True
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                self._local.monitoreo = anterior
+        return envoltura
+
+    def trading(self, funcion):
+        """
+        Decorador: `funcion` usa la prioridad de trading aunque se la llame desde una función de
+        monitoreo (p. ej. proteger o cerrar una posición detectada por el monitor).
+        """
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            anterior = getattr(self._local, "monitoreo", False)
+            self._local.monitoreo = False
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                self._local.monitoreo = anterior
+        return envoltura
+
+    # === Internos ===
+
+    def _llamar(self, nombre, funcion, args, kwargs):
+        orden = nombre in METODOS_ORDEN
+        prioridad = TRADING if orden else self.prioridad
+        peso = self._peso(nombre, kwargs)
+        intentos = 1 if orden else 1 + self.reintentos_lectura
+
+        for intento in range(1, intentos + 1):
+            espera = self.presupuesto.espera_necesaria(prioridad, peso, orden)
+            if espera > 0:
+                if prioridad == MONITOREO:
+                    raise PesoAgotado(f"{nombre}: peso usado {self.presupuesto.peso_usado}/{self.presupuesto.limite_peso}")
+                logger.warning("🚦 %s espera %.1fs por el límite de Binance", nombre, espera)
+                time.sleep(espera)
+
+            self.presupuesto.consumir(peso)
+            try:
+                return funcion(*args, **kwargs)
+            except Exception as e:
+                retry_after = _retry_after(e)
+                if retry_after or getattr(e, "status_code", None) in (418, 429):
+                    self.presupuesto.pausar(retry_after or espera_reintento(intento))
+
+                if intento == intentos or not es_reintentable(e, orden):
+                    raise
+                espera = espera_reintento(intento)
+                metricas.incrementar("binance_reintentos_total", metodo=nombre)
+                logger.warning("🔁 %s falló (%s), reintento %s/%s en %.2fs", nombre, getattr(e, 'error_code', type(e).__name__), intento, intentos - 1, espera)
+                time.sleep(espera)
+
+    @staticmethod
+    def _peso(nombre, kwargs):
+        if nombre == "get_open_orders" and not kwargs.get("symbol"):
+            return PESO_OPEN_ORDERS_TODOS
+        return PESOS.get(nombre, 1)
+
+    def _leer_headers(self, response, *args, **kwargs):
+        self.presupuesto.leer_headers(response.headers)
+        return response
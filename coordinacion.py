@@ -0,0 +1,70 @@
+import fcntl
+import logging
+import os
+import threading
+
+logger = logging.getLogger()
+
+INTERVALO_REINTENTO_LIDER = 5
+
+
+# === Elección de líder entre workers de gunicorn ===
+
+class Liderazgo:
+    """
+    Lock exclusivo sobre un archivo local: el proceso que lo obtiene es el único que corre
+    el scheduler, el monitor y el stream. El resto sigue intentando cada pocos segundos;
+    si el líder muere el sistema operativo libera el lock y otro worker toma su lugar.
+
+    Args:
+        ruta: archivo de lock compartido por todos los workers.
+        al_asumir: callback que se ejecuta (una sola vez) al convertirse en líder.
+    """
+
+    def __init__(self, ruta, al_asumir, intervalo=INTERVALO_REINTENTO_LIDER):
+        self.ruta = ruta
+        self.al_asumir = al_asumir
+        self.intervalo = intervalo
+        self._fd = None
+        self._detener = threading.Event()
+
+    @property
+    def es_lider(self):
+        return self._fd is not None
+
+    def iniciar(self):
+        if self._intentar():
+            return
+        logger.info("👥 Proceso %s en modo seguidor, esperando liderazgo.", os.getpid())
+        threading.Thread(target=self._esperar, name="liderazgo", daemon=True).start()
+
+    def detener(self):
+        self._detener.set()
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def _esperar(self):
+        while not self._detener.wait(self.intervalo):
+            if self._intentar():
+                return
+
+    def _intentar(self):
+        fd = os.open(self.ruta, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        logger.info("👑 Proceso %s es el líder (scheduler, monitor y stream).", os.getpid())
+
+        try:
+            self.al_asumir()
+        except Exception as e:
+            logger.error("❌ Error al asumir el liderazgo: %s", e)
+        return True
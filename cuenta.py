@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger()
+
+# Sin stream los datos de cuenta se vuelven a pedir pasado este tiempo;
+# con el stream activo los eventos los mantienen al día y el TTL es largo
+TTL_SIN_STREAM = 5
+TTL_CON_STREAM = 300
+
+ESTADOS_ORDEN_ABIERTA = ("NEW", "PARTIALLY_FILLED")
+
+
+# === Cache de balance, posiciones, órdenes abiertas y apalancamiento ===
+
+class CacheCuenta:
+    """
+    Mantiene en memoria los datos de cuenta que el webhook consulta antes de cada entrada.
+    Los eventos del user-data stream (ACCOUNT_UPDATE, ORDER_TRADE_UPDATE, ACCOUNT_CONFIG_UPDATE)
+    los actualizan; lo que no está en cache o venció se pide por REST, en paralelo.
+
+    Args:
+        client: Cliente Binance.
+        stream_activo: callable que indica si los eventos del stream están llegando.
+    """
+
+    def __init__(self, client, stream_activo=lambda: False):
+        self.client = client
+        self.stream_activo = stream_activo
+        self._lock = threading.Lock()
+        self._balance = None            # (availableBalance, ts)
+        self._posiciones = {}           # symbol -> (positionAmt, ts)
+        self._ordenes = {}              # symbol -> ({orderId}, ts)
+        self._apalancamiento = {}       # symbol -> (leverage, ts)
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pre_trade")
+
+    # === Lecturas ===
+
+    def balance_disponible(self, forzar=False):
+        with self._lock:
+            if not forzar and self._vigente(self._balance):
+                return self._balance[0]
+
+        balances = self.client.balance()
+        usdt = next(float(b["availableBalance"]) for b in balances if b["asset"] == "USDT")
+        with self._lock:
+            self._balance = (usdt, time.monotonic())
+        return usdt
+
+    def posicion(self, symbol: str):
+        """Cantidad de la posición abierta en `symbol` (0.0 si no hay)."""
+        with self._lock:
+            cache = self._posiciones.get(symbol)
+            if self._vigente(cache):
+                return cache[0]
+
+        cantidad = sum(float(p["positionAmt"]) for p in self.client.get_position_risk(symbol=symbol))
+        with self._lock:
+            self._posiciones[symbol] = (cantidad, time.monotonic())
+        return cantidad
+
+    def ordenes_abiertas(self, symbol: str):
+        with self._lock:
+            cache = self._ordenes.get(symbol)
+            if self._vigente(cache):
+                return set(cache[0])
+
+        ids = {int(o["orderId"]) for o in self.client.get_open_orders(symbol=symbol)}
+        with self._lock:
+            self._ordenes[symbol] = (ids, time.monotonic())
+        return set(ids)
+
+    def pre_trade(self, symbol: str):
+        """Lee en paralelo posición, balance y órdenes abiertas. Devuelve (positionAmt, usdt, ordenes)."""
+        f_posicion = self._pool.submit(self.posicion, symbol)
+        f_balance = self._pool.submit(self.balance_disponible)
+        f_ordenes = self._pool.submit(self.ordenes_abiertas, symbol)
+        return f_posicion.result(), f_balance.result(), f_ordenes.result()
+
+    # === Escrituras que actualizan la cache ===
+
+    def cancelar_ordenes(self, symbol: str):
+        self.client.cancel_open_orders(symbol=symbol)
+        with self._lock:
+            self._ordenes[symbol] = (set(), time.monotonic())
+
+    def registrar_orden(self, symbol: str, order_id: int):
+        with self._lock:
+            cache = self._ordenes.get(symbol)
+            if cache is not None:
+                cache[0].add(int(order_id))
+
+    def invalidar_simbolo(self, symbol: str):
+        with self._lock:
+            self._posiciones.pop(symbol, None)
+            self._ordenes.pop(symbol, None)
+
+    def asegurar_apalancamiento(self, symbol: str, leverage: int):
+        """
+        Llama a change_leverage solo si el apalancamiento del símbolo es distinto. El valor
+        cacheado vence como el resto de la cache: en los seguidores (sin stream local que avise
+        ACCOUNT_CONFIG_UPDATE) un cambio hecho por fuera se corrige en la próxima señal.
+        """
+        with self._lock:
+            cache = self._apalancamiento.get(symbol)
+            if self._vigente(cache) and cache[0] == leverage:
+                return False
+        self.client.change_leverage(symbol=symbol, leverage=leverage)
+        with self._lock:
+            self._apalancamiento[symbol] = (leverage, time.monotonic())
+        return True
+
+    def invalidar(self):
+        with self._lock:
+            self._balance = None
+            self._posiciones.clear()
+            self._ordenes.clear()
+            self._apalancamiento.clear()
+
+    # === Eventos del stream ===
+
+    def on_evento_orden(self, orden):
+        symbol = orden["s"]
+        order_id = int(orden["i"])
+        with self._lock:
+            cache = self._ordenes.get(symbol)
+            if cache is None:
+                return
+            if orden["X"] in ESTADOS_ORDEN_ABIERTA:
+                cache[0].add(order_id)
+            else:
+                cache[0].discard(order_id)
+
+    def on_evento_cuenta(self, cuenta):
+        ahora = time.monotonic()
+        with self._lock:
+            for p in cuenta.get("P", []):
+                self._posiciones[p["s"]] = (float(p["pa"]), ahora)
+            if cuenta.get("B"):
+                self._balance = None
+
+        # El balance disponible no viene en el evento: se refresca en segundo plano
+        if cuenta.get("B"):
+            self._pool.submit(self._refrescar_balance)
+
+    def on_evento_config(self, config):
+        if "s" in config and "l" in config:
+            with self._lock:
+                self._apalancamiento[config["s"]] = (int(config["l"]), time.monotonic())
+
+    def _refrescar_balance(self):
+        try:
+            self.balance_disponible(forzar=True)
+        except Exception as e:
+            logger.warning("⚠️ No se pudo refrescar el balance: %s", e)
+
+    def _vigente(self, cache):
+        if cache is None:
+            return False
+        ttl = TTL_CON_STREAM if self.stream_activo() else TTL_SIN_STREAM
+        return time.monotonic() - cache[1] < ttl
@@ -0,0 +1,254 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+import pytz
+
+logger = logging.getLogger()
+
+ZONA_AR = pytz.timezone("America/Argentina/Buenos_Aires")
+
+# Columnas acumuladas por día y símbolo; los reportes suman estas filas en vez de recorrer operaciones
+ACUMULADOS = ("cerradas", "ganadoras", "pnl", "comisiones", "llenadas", "canceladas", "deslizamiento_suma", "duracion_suma_ms")
+
+
+def _ms():
+    return int(time.time() * 1000)
+
+
+def dia_de(ts_ms):
+    """Fecha (hora de Argentina) de un timestamp en ms: la clave de los acumulados diarios."""
+    return datetime.fromtimestamp(ts_ms / 1000, ZONA_AR).strftime("%Y-%m-%d")
+
+
+# === Diario de operaciones ===
+
+class DiarioTrades:
+    """
+    Una fila por operación (señal → entrada → salida), escrita por el ciclo de vida de la
+    posición en SQLite (WAL, compartido por los workers). Cada evento actualiza además un
+    acumulado por día y símbolo, así un reporte diario o semanal lee unas pocas filas.
+    Los errores de escritura se loguean y nunca interrumpen el trading.
+    """
+
+    def __init__(self, ruta=":memory:"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS operaciones (
+                order_id INTEGER PRIMARY KEY,
+                senal_id TEXT,
+                symbol TEXT NOT NULL,
+                side TEXT NOT NULL,
+                entry_senal REAL NOT NULL,
+                precio_stop REAL,
+                qty REAL NOT NULL,
+                sl_distance REAL,
+                tp_factor REAL,
+                risk_percent REAL,
+                apalancamiento INTEGER,
+                ts_senal INTEGER,
+                ts_orden INTEGER NOT NULL,
+                precio_entrada REAL,
+                ts_entrada INTEGER,
+                deslizamiento REAL,
+                tipo_salida TEXT,
+                ts_salida INTEGER,
+                pnl REAL,
+                comision REAL,
+                estado TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_operaciones_salida ON operaciones (ts_salida);
+            CREATE INDEX IF NOT EXISTS idx_operaciones_symbol ON operaciones (symbol, ts_orden);
+            CREATE TABLE IF NOT EXISTS acumulado_diario (
+                dia TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                cerradas INTEGER NOT NULL DEFAULT 0,
+                ganadoras INTEGER NOT NULL DEFAULT 0,
+                pnl REAL NOT NULL DEFAULT 0,
+                comisiones REAL NOT NULL DEFAULT 0,
+                llenadas INTEGER NOT NULL DEFAULT 0,
+                canceladas INTEGER NOT NULL DEFAULT 0,
+                deslizamiento_suma REAL NOT NULL DEFAULT 0,
+                duracion_suma_ms INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (dia, symbol)
+            );
+        """)
+
+    # === Eventos del ciclo de vida ===
+
+    def abrir(self, order_id, symbol, side, entry_senal, qty, precio_stop=None, sl_distance=None, tp_factor=None,
+              risk_percent=None, apalancamiento=None, senal_id=None, ts_senal=None, ts_orden=None):
+        """Entrada STOP LIMIT colocada."""
+        fila = (int(order_id), senal_id, symbol, side, float(entry_senal), precio_stop, float(qty), sl_distance,
+                tp_factor, risk_percent, apalancamiento, ts_senal, ts_orden or _ms())
+        self._escribir(
+            lambda: self._conn.execute(
+                "INSERT OR IGNORE INTO operaciones (order_id, senal_id, symbol, side, entry_senal, precio_stop, qty, "
+                "sl_distance, tp_factor, risk_percent, apalancamiento, ts_senal, ts_orden, estado) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'PENDIENTE')",
+                fila,
+            ),
+            order_id,
+        )
+
+    def registrar_fill(self, order_id, precio, ts=None):
+        """
+        Entrada ejecutada. El deslizamiento es la diferencia entre el fill y el `entry` de la
+        señal, en fracción del entry y con signo: positivo = peor precio que el de la señal.
+        """
+        ts = ts or _ms()
+
+        def escribir():
+            fila = self._conn.execute(
+                "SELECT symbol, side, entry_senal FROM operaciones WHERE order_id = ? AND ts_entrada IS NULL",
+                (int(order_id),),
+            ).fetchone()
+            if fila is None:
+                return
+            symbol, side, entry = fila
+            deslizamiento = (float(precio) - entry) / entry * (1 if side == "BUY" else -1)
+            self._conn.execute(
+                "UPDATE operaciones SET precio_entrada = ?, ts_entrada = ?, deslizamiento = ?, estado = 'ABIERTA' "
+                "WHERE order_id = ?",
+                (float(precio), ts, deslizamiento, int(order_id)),
+            )
+            self._acumular(dia_de(ts), symbol, llenadas=1, deslizamiento_suma=deslizamiento)
+
+        self._escribir(escribir, order_id)
+
+    def registrar_cancelacion(self, order_id, ts=None):
+        ts = ts or _ms()
+
+        def escribir():
+            fila = self._conn.execute(
+                "SELECT symbol FROM operaciones WHERE order_id = ? AND estado = 'PENDIENTE'", (int(order_id),)
+            ).fetchone()
+            if fila is None:
+                return
+            self._conn.execute(
+                "UPDATE operaciones SET estado = 'CANCELADA', ts_salida = ? WHERE order_id = ?", (ts, int(order_id))
+            )
+            self._acumular(dia_de(ts), fila[0], canceladas=1)
+
+        self._escribir(escribir, order_id)
+
+    def registrar_salida(self, order_id, tipo, pnl, comision, ts=None):
+        """Posición cerrada por TP / SL. `pnl` es el realizado bruto (sin comisiones)."""
+        ts = ts or _ms()
+
+        def escribir():
+            fila = self._conn.execute(
+                "SELECT symbol, ts_entrada FROM operaciones WHERE order_id = ? AND estado = 'ABIERTA'", (int(order_id),)
+            ).fetchone()
+            if fila is None:
+                return
+            symbol, ts_entrada = fila
+            self._conn.execute(
+                "UPDATE operaciones SET estado = 'CERRADA', tipo_salida = ?, ts_salida = ?, pnl = ?, comision = ? "
+                "WHERE order_id = ?",
+                (tipo, ts, float(pnl), float(comision), int(order_id)),
+            )
+            self._acumular(
+                dia_de(ts), symbol, cerradas=1, ganadoras=int(pnl - comision > 0), pnl=float(pnl),
+                comisiones=float(comision), duracion_suma_ms=ts - (ts_entrada or ts),
+            )
+
+        self._escribir(escribir, order_id)
+
+    # === Consultas ===
+
+    def reporte(self, desde, hasta, symbol=None):
+        """
+        Métricas entre las fechas `desde` y `hasta` (YYYY-MM-DD, ambas incluidas) a partir de
+        los acumulados diarios.
+        """
+        consulta = f"SELECT {', '.join(f'COALESCE(SUM({c}), 0)' for c in ACUMULADOS)} FROM acumulado_diario WHERE dia BETWEEN ? AND ?"
+        params = [desde, hasta]
+        if symbol:
+            consulta += " AND symbol = ?"
+            params.append(symbol)
+        with self._lock:
+            fila = self._conn.execute(consulta, params).fetchone()
+        a = dict(zip(ACUMULADOS, fila))
+
+        cerradas, llenadas, comisiones = a["cerradas"], a["llenadas"], a["comisiones"]
+        intentos = llenadas + a["canceladas"]
+        return {
+            "desde": desde,
+            "hasta": hasta,
+            "symbol": symbol,
+            "operaciones": cerradas,
+            "ganadoras": a["ganadoras"],
+            "win_rate": round(a["ganadoras"] / cerradas, 4) if cerradas else None,
+            "pnl_bruto": round(a["pnl"], 4),
+            "comisiones": round(comisiones, 4),
+            "pnl_neto": round(a["pnl"] - comisiones, 4),
+            # Comisiones como fracción del PnL bruto (en valor absoluto)
+            "arrastre_comisiones": round(comisiones / abs(a["pnl"]), 4) if a["pnl"] else None,
+            "deslizamiento_promedio_bps": round(a["deslizamiento_suma"] / llenadas * 10000, 2) if llenadas else None,
+            "duracion_promedio_min": round(a["duracion_suma_ms"] / cerradas / 60000, 1) if cerradas else None,
+            "tasa_llenado": round(llenadas / intentos, 4) if intentos else None,
+        }
+
+    def reporte_periodo(self, periodo="dia", symbol=None, ahora_ms=None):
+        """Reporte del día actual ("dia") o de los últimos 7 días ("semana")."""
+        hoy = datetime.fromtimestamp((ahora_ms or _ms()) / 1000, ZONA_AR).date()
+        desde = hoy - timedelta(days=6) if periodo == "semana" else hoy
+        return self.reporte(desde.isoformat(), hoy.isoformat(), symbol)
+
+    def operaciones(self, desde_ms, hasta_ms=None, symbol=None, limite=200):
+        consulta = "SELECT * FROM operaciones WHERE ts_orden >= ? AND ts_orden <= ?"
+        params = [int(desde_ms), int(hasta_ms or _ms())]
+        if symbol:
+            consulta += " AND symbol = ?"
+            params.append(symbol)
+        consulta += " ORDER BY ts_orden DESC LIMIT ?"
+        params.append(int(limite))
+        with self._lock:
+            cursor = self._conn.execute(consulta, params)
+            columnas = [c[0] for c in cursor.description]
+            return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+    # === Internos ===
+
+    def _acumular(self, dia, symbol, **incrementos):
+        columnas = ", ".join(incrementos)
+        valores = ", ".join("?" for _ in incrementos)
+        suma = ", ".join(f"{c} = {c} + excluded.{c}" for c in incrementos)
+        self._conn.execute(
+            f"INSERT INTO acumulado_diario (dia, symbol, {columnas}) VALUES (?, ?, {valores}) "
+            f"ON CONFLICT (dia, symbol) DO UPDATE SET {suma}",
+            (dia, symbol, *incrementos.values()),
+        )
+
+    def _escribir(self, escribir, order_id):
+        try:
+            with self._lock, self._conn:
+                escribir()
+        except Exception as e:
+            logger.error("❌ No se pudo registrar la operación %s en el diario: %s", order_id, e)
+
+
+def formatear_digesto(dia, semana):
+    """Mensaje de Telegram con el resumen del día y de los últimos 7 días."""
+    def linea(nombre, r):
+        if not r["operaciones"] and not r["tasa_llenado"]:
+            return f"*{nombre}*: sin operaciones"
+        win_rate = f"{r['win_rate']:.0%}" if r["win_rate"] is not None else "-"
+        deslizamiento = f"{r['deslizamiento_promedio_bps']:.1f} bps" if r["deslizamiento_promedio_bps"] is not None else "-"
+        return (
+            f"*{nombre}*: {r['operaciones']} operaciones | win rate {win_rate}\n"
+            f"💰 PnL neto: `${r['pnl_neto']:.2f}` (comisiones `${r['comisiones']:.2f}`)\n"
+            f"🎯 Deslizamiento promedio: `{deslizamiento}`"
+        )
+
+    hoy = f"Hoy ({dia['hasta']})"
+    return f"📊 *Resumen de operaciones*\n{linea(hoy, dia)}\n\n{linea('Últimos 7 días', semana)}"
+
+
+diario = DiarioTrades(os.getenv("DIARIO_DB", "diario.db"))
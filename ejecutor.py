@@ -0,0 +1,177 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from metricas import metricas
+from registro import contexto
+
+logger = logging.getLogger()
+
+# === Estados de una señal ===
+EN_COLA = "EN_COLA"
+EJECUTANDO = "EJECUTANDO"
+COMPLETADA = "COMPLETADA"
+FALLIDA = "FALLIDA"
+
+TAMANO_COLA_SENALES = 100
+HILOS_EJECUTOR = 4
+SENALES_EN_MEMORIA = 500
+
+
+def nuevo_id():
+    return uuid.uuid4().hex[:16]
+
+
+class Senal:
+    __slots__ = ("id", "datos", "estado", "resultado", "codigo", "recibida", "etapas", "_t0")
+
+    def __init__(self, datos, id=None):
+        self.id = id or nuevo_id()
+        self.datos = datos
+        self.estado = EN_COLA
+        self.resultado = None
+        self.codigo = None
+        self.recibida = int(time.time() * 1000)
+        self.etapas = {}
+        self._t0 = time.perf_counter()
+
+    def marcar(self, etapa):
+        """Registra los ms transcurridos desde la recepción hasta `etapa`."""
+        self.etapas[etapa] = round((time.perf_counter() - self._t0) * 1000, 2)
+
+    def a_dict(self):
+        return {
+            "id": self.id,
+            "estado": self.estado,
+            "datos": self.datos,
+            "resultado": self.resultado,
+            "codigo": self.codigo,
+            "recibida": self.recibida,
+            "etapas_ms": self.etapas,
+        }
+
+
+# === Cola de ejecución de señales ===
+
+class EjecutorSenales:
+    """
+    El webhook solo valida y encola; un pool de `hilos` ejecuta el pipeline de órdenes.
+    Las señales de un mismo símbolo se ejecutan de a una y en orden de llegada; las de
+    símbolos distintos, en paralelo.
+    `procesar(senal)` debe devolver (resultado: dict, codigo_http).
+    Si hay `almacen`, el estado de cada señal queda visible para los demás workers.
+    """
+
+    def __init__(self, procesar, almacen=None, tamano_cola=TAMANO_COLA_SENALES, hilos=HILOS_EJECUTOR):
+        self.procesar = procesar
+        self.almacen = almacen
+        self.hilos = max(1, hilos)
+        self._cola = queue.Queue(maxsize=tamano_cola)
+        self._recientes = OrderedDict()
+        self._lock = threading.Lock()
+        self._hilos = []
+        self._toma = threading.Lock()
+        # symbol -> señales de ese símbolo que esperan a que termine la que está en ejecución
+        self._en_curso = {}
+
+    def encolar(self, datos, id=None) -> Senal:
+        """Lanza queue.Full si la cola está llena."""
+        senal = Senal(datos, id)
+        self._cola.put_nowait(senal)
+        senal.marcar("encolada")
+        self._recordar(senal)
+        self._asegurar_hilo()
+        return senal
+
+    def obtener(self, senal_id):
+        with self._lock:
+            senal = self._recientes.get(senal_id)
+        if senal is not None:
+            return senal.a_dict()
+        if self.almacen is not None:
+            return self.almacen.obtener_senal(senal_id)
+        return None
+
+    def pendientes(self):
+        with self._lock:
+            atrasadas = sum(len(s) for s in self._en_curso.values())
+        return self._cola.qsize() + atrasadas
+
+    def ejecutar(self, senal: Senal):
+        senal.estado = EJECUTANDO
+        senal.marcar("inicio_ejecucion")
+        self._persistir(senal)
+
+        # Todos los logs del pipeline de la señal llevan su id y símbolo
+        with contexto(senal_id=senal.id, symbol=(senal.datos or {}).get("symbol")):
+            try:
+                senal.resultado, senal.codigo = self.procesar(senal)
+                senal.estado = COMPLETADA
+            except Exception as e:
+                logger.exception("❌ Error ejecutando la señal %s: %s", senal.id, e)
+                senal.resultado, senal.codigo = {"error": str(e)}, 500
+                senal.estado = FALLIDA
+
+        senal.marcar("fin")
+        self._persistir(senal)
+        for etapa, ms in senal.etapas.items():
+            metricas.observar("senal_etapa_seconds", ms / 1000, etapa=etapa)
+        metricas.incrementar("senales_total", estado=senal.estado)
+        logger.info("⏱ Señal %s %s en %s ms | etapas: %s", senal.id, senal.estado, senal.etapas["fin"], senal.etapas,
+                    extra={"senal_id": senal.id, "etapas_ms": senal.etapas})
+        return senal
+
+    # === Internos ===
+
+    def _asegurar_hilo(self):
+        if len(self._hilos) == self.hilos and all(h.is_alive() for h in self._hilos):
+            return
+        with self._lock:
+            self._hilos = [h for h in self._hilos if h.is_alive()]
+            while len(self._hilos) < self.hilos:
+                hilo = threading.Thread(target=self._trabajar, name=f"ejecutor_senales_{len(self._hilos)}", daemon=True)
+                hilo.start()
+                self._hilos.append(hilo)
+
+    def _trabajar(self):
+        while True:
+            # Sacar la señal y anotarla en su símbolo es atómico: si no, dos hilos podrían tomar
+            # dos señales seguidas del mismo símbolo y anotarlas al revés
+            with self._toma:
+                senal = self._cola.get()
+                symbol = (senal.datos or {}).get("symbol")
+                with self._lock:
+                    if symbol in self._en_curso:
+                        # Otro hilo ya ejecuta ese símbolo: la toma él al terminar, respetando el orden
+                        self._en_curso[symbol].append(senal)
+                        continue
+                    self._en_curso[symbol] = deque()
+
+            while senal is not None:
+                try:
+                    self.ejecutar(senal)
+                finally:
+                    self._cola.task_done()
+                with self._lock:
+                    atrasadas = self._en_curso[symbol]
+                    if atrasadas:
+                        senal = atrasadas.popleft()
+                    else:
+                        del self._en_curso[symbol]
+                        senal = None
+
+    def _recordar(self, senal):
+        with self._lock:
+            self._recientes[senal.id] = senal
+            while len(self._recientes) > SENALES_EN_MEMORIA:
+                self._recientes.popitem(last=False)
+
+    def _persistir(self, senal):
+        if self.almacen is None:
+            return
+        try:
+            self.almacen.guardar_senal(senal.a_dict())
+        except Exception as e:
+            logger.error("❌ No se pudo persistir la señal %s: %s", senal.id, e)
@@ -0,0 +1,118 @@
+"""
+Reglas de la estrategia sin I/O: las usan tanto el bot (app.py) como el backtest (backtest.py).
+Las funciones aceptan escalares o arreglos de NumPy (salvo `apalancamiento` y la escalera de TP), así el backtest
+aplica exactamente las mismas fórmulas a miles de señales a la vez.
+"""
+import math
+
+# La entrada STOP LIMIT se cancela si no se ejecutó en 60 min (programar_vencimiento en app.py)
+ESPERA_ENTRADA_MS = 60 * 60 * 1000
+APALANCAMIENTO_MAX = 125
+
+# El limit_offset se reparte: 30% hasta el stop y 70% más hasta el límite
+PROPORCION_STOP = 0.3
+PROPORCION_LIMITE = 0.7
+
+# Valores por defecto de la señal
+TP_FACTOR = 2.0
+RISK_PERCENT = 1.0
+LIMIT_OFFSET = 0.0
+
+# Patas de TP como máximo: SL + TPs van en un solo batchOrders (5 órdenes)
+MAX_PATAS_TP = 4
+
+
+def _sin_redondeo(precio):
+    return precio
+
+
+def direccion(side):
+    """+1 para BUY, -1 para SELL."""
+    return 1 if side == "BUY" else -1
+
+
+def cantidad(balance, risk_percent, sl_distance):
+    """Tamaño tal que tocar el SL pierda `risk_percent`% del balance (sin redondear al stepSize)."""
+    return balance * (risk_percent / 100) / sl_distance
+
+
+def apalancamiento(valor_posicion, balance, maximo=APALANCAMIENTO_MAX):
+    """Menor apalancamiento entero que cubre la posición con el balance, limitado a `maximo`."""
+    return int(min(-(-valor_posicion // balance), maximo))
+
+
+def precios_entrada(entry, limit_offset, direccion, redondear=_sin_redondeo):
+    """
+    Precio stop y precio límite de la orden de entrada.
+
+    Args:
+        redondear: función que ajusta un precio al tickSize del símbolo; el límite se
+            calcula a partir del stop ya redondeado, igual que en Binance.
+    """
+    stop = redondear(entry + direccion * limit_offset * PROPORCION_STOP)
+    limite = redondear(stop + direccion * limit_offset * PROPORCION_LIMITE)
+    return stop, limite
+
+
+def precios_salida(precio_entrada, sl_distance, tp_factor, direccion, redondear=_sin_redondeo):
+    """Precio del SL y del TP a partir del precio real de entrada."""
+    sl = redondear(precio_entrada - direccion * sl_distance)
+    tp = redondear(precio_entrada + direccion * sl_distance * tp_factor)
+    return sl, tp
+
+
+def parsear_escalera(texto):
+    """
+    "0.5@1,0.3@2" -> [(0.5, 1.0), (0.3, 2.0)]: fracción de la posición y múltiplo de R de cada
+    TP. Si las fracciones suman menos de 1, el resto queda para el trailing del SL. Un texto
+    vacío es "sin escalera" ([]); uno con contenido pero sin ninguna pata se rechaza.
+    """
+    escalera = []
+    try:
+        for parte in filter(None, (p.strip() for p in str(texto).split(","))):
+            fraccion, r = parte.split("@")
+            escalera.append((float(fraccion), float(r)))
+    except ValueError:
+        raise ValueError(f"Escalera de TP inválida: {texto}") from None
+    if len(escalera) > MAX_PATAS_TP:
+        raise ValueError(f"Escalera de TP con más de {MAX_PATAS_TP} patas")
+    if (str(texto).strip() and not escalera) or sum(f for f, _ in escalera) > 1 + 1e-9 \
+            or not all(0 < f < math.inf and 0 < r < math.inf for f, r in escalera):
+        raise ValueError(f"Escalera de TP inválida: {texto}")
+    return escalera
+
+
+def patas_tp(precio_entrada, qty, sl_distance, escalera, direccion, cuantizar=float, redondear=_sin_redondeo,
+             valida=lambda cantidad, precio: True):
+    """
+    [(cantidad, precio)] de cada TP de la escalera. Las cantidades se redondean al stepSize
+    hacia abajo y, si la escalera cubre toda la posición, la última pata se lleva el resto.
+    Una pata que no pasa `valida` (minQty / minNotional) se suma a la siguiente, o a la
+    anterior si es la última.
+    """
+    cubre_todo = sum(f for f, _ in escalera) >= 1 - 1e-9
+    patas, arrastre, asignado = [], 0.0, 0.0
+    for i, (fraccion, r) in enumerate(escalera):
+        if cubre_todo and i == len(escalera) - 1:
+            cantidad = cuantizar(round(qty - asignado, 10))
+        else:
+            cantidad = cuantizar(round(qty * fraccion + arrastre, 10))
+        precio = redondear(precio_entrada + direccion * sl_distance * r)
+        if cantidad > 0 and valida(cantidad, precio):
+            patas.append((cantidad, precio))
+            asignado = round(asignado + cantidad, 10)
+            arrastre = 0.0
+        elif i < len(escalera) - 1:
+            arrastre = cantidad
+        elif patas:
+            anterior_cantidad, anterior_precio = patas[-1]
+            patas[-1] = (cuantizar(round(anterior_cantidad + cantidad, 10)), anterior_precio)
+    return patas
+
+
+def entrada_vencida(inicio_ms, ahora_ms, espera_ms=ESPERA_ENTRADA_MS):
+    return ahora_ms - inicio_ms >= espera_ms
+
+
+def pnl(precio_entrada, precio_salida, cantidad, direccion):
+    return (precio_salida - precio_entrada) * cantidad * direccion
@@ -0,0 +1,250 @@
+import logging
+import os
+import threading
+import time
+import estrategia
+
+logger = logging.getLogger()
+
+# Distancia a liquidación (fracción del mark) por debajo de la cual se alerta
+UMBRAL_LIQUIDACION = float(os.getenv("ALERTA_LIQUIDACION", "0.05"))
+# Múltiplos de R que disparan una alerta al alcanzarse (los negativos, al caer por debajo)
+NIVELES_R = tuple(float(n) for n in os.getenv("ALERTA_NIVELES_R", "1,2,-0.8").split(",") if n.strip())
+
+
+def _ms():
+    return int(time.time() * 1000)
+
+
+class Exposicion:
+    """Una posición abierta vista desde el mark price: cantidad con signo y plan de salida."""
+    __slots__ = (
+        "symbol", "qty", "entrada", "sl", "tp", "tps", "riesgo", "apalancamiento", "aislada", "margen_aislado",
+        "liquidacion_exchange", "mark", "mark_ts", "del_bot", "alertas",
+    )
+
+    def __init__(self, symbol, qty, entrada, del_bot=False):
+        self.symbol = symbol
+        self.qty = qty                      # positiva = long, negativa = short
+        self.entrada = entrada
+        self.sl = None
+        self.tp = None                      # el TP pendiente más cercano
+        self.tps = []                       # [(cantidad, precio)] de los TP pendientes (la escalera, o uno solo)
+        self.riesgo = None                  # distancia entrada → SL (1R por unidad)
+        self.apalancamiento = None
+        self.aislada = False
+        self.margen_aislado = 0.0
+        self.liquidacion_exchange = None    # liquidationPrice informado por Binance (semilla)
+        self.mark = entrada
+        self.mark_ts = 0
+        self.del_bot = del_bot              # registrada desde el gestor (si no, solo la conoce el stream)
+        self.alertas = set()                # alertas ya enviadas (se rearman al volver del umbral)
+
+
+# === Monitor de PnL y exposición en vivo ===
+
+class MonitorExposicion:
+    """
+    PnL no realizado, múltiplo de R y distancia a liquidación de cada posición abierta,
+    recalculados en memoria con cada mark price del stream de mercado. La cantidad, el
+    precio de entrada y el balance llegan por ACCOUNT_UPDATE y el plan de salida (SL / TP)
+    desde el gestor de posiciones: nunca consulta REST.
+
+    Args:
+        mantenimiento: callable (symbol, notional) -> (maintMarginRatio, cum) del bracket.
+        alertar: callable(mensaje) para las alertas de umbral (p. ej. enviar_telegram).
+        umbral_liquidacion: distancia a liquidación (fracción) que dispara la alerta.
+        niveles_r: múltiplos de R que disparan una alerta al cruzarse.
+    """
+
+    def __init__(self, mantenimiento=None, alertar=None, umbral_liquidacion=UMBRAL_LIQUIDACION, niveles_r=NIVELES_R):
+        self.mantenimiento = mantenimiento
+        self.alertar = alertar
+        self.umbral_liquidacion = umbral_liquidacion
+        self.niveles_r = niveles_r
+        self._posiciones = {}       # symbol -> Exposicion
+        self._billetera = None      # wallet balance USDT (margen cruzado)
+        self._lock = threading.Lock()
+
+    # === Entradas ===
+
+    def sincronizar(self, posiciones):
+        """
+        Incorpora las posiciones del gestor que ya tienen precio de entrada y descarta las
+        que el gestor dejó de tener activas.
+        """
+        vigentes = set()
+        with self._lock:
+            for p in posiciones:
+                if p.precio_entrada is None:
+                    continue
+                vigentes.add(p.symbol)
+                direccion = 1 if p.side == "BUY" else -1
+                exp = self._posiciones.get(p.symbol)
+                if exp is None:
+                    exp = self._posiciones[p.symbol] = Exposicion(p.symbol, direccion * float(p.qty_abierta()), float(p.precio_entrada))
+                exp.del_bot = True
+                exp.apalancamiento = p.apalancamiento
+                if p.sl_distance:
+                    exp.riesgo = float(p.sl_distance)
+                    exp.sl = float(p.sl_precio) if p.sl_precio else exp.entrada - direccion * exp.riesgo
+                    exp.tps = self._tps(p, exp, direccion)
+                    exp.tp = exp.tps[0][1] if exp.tps else None
+            for symbol in [s for s, exp in self._posiciones.items() if exp.del_bot and s not in vigentes]:
+                del self._posiciones[symbol]
+
+    def semilla(self, posiciones_riesgo):
+        """Valores iniciales desde get_position_risk (p. ej. el de la recuperación tras un reinicio)."""
+        with self._lock:
+            for p in posiciones_riesgo:
+                qty = float(p["positionAmt"])
+                if qty == 0:
+                    continue
+                exp = self._posiciones.get(p["symbol"])
+                if exp is None:
+                    exp = self._posiciones[p["symbol"]] = Exposicion(p["symbol"], qty, float(p["entryPrice"]))
+                exp.qty, exp.entrada = qty, float(p["entryPrice"])
+                exp.aislada = p.get("marginType") == "isolated"
+                exp.margen_aislado = float(p.get("isolatedWallet") or 0)
+                exp.liquidacion_exchange = float(p.get("liquidationPrice") or 0) or None
+                if p.get("leverage"):
+                    exp.apalancamiento = int(p["leverage"])
+                if p.get("markPrice"):
+                    exp.mark = float(p["markPrice"])
+
+    def on_evento_cuenta(self, cuenta):
+        """ACCOUNT_UPDATE: balance (B) y posiciones (P) que cambiaron."""
+        with self._lock:
+            for b in cuenta.get("B", []):
+                if b.get("a") == "USDT":
+                    self._billetera = float(b["wb"])
+            for p in cuenta.get("P", []):
+                if p.get("ps", "BOTH") != "BOTH":
+                    continue
+                symbol, qty = p["s"], float(p["pa"])
+                if qty == 0:
+                    self._posiciones.pop(symbol, None)
+                    continue
+                exp = self._posiciones.get(symbol)
+                if exp is None:
+                    exp = self._posiciones[symbol] = Exposicion(symbol, qty, float(p["ep"]))
+                exp.qty, exp.entrada = qty, float(p["ep"])
+                exp.aislada = p.get("mt") == "isolated"
+                exp.margen_aislado = float(p.get("iw") or 0)
+                exp.liquidacion_exchange = None
+
+    def on_mark(self, symbol, mark, ts=None):
+        """Callback del stream de mercado: O(1) y sin nada que hacer si no hay posición en `symbol`."""
+        exp = self._posiciones.get(symbol)
+        if exp is None:
+            return
+        exp.mark = mark
+        exp.mark_ts = ts or _ms()
+        if self.alertar is not None:
+            self._evaluar_alertas(exp, self._metricas(exp))
+
+    # === Lecturas ===
+
+    def estado(self):
+        """Métricas por posición y totales de la cuenta (lo que devuelve /positions)."""
+        with self._lock:
+            posiciones = [self._metricas(exp) for exp in self._posiciones.values()]
+            billetera = self._billetera
+        nocional = sum(p["nocional"] for p in posiciones)
+        total = {
+            "posiciones": len(posiciones),
+            "pnl_no_realizado": round(sum(p["pnl_no_realizado"] for p in posiciones), 4),
+            "nocional": round(nocional, 2),
+            "billetera": billetera,
+            "apalancamiento_efectivo": round(nocional / billetera, 2) if billetera else None,
+        }
+        return {"posiciones": posiciones, "total": total}
+
+    # === Internos ===
+
+    @staticmethod
+    def _tps(p, exp, direccion):
+        """TP pendientes, del más cercano al más lejano: las patas colocadas que no se ejecutaron."""
+        if p.patas_tp:
+            return [(pata["qty"], pata["precio"]) for pata in p.patas_tp if not pata["llena"]]
+        if p.escalera:
+            # Todavía sin proteger: las patas que se van a colocar
+            return estrategia.patas_tp(exp.entrada, float(p.qty), exp.riesgo, p.escalera, direccion)
+        if p.tp_factor:
+            return [(float(p.qty), exp.entrada + direccion * exp.riesgo * float(p.tp_factor))]
+        return []
+
+    def _metricas(self, exp):
+        qty, mark = exp.qty, exp.mark
+        direccion = 1 if qty > 0 else -1
+        pnl = (mark - exp.entrada) * qty
+        nocional = abs(qty) * mark
+        liquidacion = self._precio_liquidacion(exp, nocional)
+        return {
+            "symbol": exp.symbol,
+            "side": "LONG" if qty > 0 else "SHORT",
+            "qty": qty,
+            "entrada": exp.entrada,
+            "mark": mark,
+            "mark_ts": exp.mark_ts,
+            "nocional": round(nocional, 2),
+            "pnl_no_realizado": round(pnl, 4),
+            "r": round(pnl / (exp.riesgo * abs(qty)), 3) if exp.riesgo else None,
+            "distancia_sl": round((mark - exp.sl) / mark * direccion, 5) if exp.sl else None,
+            "distancia_tp": round((exp.tp - mark) / mark * direccion, 5) if exp.tp else None,
+            "tps": [{"qty": q, "precio": precio, "distancia": round((precio - mark) / mark * direccion, 5)}
+                    for q, precio in exp.tps],
+            "liquidacion": round(liquidacion, 6) if liquidacion else None,
+            "distancia_liquidacion": round(abs(mark - liquidacion) / mark, 5) if liquidacion else None,
+            "margen": round(nocional / exp.apalancamiento, 4) if exp.apalancamiento else None,
+            "del_bot": exp.del_bot,
+        }
+
+    def _precio_liquidacion(self, exp, nocional):
+        """
+        Precio de liquidación de Binance para una posición en modo one-way:
+        (W + cum - lado*Q*entrada) / (Q*mmr - lado*Q), con W el margen aislado o, en cruzado,
+        la billetera (aproximado: no descuenta el PnL ni el margen de otras posiciones).
+        """
+        margen = exp.margen_aislado if exp.aislada else self._billetera
+        if margen is None or self.mantenimiento is None:
+            return exp.liquidacion_exchange
+        ratio, cum = self.mantenimiento(exp.symbol, nocional)
+        lado = 1 if exp.qty > 0 else -1
+        q = abs(exp.qty)
+        divisor = q * ratio - lado * q
+        if divisor == 0:
+            return None
+        precio = (margen + cum - lado * q * exp.entrada) / divisor
+        return precio if precio > 0 else None
+
+    def _evaluar_alertas(self, exp, m):
+        # Cada alerta se envía una vez por cruce y se rearma al volver del otro lado del umbral
+        distancia = m["distancia_liquidacion"]
+        if distancia is not None:
+            if distancia < self.umbral_liquidacion and "liquidacion" not in exp.alertas:
+                exp.alertas.add("liquidacion")
+                self.alertar(
+                    f"🚨 *{exp.symbol} cerca de liquidación*\n"
+                    f"📍 Mark: `{m['mark']}` | Liquidación: `{m['liquidacion']}`\n"
+                    f"📏 Distancia: `{distancia:.2%}` | PnL: `${m['pnl_no_realizado']:.2f}`"
+                )
+            elif distancia > 2 * self.umbral_liquidacion:
+                exp.alertas.discard("liquidacion")
+
+        r = m["r"]
+        if r is None:
+            return
+        for nivel in self.niveles_r:
+            alcanzado = r >= nivel if nivel > 0 else r <= nivel
+            clave = f"r{nivel:g}"
+            if alcanzado and clave not in exp.alertas:
+                exp.alertas.add(clave)
+                emoji = "📈" if nivel > 0 else "📉"
+                self.alertar(
+                    f"{emoji} *{exp.symbol} en {nivel:g}R*\n"
+                    f"📍 Mark: `{m['mark']}` | Entrada: `{exp.entrada}`\n"
+                    f"💰 PnL no realizado: `${m['pnl_no_realizado']:.2f}`"
+                )
+            elif not alcanzado and abs(r - nivel) > 0.5:
+                exp.alertas.discard(clave)
@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+
+logger = logging.getLogger()
+
+TTL_FILTROS = 3600
+APALANCAMIENTO_MAX_DEFECTO = 125
+# Margen de mantenimiento del primer bracket de BTCUSDT, si no se pudieron obtener los brackets
+MANTENIMIENTO_DEFECTO = 0.004
+
+
+def _exponente(paso: Decimal) -> Decimal:
+    decimales = max(-paso.normalize().as_tuple().exponent, 0)
+    return Decimal(1).scaleb(-decimales)
+
+
+# === Filtros de un símbolo (PRICE_FILTER, LOT_SIZE, MIN_NOTIONAL, brackets) ===
+
+class FiltrosSimbolo:
+    __slots__ = ("symbol", "tick_size", "step_size", "min_qty", "max_qty",
+                 "min_notional", "brackets", "_exp_precio", "_exp_cantidad")
+
+    def __init__(self, symbol, tick_size, step_size, min_qty, max_qty, min_notional, brackets=None):
+        self.symbol = symbol
+        self.tick_size = Decimal(tick_size)
+        self.step_size = Decimal(step_size)
+        self.min_qty = Decimal(min_qty)
+        self.max_qty = Decimal(max_qty)
+        self.min_notional = Decimal(min_notional)
+        # [(notionalCap, initialLeverage, maintMarginRatio, cum)] ordenado de menor a mayor nocional
+        self.brackets = brackets or []
+        # Cuantizadores precalculados: tantos decimales como tenga el tick/step
+        self._exp_precio = _exponente(self.tick_size)
+        self._exp_cantidad = _exponente(self.step_size)
+
+    @classmethod
+    def desde_exchange_info(cls, info_simbolo, brackets=None):
+        filtros = {f["filterType"]: f for f in info_simbolo["filters"]}
+        return cls(
+            symbol=info_simbolo["symbol"],
+            tick_size=filtros["PRICE_FILTER"]["tickSize"],
+            step_size=filtros["LOT_SIZE"]["stepSize"],
+            min_qty=filtros["LOT_SIZE"]["minQty"],
+            max_qty=filtros["LOT_SIZE"]["maxQty"],
+            min_notional=filtros.get("MIN_NOTIONAL", {}).get("notional", "0"),
+            brackets=brackets,
+        )
+
+    def precio(self, valor) -> Decimal:
+        pasos = (Decimal(str(valor)) / self.tick_size).to_integral_value(rounding=ROUND_HALF_UP)
+        return (pasos * self.tick_size).quantize(self._exp_precio)
+
+    def cantidad(self, valor) -> Decimal:
+        # La cantidad se redondea hacia abajo para no superar el riesgo calculado
+        pasos = (Decimal(str(valor)) / self.step_size).to_integral_value(rounding=ROUND_DOWN)
+        return min(pasos * self.step_size, self.max_qty).quantize(self._exp_cantidad)
+
+    def apalancamiento_max(self, notional=0.0) -> int:
+        for cap, apalancamiento, *_ in self.brackets:
+            if notional <= cap:
+                return apalancamiento
+        return self.brackets[-1][1] if self.brackets else APALANCAMIENTO_MAX_DEFECTO
+
+    def mantenimiento(self, notional=0.0):
+        """(maintMarginRatio, cum) del bracket que corresponde al nocional."""
+        for cap, _, ratio, cum in self.brackets:
+            if notional <= cap:
+                return ratio, cum
+        return (self.brackets[-1][2], self.brackets[-1][3]) if self.brackets else (MANTENIMIENTO_DEFECTO, 0.0)
+
+    def validar_orden(self, cantidad, precio):
+        """Devuelve un mensaje de error si la orden no pasa los filtros mínimos, o None."""
+        cantidad = Decimal(str(cantidad))
+        if cantidad < self.min_qty:
+            return f"Cantidad {cantidad} menor al mínimo {self.min_qty} de {self.symbol}"
+        if cantidad * Decimal(str(precio)) < self.min_notional:
+            return f"Nocional menor al mínimo {self.min_notional} USDT de {self.symbol}"
+        return None
+
+
+# === Servicio con cache de filtros para todos los símbolos ===
+
+class ServicioFiltros:
+    """
+    Carga una vez `exchange_info` (y los brackets de apalancamiento) y los mantiene en memoria.
+    Pasado el TTL se refrescan en segundo plano: el camino de órdenes nunca espera a la red,
+    salvo la primera vez que se consulta un símbolo sin cache.
+    """
+
+    def __init__(self, client, ttl=TTL_FILTROS):
+        self.client = client
+        self.ttl = ttl
+        self._filtros = {}
+        self._cargado_en = 0.0
+        self._lock = threading.Lock()
+        self._refrescando = False
+
+    def cargar(self):
+        info = self.client.exchange_info()
+        brackets = self._obtener_brackets()
+
+        filtros = {}
+        for s in info["symbols"]:
+            try:
+                filtros[s["symbol"]] = FiltrosSimbolo.desde_exchange_info(s, brackets.get(s["symbol"]))
+            except KeyError:
+                continue
+
+        with self._lock:
+            self._filtros = filtros
+            self._cargado_en = time.monotonic()
+        logger.info("📐 Filtros de %s símbolos cargados.", len(filtros))
+
+    def obtener(self, symbol: str) -> FiltrosSimbolo:
+        if not self._filtros:
+            self.cargar()
+        elif time.monotonic() - self._cargado_en > self.ttl:
+            self._refrescar_en_segundo_plano()
+
+        filtros = self._filtros.get(symbol)
+        if filtros is None:
+            raise ValueError(f"Símbolo desconocido en exchange_info: {symbol}")
+        return filtros
+
+    def ajustar_precio(self, symbol: str, valor) -> str:
+        return str(self.obtener(symbol).precio(valor))
+
+    def ajustar_cantidad(self, symbol: str, valor) -> str:
+        return str(self.obtener(symbol).cantidad(valor))
+
+    def apalancamiento_max(self, symbol: str, notional=0.0) -> int:
+        return self.obtener(symbol).apalancamiento_max(notional)
+
+    def _obtener_brackets(self):
+        try:
+            respuesta = self.client.leverage_brackets()
+        except Exception as e:
+            logger.warning("⚠️ No se pudieron obtener los brackets de apalancamiento: %s", e)
+            return {}
+
+        return {
+            r["symbol"]: sorted(
+                (float(b["notionalCap"]), int(b["initialLeverage"]), float(b.get("maintMarginRatio", MANTENIMIENTO_DEFECTO)), float(b.get("cum", 0)))
+                for b in r["brackets"]
+            )
+            for r in respuesta
+        }
+
+    def _refrescar_en_segundo_plano(self):
+        with self._lock:
+            if self._refrescando:
+                return
+            self._refrescando = True
+
+        def refrescar():
+            try:
+                self.cargar()
+            except Exception as e:
+                logger.error("❌ Error al refrescar filtros: %s", e)
+                # Se conserva la cache anterior y se reintenta en el próximo TTL
+                self._cargado_en = time.monotonic()
+            finally:
+                self._refrescando = False
+
+        threading.Thread(target=refrescar, daemon=True).start()
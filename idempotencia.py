@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from metricas import metricas
+
+# TradingView reintenta el webhook si no recibe respuesta: dentro de esta ventana una señal
+# idéntica se considera el mismo envío
+VENTANA_DEDUP_MS = int(os.getenv("VENTANA_DEDUP_S", "600")) * 1000
+CLAVES_EN_MEMORIA = 1000
+PREFIJO_ORDEN = "bot"
+
+# Campos que identifican una señal (time / timenow / id si la alerta de TradingView los manda)
+CAMPOS_SENAL = ("symbol", "side", "entry", "sl_distance", "tp_factor", "risk_percent", "limit_offset", "time", "timenow", "id")
+
+Reserva = namedtuple("Reserva", "senal_id client_order_id ts duplicada")
+
+
+def clave_senal(datos: dict) -> str:
+    """
+    Clave determinística de una señal: el mismo payload da siempre la misma clave. Si la
+    alerta manda `idempotency_key`, se usa esa.
+    """
+    explicita = datos.get("idempotency_key")
+    if explicita:
+        base = f"clave:{explicita}"
+    else:
+        base = json.dumps({c: str(datos[c]).upper() for c in CAMPOS_SENAL if c in datos}, sort_keys=True)
+    return hashlib.sha256(base.encode()).hexdigest()
+
+
+def client_order_id(clave: str, ts_ms: int) -> str:
+    """newClientOrderId de la entrada (máximo 36 caracteres en Binance)."""
+    return f"{PREFIJO_ORDEN}-{clave[:20]}-{ts_ms // 1000:x}"
+
+
+# === Índice de señales recientes ===
+
+class IndiceIdempotencia:
+    """
+    Señales vistas en los últimos `ventana_ms`: un LRU en memoria para los reintentos que llegan
+    al mismo worker y, si hay `almacen`, una tabla en SQLite compartida por todos los workers
+    que además sobrevive a un reinicio.
+    """
+
+    def __init__(self, almacen=None, ventana_ms=VENTANA_DEDUP_MS, capacidad=CLAVES_EN_MEMORIA):
+        self.almacen = almacen
+        self.ventana_ms = ventana_ms
+        self.capacidad = capacidad
+        self._recientes = OrderedDict()  # clave -> Reserva
+        self._lock = threading.Lock()
+
+    def reservar(self, clave, senal_id, ahora_ms=None) -> Reserva:
+        """
+        Registra la señal `clave` como `senal_id`. Si ya se había recibido dentro de la
+        ventana devuelve la reserva original con duplicada=True.
+        """
+        ahora_ms = ahora_ms or int(time.time() * 1000)
+        with self._lock:
+            reserva = self._recientes.get(clave)
+            if reserva is not None and ahora_ms - reserva.ts < self.ventana_ms:
+                self._recientes.move_to_end(clave)
+                metricas.incrementar("senales_duplicadas_total", origen="memoria")
+                return reserva._replace(duplicada=True)
+
+            reserva = Reserva(senal_id, client_order_id(clave, ahora_ms), ahora_ms, False)
+            if self.almacen is not None:
+                senal_previa, cliente_previo, ts_previo, nueva = self.almacen.reservar_clave(
+                    clave, senal_id, reserva.client_order_id, ahora_ms, self.ventana_ms
+                )
+                if not nueva:
+                    metricas.incrementar("senales_duplicadas_total", origen="almacen")
+                    reserva = Reserva(senal_previa, cliente_previo, ts_previo, True)
+
+            self._recientes[clave] = reserva._replace(duplicada=False)
+            self._recientes.move_to_end(clave)
+            while len(self._recientes) > self.capacidad:
+                self._recientes.popitem(last=False)
+            return reserva
+
+    def liberar(self, clave, senal_id):
+        """Olvida una reserva cuya señal no se llegó a procesar (p. ej. cola llena), para aceptar el reintento."""
+        with self._lock:
+            reserva = self._recientes.get(clave)
+            if reserva is not None and reserva.senal_id == senal_id:
+                del self._recientes[clave]
+            if self.almacen is not None:
+                self.almacen.liberar_clave(clave, senal_id)
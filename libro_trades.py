@@ -0,0 +1,142 @@
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger()
+
+# Máximo que devuelve GET /fapi/v1/userTrades por llamada
+LIMITE_TRADES = 1000
+
+
+# === Libro local de trades de la cuenta ===
+
+class LibroTrades:
+    """
+    Copia local e incremental de `get_account_trades`, persistida en SQLite.
+    Solo se descargan los trades posteriores al último id guardado y las
+    consultas por orderId / tiempo usan índices en lugar de recorrer el historial.
+    """
+
+    def __init__(self, ruta=":memory:"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS trades (
+                symbol TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                order_id INTEGER NOT NULL,
+                time INTEGER NOT NULL,
+                side TEXT NOT NULL,
+                realized_pnl REAL NOT NULL,
+                commission REAL NOT NULL,
+                qty REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (symbol, id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_trades_order ON trades (symbol, order_id);
+            CREATE INDEX IF NOT EXISTS idx_trades_time ON trades (symbol, time);
+        """)
+        # Libros creados antes de guardar la cantidad de cada trade
+        columnas = {fila[1] for fila in self._conn.execute("PRAGMA table_info(trades)")}
+        if "qty" not in columnas:
+            self._conn.execute("ALTER TABLE trades ADD COLUMN qty REAL NOT NULL DEFAULT 0")
+
+    def ultimo_id(self, symbol: str):
+        with self._lock:
+            fila = self._conn.execute("SELECT MAX(id) FROM trades WHERE symbol = ?", (symbol,)).fetchone()
+        return fila[0]
+
+    def sincronizar(self, client, symbol: str):
+        """Descarga solo los trades nuevos (fromId = último id + 1). Devuelve cuántos se agregaron."""
+        ultimo = self.ultimo_id(symbol)
+        nuevos = 0
+
+        while True:
+            params = {"limit": LIMITE_TRADES}
+            if ultimo is not None:
+                params["fromId"] = ultimo + 1
+
+            trades = client.get_account_trades(symbol=symbol, **params)
+            if not trades:
+                break
+
+            self.registrar(symbol, trades)
+            nuevos += len(trades)
+            ultimo = max(int(t["id"]) for t in trades)
+
+            if len(trades) < LIMITE_TRADES:
+                break
+
+        return nuevos
+
+    def registrar(self, symbol: str, trades):
+        filas = [
+            (
+                symbol,
+                int(t["id"]),
+                int(t["orderId"]),
+                int(t["time"]),
+                t["side"],
+                float(t.get("realizedPnl", 0)),
+                float(t.get("commission", 0)),
+                float(t.get("qty", 0)),
+            )
+            for t in trades
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO trades (symbol, id, order_id, time, side, realized_pnl, commission, qty) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                filas,
+            )
+
+    def pnl_por_order_id(self, symbol: str, order_id: int):
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT COALESCE(SUM(realized_pnl), 0), COALESCE(SUM(commission), 0) "
+                "FROM trades WHERE symbol = ? AND order_id = ?",
+                (symbol, int(order_id)),
+            ).fetchone()
+        return fila[0], fila[1]
+
+    def pnl_desde(self, symbol: str, timestamp: int):
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT COALESCE(SUM(realized_pnl), 0), COALESCE(SUM(commission), 0) "
+                "FROM trades WHERE symbol = ? AND time >= ?",
+                (symbol, int(timestamp)),
+            ).fetchone()
+        return fila[0], fila[1]
+
+    def pnl_operacion(self, symbol: str, order_id_entrada, timestamp: int):
+        """
+        PnL y comisiones de una operación completa: los trades de la orden de entrada más
+        todo lo ejecutado desde `timestamp` (las salidas), sin contar dos veces la entrada.
+        """
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT COALESCE(SUM(realized_pnl), 0), COALESCE(SUM(commission), 0) "
+                "FROM trades WHERE symbol = ? AND (order_id = ? OR time >= ?)",
+                (symbol, int(order_id_entrada or 0), int(timestamp)),
+            ).fetchone()
+        return fila[0], fila[1]
+
+    def fills_por_orden(self, symbol: str, timestamp: int, side: str):
+        """{order_id: cantidad ejecutada} de los trades de `side` desde `timestamp` (p. ej. las salidas)."""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT order_id, SUM(qty) FROM trades WHERE symbol = ? AND time >= ? AND side = ? GROUP BY order_id",
+                (symbol, int(timestamp), side),
+            ).fetchall()
+        return dict(filas)
+
+    def hay_fill_desde(self, symbol: str, timestamp: int, side: str):
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT 1 FROM trades WHERE symbol = ? AND time >= ? AND side = ? LIMIT 1",
+                (symbol, int(timestamp), side),
+            ).fetchone()
+        return fila is not None
+
+
+libro_trades = LibroTrades(os.getenv("LIBRO_TRADES_DB", "trades.db"))
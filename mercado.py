@@ -0,0 +1,275 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from binance.websocket.um_futures.websocket_client import UMFuturesWebsocketClient
+from metricas import metricas
+
+logger = logging.getLogger()
+
+# Velas de 1m que se guardan por símbolo (buffer circular)
+VELAS_EN_MEMORIA = 120
+# Datos más viejos que esto no se usan para decidir (el stream puede estar caído)
+ANTIGUEDAD_MAXIMA_MS = 5000
+ESPERA_RECONEXION_MAX = 60
+
+# === Guardia de entrada ===
+# GUARDIA_ENTRADA: "avisar" (por defecto: solo deja un warning), "rechazar", "repreciar" u "off"
+# MAX_DESVIO_ENTRADA: desvío tolerado entre el entry y el mercado, en fracción (por defecto 0.005)
+GUARDIA_DESACTIVADA = "off"
+GUARDIA_AVISAR = "avisar"
+GUARDIA_RECHAZAR = "rechazar"
+GUARDIA_REPRECIAR = "repreciar"
+
+
+def _ms():
+    return int(time.time() * 1000)
+
+
+class Cotizacion:
+    """Último mark price y mejor bid/ask de un símbolo, con la hora (ms) de cada dato."""
+    __slots__ = ("mark", "mark_ts", "bid", "ask", "libro_ts")
+
+    def __init__(self):
+        self.mark = None
+        self.mark_ts = 0
+        self.bid = None
+        self.ask = None
+        self.libro_ts = 0
+
+
+# === Datos de mercado en memoria ===
+
+class MercadoLocal:
+    """
+    Mantiene en memoria, por símbolo, el último mark price, el mejor bid/ask y las últimas
+    velas de 1m (buffer circular). Se alimenta de los streams públicos de Binance: nunca
+    consulta REST, así que leerlo en el camino del webhook cuesta microsegundos.
+
+    Args:
+        simbolos: símbolos con book ticker y velas desde el inicio (el mark price llega de todos).
+        stream_url: URL base del websocket.
+        velas: cantidad de velas de 1m a guardar por símbolo.
+    """
+
+    def __init__(self, simbolos=(), stream_url="wss://fstream.binance.com", velas=VELAS_EN_MEMORIA):
+        self.simbolos = {s.upper() for s in simbolos}
+        self.stream_url = stream_url
+        self.velas_max = velas
+        self._cotizaciones = {}         # symbol -> Cotizacion
+        self._velas = {}                # symbol -> deque[(apertura, open, high, low, close, volumen)]
+        self._vela_en_curso = {}        # symbol -> (apertura, open, high, low, close, volumen)
+        self._oyentes_mark = []         # funcion(symbol, mark, ts_ms) por cada mark price recibido
+        self._lock = threading.Lock()
+        self._ws = None
+        self._caida = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    # === Lecturas (camino del webhook) ===
+
+    def cotizacion(self, symbol):
+        return self._cotizaciones.get(symbol)
+
+    def precio_referencia(self, symbol, ahora_ms=None):
+        """Mid del libro si está fresco; si no, el mark price fresco; None si no hay datos recientes."""
+        cotizacion = self._cotizaciones.get(symbol)
+        if cotizacion is None:
+            return None
+        ahora_ms = ahora_ms or _ms()
+        if cotizacion.bid is not None and ahora_ms - cotizacion.libro_ts <= ANTIGUEDAD_MAXIMA_MS:
+            return (cotizacion.bid + cotizacion.ask) / 2
+        if cotizacion.mark is not None and ahora_ms - cotizacion.mark_ts <= ANTIGUEDAD_MAXIMA_MS:
+            return cotizacion.mark
+        return None
+
+    def velas(self, symbol, cantidad=None):
+        """Velas cerradas más recientes (la última al final) más la vela en curso."""
+        with self._lock:
+            velas = list(self._velas.get(symbol, ()))
+            en_curso = self._vela_en_curso.get(symbol)
+        if en_curso is not None:
+            velas.append(en_curso)
+        return velas[-cantidad:] if cantidad else velas
+
+    # === Actualización ===
+
+    def procesar_mensaje(self, mensaje):
+        evento = json.loads(mensaje) if isinstance(mensaje, (str, bytes)) else mensaje
+        evento = evento.get("data", evento)
+
+        if isinstance(evento, list):
+            # !markPrice@arr: un arreglo con el mark price de todos los símbolos
+            for item in evento:
+                self._actualizar_mark(item)
+            return
+
+        tipo = evento.get("e")
+        if tipo == "markPriceUpdate":
+            self._actualizar_mark(evento)
+        elif tipo == "bookTicker":
+            cotizacion = self._cotizacion(evento["s"])
+            cotizacion.bid = float(evento["b"])
+            cotizacion.ask = float(evento["a"])
+            cotizacion.libro_ts = int(evento.get("E") or evento.get("T") or _ms())
+        elif tipo == "kline":
+            self._actualizar_vela(evento["s"], evento["k"])
+
+    def suscribir_mark(self, funcion):
+        """
+        Llama a `funcion(symbol, mark, ts_ms)` con cada mark price, en el hilo del stream: tiene
+        que ser rápida y no consultar a Binance.
+        """
+        self._oyentes_mark.append(funcion)
+
+    def agregar_simbolo(self, symbol):
+        """Suscribe book ticker y velas de un símbolo nuevo (p. ej. el de una señal)."""
+        symbol = symbol.upper()
+        if symbol in self.simbolos:
+            return
+        self.simbolos.add(symbol)
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.subscribe(stream=self._streams_simbolo(symbol))
+            except Exception as e:
+                logger.warning("⚠️ No se pudo suscribir %s al stream de mercado: %s", symbol, e)
+
+    def _cotizacion(self, symbol):
+        cotizacion = self._cotizaciones.get(symbol)
+        if cotizacion is None:
+            cotizacion = self._cotizaciones.setdefault(symbol, Cotizacion())
+        return cotizacion
+
+    def _actualizar_mark(self, evento):
+        cotizacion = self._cotizacion(evento["s"])
+        cotizacion.mark = float(evento["p"])
+        cotizacion.mark_ts = int(evento.get("E") or _ms())
+        for funcion in self._oyentes_mark:
+            try:
+                funcion(evento["s"], cotizacion.mark, cotizacion.mark_ts)
+            except Exception as e:
+                logger.exception("❌ Error procesando el mark price de %s: %s", evento['s'], e)
+
+    def _actualizar_vela(self, symbol, k):
+        vela = (int(k["t"]), float(k["o"]), float(k["h"]), float(k["l"]), float(k["c"]), float(k["v"]))
+        with self._lock:
+            if k.get("x"):
+                buffer = self._velas.get(symbol)
+                if buffer is None:
+                    buffer = self._velas[symbol] = deque(maxlen=self.velas_max)
+                if not buffer or buffer[-1][0] != vela[0]:
+                    buffer.append(vela)
+                self._vela_en_curso.pop(symbol, None)
+            else:
+                self._vela_en_curso[symbol] = vela
+
+    # === Conexión (misma lógica de reconexión que el stream de usuario) ===
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._supervisar, name="stream_mercado", daemon=True)
+        self._hilo.start()
+
+    def conectar_local(self, suscribir):
+        """Recibe los datos de una fuente en el mismo proceso (el exchange simulado)."""
+        suscribir(self.procesar_mensaje)
+
+    def detener(self):
+        self._detener.set()
+        self._caida.set()
+        self._cerrar_ws()
+
+    def _streams_simbolo(self, symbol):
+        symbol = symbol.lower()
+        return [f"{symbol}@bookTicker", f"{symbol}@kline_1m"]
+
+    def _supervisar(self):
+        espera = 1
+        while not self._detener.is_set():
+            try:
+                self._caida.clear()
+                self._ws = UMFuturesWebsocketClient(
+                    stream_url=self.stream_url,
+                    on_message=lambda _, mensaje: self._on_message(mensaje),
+                    on_close=lambda *_: self._caida.set(),
+                    on_error=lambda *_: self._caida.set(),
+                    is_combined=True,
+                )
+                streams = ["!markPrice@arr@1s"]
+                for symbol in sorted(self.simbolos):
+                    streams.extend(self._streams_simbolo(symbol))
+                self._ws.subscribe(stream=streams)
+                espera = 1
+                logger.info("📈 Stream de mercado conectado (%s símbolos con libro y velas).", len(self.simbolos))
+                self._caida.wait()
+            except Exception as e:
+                logger.error("❌ Error en stream de mercado: %s", e)
+
+            self._cerrar_ws()
+            if self._detener.is_set():
+                break
+            logger.warning("🔁 Stream de mercado caído. Reintento en %ss", espera)
+            self._detener.wait(espera)
+            espera = min(espera * 2, ESPERA_RECONEXION_MAX)
+
+    def _cerrar_ws(self):
+        ws, self._ws = self._ws, None
+        if ws is None:
+            return
+        try:
+            ws.stop()
+        except Exception:
+            pass
+
+    def _on_message(self, mensaje):
+        try:
+            self.procesar_mensaje(mensaje)
+        except Exception as e:
+            logger.error("❌ Error procesando dato de mercado: %s", e)
+
+
+# === Guardia de entrada: el precio de la señal contra el mercado actual ===
+
+class GuardiaEntrada:
+    """
+    Compara el `entry` de la señal con el precio de referencia local. Si se desvió más de
+    `max_desvio` (fracción, 0.005 = 0.5%) la señal se rechaza o se reprecia al mercado según
+    `modo`; por defecto (`avisar`) solo queda el warning y la señal sigue igual, hasta que se
+    elija otro modo. Sin datos frescos de mercado la señal pasa sin cambios.
+    """
+
+    def __init__(self, mercado, max_desvio=None, modo=None):
+        self.mercado = mercado
+        self.max_desvio = float(max_desvio if max_desvio is not None else os.getenv("MAX_DESVIO_ENTRADA", "0.005"))
+        self.modo = modo or os.getenv("GUARDIA_ENTRADA", GUARDIA_AVISAR)
+
+    def evaluar(self, symbol, side, entry):
+        """
+        Devuelve (entry, error). `error` es un texto si la señal se rechaza; `entry` es el precio
+        a usar (el original o el repreciado).
+        """
+        if self.modo == GUARDIA_DESACTIVADA:
+            return entry, None
+
+        referencia = self.mercado.precio_referencia(symbol)
+        if referencia is None:
+            return entry, None
+
+        desvio = abs(referencia - entry) / entry
+        if desvio <= self.max_desvio:
+            return entry, None
+
+        if self.modo == GUARDIA_REPRECIAR:
+            logger.warning("🎯 %s: entry %s desviado %.2f%% del mercado, repreciado a %s", symbol, entry, desvio * 100, referencia)
+            return referencia, None
+        if self.modo == GUARDIA_AVISAR:
+            logger.warning("🎯 %s: entry %s desviado %.2f%% del mercado (%s), se ejecuta igual", symbol, entry, desvio * 100, referencia)
+            metricas.incrementar("senales_desviadas_total")
+            return entry, None
+
+        return entry, f"Entry {entry} desviado {desvio:.2%} del mercado ({referencia}) en {symbol}, máximo {self.max_desvio:.2%}"
@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Cantidad de observaciones recientes que se guardan por serie para calcular percentiles
+MUESTRAS_POR_SERIE = 1024
+CUANTILES = (0.5, 0.95, 0.99)
+
+
+def _clave(nombre, etiquetas):
+    return nombre, tuple(sorted(etiquetas.items()))
+
+
+def _formatear_etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pares) + "}"
+
+
+class _Serie:
+    __slots__ = ("muestras", "suma", "cantidad")
+
+    def __init__(self):
+        self.muestras = deque(maxlen=MUESTRAS_POR_SERIE)
+        self.suma = 0.0
+        self.cantidad = 0
+
+    def cuantiles(self):
+        ordenadas = sorted(self.muestras)
+        if not ordenadas:
+            return {}
+        return {q: ordenadas[min(int(q * len(ordenadas)), len(ordenadas) - 1)] for q in CUANTILES}
+
+
+# === Registro de métricas en memoria (formato de exposición Prometheus) ===
+
+class RegistroMetricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencias = {}
+        self._contadores = {}
+        self._medidores = {}
+
+    def observar(self, nombre, segundos, **etiquetas):
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            serie = self._latencias.get(clave)
+            if serie is None:
+                serie = self._latencias[clave] = _Serie()
+            serie.muestras.append(segundos)
+            serie.suma += segundos
+            serie.cantidad += 1
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+
+    def fijar(self, nombre, valor, **etiquetas):
+        with self._lock:
+            self._medidores[_clave(nombre, etiquetas)] = valor
+
+    @contextmanager
+    def cronometro(self, nombre, **etiquetas):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nombre, time.perf_counter() - inicio, **etiquetas)
+
+    def cronometrar(self, nombre, **etiquetas):
+        """Decorador equivalente a `cronometro`."""
+        def decorador(funcion):
+            @wraps(funcion)
+            def envoltura(*args, **kwargs):
+                with self.cronometro(nombre, **etiquetas):
+                    return funcion(*args, **kwargs)
+            return envoltura
+        return decorador
+
+    def percentiles(self, nombre, **etiquetas):
+        with self._lock:
+            serie = self._latencias.get(_clave(nombre, etiquetas))
+            return serie.cuantiles() if serie else {}
+
+    def total(self, nombre):
+        """Suma de un contador sobre todas sus etiquetas."""
+        with self._lock:
+            return sum(v for (n, _), v in self._contadores.items() if n == nombre)
+
+    def exportar(self) -> str:
+        lineas = []
+        with self._lock:
+            latencias = sorted(self._latencias.items())
+            contadores = sorted(self._contadores.items())
+            medidores = sorted(self._medidores.items())
+
+            tipos_emitidos = set()
+            for (nombre, etiquetas), serie in latencias:
+                if nombre not in tipos_emitidos:
+                    lineas.append(f"# TYPE {nombre} summary")
+                    tipos_emitidos.add(nombre)
+                for q, valor in serie.cuantiles().items():
+                    lineas.append(f"{nombre}{_formatear_etiquetas(etiquetas, [('quantile', q)])} {valor:.6f}")
+                lineas.append(f"{nombre}_sum{_formatear_etiquetas(etiquetas)} {serie.suma:.6f}")
+                lineas.append(f"{nombre}_count{_formatear_etiquetas(etiquetas)} {serie.cantidad}")
+
+        for tipo, series in (("counter", contadores), ("gauge", medidores)):
+            for (nombre, etiquetas), valor in series:
+                if nombre not in tipos_emitidos:
+                    lineas.append(f"# TYPE {nombre} {tipo}")
+                    tipos_emitidos.add(nombre)
+                lineas.append(f"{nombre}{_formatear_etiquetas(etiquetas)} {valor}")
+
+        return "\n".join(lineas) + "\n"
+
+
+metricas = RegistroMetricas()
+
+
+# === Cliente Binance instrumentado ===
+
+class ClienteInstrumentado:
+    """
+    Envuelve al cliente Binance: mide la latencia de cada llamada, cuenta los ClientError
+    por código y lee del header de cada respuesta el peso REST usado en el último minuto.
+    El resto de los atributos se delegan al cliente original.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        session = getattr(client, "session", None)
+        if session is not None:
+            session.hooks.setdefault("response", []).append(self._leer_headers)
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._client, nombre)
+        if not callable(atributo) or nombre.startswith("_"):
+            return atributo
+
+        @wraps(atributo)
+        def llamada(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return atributo(*args, **kwargs)
+            except Exception as e:
+                codigo = getattr(e, "error_code", None) or type(e).__name__
+                metricas.incrementar("binance_errores_total", metodo=nombre, codigo=codigo)
+                raise
+            finally:
+                metricas.observar("binance_request_seconds", time.perf_counter() - inicio, metodo=nombre)
+
+        return llamada
+
+    @staticmethod
+    def _leer_headers(response, *args, **kwargs):
+        for header, valor in response.headers.items():
+            header = header.lower()
+            if header.startswith("x-mbx-used-weight-") or header.startswith("x-mbx-order-count-"):
+                metricas.fijar("binance_limite_usado", int(valor), header=header)
+        return response
+
@@ -0,0 +1,185 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger()
+
+
+# === Almacén durable del estado de las posiciones ===
+
+class AlmacenEstado:
+    """
+    Persiste cada posición en SQLite (modo WAL) en cada transición, junto con un log
+    de transiciones. Permite reconstruir el estado del bot después de un reinicio y,
+    como varios workers comparten el archivo, el log sirve también de feed de cambios
+    entre procesos (`cambios_desde`).
+    """
+
+    def __init__(self, ruta=":memory:"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS posiciones (
+                symbol TEXT PRIMARY KEY,
+                estado TEXT NOT NULL,
+                datos TEXT NOT NULL,
+                actualizado INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS transiciones (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                symbol TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                datos TEXT NOT NULL,
+                ts INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS senales (
+                id TEXT PRIMARY KEY,
+                estado TEXT NOT NULL,
+                datos TEXT NOT NULL,
+                recibida INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_senales_recibida ON senales (recibida);
+            CREATE TABLE IF NOT EXISTS idempotencia (
+                clave TEXT PRIMARY KEY,
+                senal_id TEXT NOT NULL,
+                client_order_id TEXT NOT NULL,
+                ts INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_idempotencia_ts ON idempotencia (ts);
+            CREATE TABLE IF NOT EXISTS cuenta (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                clave TEXT NOT NULL UNIQUE,
+                datos TEXT NOT NULL
+            );
+        """)
+
+    def guardar(self, datos: dict, nueva=False):
+        """
+        Registra el estado actual de una posición (dict con symbol, estado y order_id).
+        Una posición `nueva` reemplaza a la anterior del símbolo; una transición solo se
+        aplica si el registro sigue siendo de la misma orden (otro proceso pudo reemplazarlo).
+        Devuelve el id de la transición registrada, o None si la escritura quedó obsoleta.
+        """
+        ts = int(time.time() * 1000)
+        texto = json.dumps(datos)
+        with self._lock, self._conn:
+            if nueva:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO posiciones VALUES (?, ?, ?, ?)",
+                    (datos["symbol"], datos["estado"], texto, ts),
+                )
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE posiciones SET estado = ?, datos = ?, actualizado = ? "
+                    "WHERE symbol = ? AND json_extract(datos, '$.order_id') = ?",
+                    (datos["estado"], texto, ts, datos["symbol"], datos["order_id"]),
+                )
+                if cursor.rowcount == 0:
+                    return None
+            cursor = self._conn.execute(
+                "INSERT INTO transiciones (symbol, estado, datos, ts) VALUES (?, ?, ?, ?)",
+                (datos["symbol"], datos["estado"], texto, ts),
+            )
+        return cursor.lastrowid
+
+    def cargar(self, excluir_estados=()):
+        with self._lock:
+            filas = self._conn.execute("SELECT estado, datos FROM posiciones").fetchall()
+        return [json.loads(datos) for estado, datos in filas if estado not in excluir_estados]
+
+    def cambios_desde(self, ultimo_id: int):
+        """Transiciones escritas (por cualquier proceso) después de `ultimo_id`: [(id, datos)]."""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT id, datos FROM transiciones WHERE id > ? ORDER BY id", (ultimo_id,)
+            ).fetchall()
+        return [(i, json.loads(d)) for i, d in filas]
+
+    def ultimo_cambio(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM transiciones").fetchone()[0]
+
+    def historial(self, symbol: str, limite=50):
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT datos FROM transiciones WHERE symbol = ? ORDER BY id DESC LIMIT ?",
+                (symbol, limite),
+            ).fetchall()
+        return [json.loads(f[0]) for f in filas]
+
+    # === Señales recibidas por el webhook ===
+
+    def guardar_senal(self, senal: dict):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO senales VALUES (?, ?, ?, ?)",
+                (senal["id"], senal["estado"], json.dumps(senal), senal["recibida"]),
+            )
+
+    def obtener_senal(self, senal_id: str):
+        with self._lock:
+            fila = self._conn.execute("SELECT datos FROM senales WHERE id = ?", (senal_id,)).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    # === Claves de idempotencia de las señales ===
+
+    def reservar_clave(self, clave, senal_id, client_order_id, ts, ventana_ms):
+        """
+        Registra `clave` si no se vio en los últimos `ventana_ms` (atómico entre procesos).
+        Devuelve (senal_id, client_order_id, ts, nueva) del registro vigente.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                fila = self._conn.execute(
+                    "SELECT senal_id, client_order_id, ts FROM idempotencia WHERE clave = ?", (clave,)
+                ).fetchone()
+                if fila and ts - fila[2] < ventana_ms:
+                    self._conn.commit()
+                    return fila[0], fila[1], fila[2], False
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO idempotencia VALUES (?, ?, ?, ?)",
+                    (clave, senal_id, client_order_id, ts),
+                )
+                self._conn.execute("DELETE FROM idempotencia WHERE ts < ?", (ts - ventana_ms,))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return senal_id, client_order_id, ts, True
+
+    def liberar_clave(self, clave, senal_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM idempotencia WHERE clave = ? AND senal_id = ?", (clave, senal_id))
+
+    # === Último estado de la cuenta (ACCOUNT_UPDATE) para los workers sin stream de usuario ===
+
+    def guardar_cuenta(self, cuenta: dict):
+        """Guarda el último balance (B) y posición (P) de cada activo / símbolo del evento."""
+        filas = [(f"B:{b['a']}", json.dumps(b)) for b in cuenta.get("B", [])]
+        filas += [(f"P:{p['s']}:{p.get('ps', 'BOTH')}", json.dumps(p)) for p in cuenta.get("P", [])]
+        if not filas:
+            return
+        with self._lock, self._conn:
+            # REPLACE borra la fila anterior de la clave: el id nuevo marca el cambio
+            self._conn.executemany("INSERT OR REPLACE INTO cuenta (clave, datos) VALUES (?, ?)", filas)
+
+    def cuenta_desde(self, ultimo_id: int):
+        """
+        Lo que cambió en la cuenta después de `ultimo_id`, con la forma de un ACCOUNT_UPDATE
+        ({"B": [...], "P": [...]}, o None si no hubo cambios), y el id hasta el que llega.
+        """
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT id, clave, datos FROM cuenta WHERE id > ? ORDER BY id", (ultimo_id,)
+            ).fetchall()
+        if not filas:
+            return None, ultimo_id
+        cuenta = {"B": [], "P": []}
+        for _, clave, datos in filas:
+            cuenta[clave[0]].append(json.loads(datos))
+        return cuenta, filas[-1][0]
@@ -0,0 +1,217 @@
+import logging
+import threading
+
+logger = logging.getLogger()
+
+# === Estados del ciclo de vida de una posición ===
+PENDIENTE_ENTRADA = "PENDING_ENTRY"
+EJECUTADA = "FILLED"
+PROTEGIDA = "PROTECTED"
+CERRADA = "EXITED"
+CANCELADA = "CANCELED"
+
+TRANSICIONES = {
+    PENDIENTE_ENTRADA: {EJECUTADA, CANCELADA},
+    EJECUTADA: {PROTEGIDA, CERRADA},
+    PROTEGIDA: {CERRADA},
+}
+
+ESTADOS_FINALES = {CERRADA, CANCELADA}
+
+
+class Posicion:
+    __slots__ = (
+        "symbol", "estado", "order_id", "side", "qty", "sl_distance", "tp_factor",
+        "risk_percent", "apalancamiento", "timestamp_inicio", "tp_order_id", "sl_order_id",
+        "precio_entrada", "sl_precio", "sl_cantidad", "escalera", "patas_tp", "version",
+    )
+
+    def __init__(self, symbol, order_id, side, qty, sl_distance, tp_factor,
+                 risk_percent=None, apalancamiento=None, timestamp_inicio=None, escalera=None):
+        self.symbol = symbol
+        self.estado = PENDIENTE_ENTRADA
+        self.order_id = order_id
+        self.side = side
+        self.qty = qty
+        self.sl_distance = sl_distance
+        self.tp_factor = tp_factor
+        self.risk_percent = risk_percent
+        self.apalancamiento = apalancamiento
+        self.timestamp_inicio = timestamp_inicio
+        self.tp_order_id = None
+        self.sl_order_id = None
+        self.precio_entrada = None
+        self.sl_precio = None
+        self.sl_cantidad = None         # None: SL closePosition; si no, reduceOnly por esta cantidad
+        self.escalera = escalera        # [(fracción, R)] de los TP; None = un solo TP a tp_factor
+        self.patas_tp = None            # [{"order_id", "qty", "precio", "llena"}] de los TP colocados
+        self.version = None             # id de la última transición del almacén que refleja (no se persiste)
+
+    def a_dict(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__ if campo != "version"}
+
+    @classmethod
+    def desde_dict(cls, datos: dict):
+        posicion = cls.__new__(cls)
+        for campo in cls.__slots__:
+            setattr(posicion, campo, datos.get(campo))
+        return posicion
+
+    def ordenes_salida(self):
+        """SL y TPs todavía abiertos."""
+        ordenes = {o for o in (self.tp_order_id, self.sl_order_id) if o is not None}
+        for pata in self.patas_tp or ():
+            if pata["llena"]:
+                ordenes.discard(pata["order_id"])
+            else:
+                ordenes.add(pata["order_id"])
+        return ordenes
+
+    def qty_abierta(self):
+        """Cantidad que sigue abierta después de los TP ya ejecutados."""
+        return round(self.qty - sum(p["qty"] for p in self.patas_tp or () if p["llena"]), 10)
+
+
+# === Gestor de posiciones concurrentes (una por símbolo) ===
+
+class GestorPosiciones:
+    """
+    Registro en memoria de las posiciones que maneja el bot, una por símbolo.
+    Todas las transiciones pasan por `transicion`, que es atómica: si el stream y el
+    monitor detectan el mismo evento, solo uno de los dos gana la transición.
+    Si se pasa un `almacen`, cada cambio de estado se persiste antes de liberar el lock,
+    y `sincronizar` incorpora lo que escribieron otros procesos en el mismo almacén.
+    """
+
+    def __init__(self, almacen=None):
+        self._posiciones = {}
+        self._lock = threading.RLock()
+        self.almacen = almacen
+        self._ultimo_cambio = 0
+        self._ultimo_final = {}     # symbol -> id de su última transición a un estado final
+
+    def abrir(self, symbol, **datos) -> Posicion:
+        posicion = Posicion(symbol, **datos)
+        with self._lock:
+            anterior = self._posiciones.get(symbol)
+            if anterior and anterior.estado not in (PENDIENTE_ENTRADA, *ESTADOS_FINALES):
+                raise ValueError(f"Ya hay una posición {anterior.estado} en {symbol}")
+            self._posiciones[symbol] = posicion
+            self._persistir(posicion, nueva=True)
+        return posicion
+
+    def restaurar(self, posicion: Posicion):
+        """Vuelve a registrar una posición recuperada del almacén, sin transición."""
+        with self._lock:
+            self._posiciones[posicion.symbol] = posicion
+
+    def obtener(self, symbol):
+        return self._posiciones.get(symbol)
+
+    def transicion(self, posicion: Posicion, desde, hacia, **cambios) -> bool:
+        if hacia not in TRANSICIONES.get(desde, ()):
+            raise ValueError(f"Transición inválida {desde} → {hacia}")
+
+        with self._lock:
+            if self._posiciones.get(posicion.symbol) is not posicion or posicion.estado != desde:
+                return False
+            for campo, valor in cambios.items():
+                setattr(posicion, campo, valor)
+            posicion.estado = hacia
+            if hacia in ESTADOS_FINALES:
+                del self._posiciones[posicion.symbol]
+            self._persistir(posicion)
+
+        logger.info("🔀 %s: %s → %s", posicion.symbol, desde, hacia)
+        return True
+
+    def actualizar(self, posicion: Posicion, **cambios) -> bool:
+        """Cambia datos de una posición sin cambiar de estado (p. ej. el SL movido)."""
+        with self._lock:
+            if self._posiciones.get(posicion.symbol) is not posicion or posicion.estado in ESTADOS_FINALES:
+                return False
+            for campo, valor in cambios.items():
+                setattr(posicion, campo, valor)
+            self._persistir(posicion)
+        return True
+
+    def activas(self):
+        with self._lock:
+            return list(self._posiciones.values())
+
+    def por_estado(self, estado):
+        return [p for p in self.activas() if p.estado == estado]
+
+    def cargar_desde_almacen(self):
+        """Reemplaza el estado en memoria por las posiciones no finalizadas del almacén."""
+        if self.almacen is None:
+            return []
+        with self._lock:
+            self._ultimo_cambio = self.almacen.ultimo_cambio()
+            self._posiciones = {
+                d["symbol"]: Posicion.desde_dict(d)
+                for d in self.almacen.cargar(excluir_estados=ESTADOS_FINALES)
+            }
+            for posicion in self._posiciones.values():
+                posicion.version = self._ultimo_cambio
+            return list(self._posiciones.values())
+
+    def sincronizar(self):
+        """
+        Aplica en memoria los cambios que otros procesos dejaron en el almacén. Devuelve True
+        si hubo transiciones nuevas (de cualquier proceso, incluido este) desde la última vez.
+        """
+        if self.almacen is None:
+            return False
+
+        cambios = self.almacen.cambios_desde(self._ultimo_cambio)
+        with self._lock:
+            # Cierres del lote: las filas anteriores del mismo símbolo ya quedaron superadas
+            for id_cambio, datos in cambios:
+                if datos["estado"] in ESTADOS_FINALES:
+                    self._ultimo_final[datos["symbol"]] = max(id_cambio, self._ultimo_final.get(datos["symbol"], 0))
+
+        for id_cambio, datos in cambios:
+            with self._lock:
+                self._ultimo_cambio = id_cambio
+                actual = self._posiciones.get(datos["symbol"])
+                misma_orden = actual is not None and actual.order_id == datos["order_id"]
+
+                if datos["estado"] not in ESTADOS_FINALES and id_cambio < self._ultimo_final.get(datos["symbol"], 0):
+                    # Fila vieja de una posición que ya se cerró o canceló (p. ej. propia): no la revive
+                    continue
+                if datos["estado"] in ESTADOS_FINALES:
+                    if misma_orden:
+                        actual.estado = datos["estado"]
+                        del self._posiciones[datos["symbol"]]
+                elif not misma_orden:
+                    nueva = self._posiciones[datos["symbol"]] = Posicion.desde_dict(datos)
+                    nueva.version = id_cambio
+                elif id_cambio > (actual.version or 0):
+                    # Misma orden: se actualiza en el lugar solo con una fila más nueva que la que
+                    # ya refleja; una vieja (propia, o leída antes de un `actualizar` concurrente)
+                    # no hace retroceder el estado ni, p. ej., el sl_order_id
+                    for campo in Posicion.__slots__:
+                        setattr(actual, campo, datos.get(campo))
+                    actual.version = id_cambio
+        return bool(cambios)
+
+    def _persistir(self, posicion, nueva=False):
+        if self.almacen is None:
+            return
+        try:
+            id_cambio = self.almacen.guardar(posicion.a_dict(), nueva=nueva)
+            if id_cambio:
+                posicion.version = id_cambio
+            if id_cambio and posicion.estado in ESTADOS_FINALES:
+                self._ultimo_final[posicion.symbol] = id_cambio
+            elif not id_cambio:
+                logger.warning("⚠️ Estado de %s reemplazado por otro proceso, escritura descartada.", posicion.symbol)
+        except Exception as e:
+            logger.error("❌ No se pudo persistir el estado de %s: %s", posicion.symbol, e)
+
+    def buscar_por_orden(self, order_id):
+        for posicion in self.activas():
+            if order_id == posicion.order_id or order_id in posicion.ordenes_salida():
+                return posicion
+        return None
@@ -0,0 +1,130 @@
+"""
+Configuración única de logging para todo el bot.
+
+Los módulos solo encolan el LogRecord (QueueHandler); un hilo propio (QueueListener) le da
+formato y lo escribe en stdout, así un log nunca bloquea el envío de una orden. El mensaje se
+formatea recién en ese hilo: conviene loguear con argumentos (`logger.info("✅ %s", orden_id)`)
+en lugar de f-strings, y dejar las respuestas completas de Binance/Telegram en DEBUG.
+
+Variables de entorno:
+    LOG_LEVEL: nivel mínimo (INFO por defecto).
+    LOG_FORMATO: "texto" (por defecto) o "json" (un objeto por línea).
+    LOG_COLA_MAX: registros pendientes antes de descartar (la cola nunca bloquea).
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from metricas import metricas
+
+FORMATO_TEXTO = '%(asctime)s - %(levelname)s - %(message)s'
+TAMANO_COLA = int(os.getenv("LOG_COLA_MAX", "10000"))
+
+# Campos estructurados que se agregan con `extra=` o con `contexto(...)`
+CAMPOS = ("senal_id", "symbol", "order_id", "etapa", "etapas_ms", "latencia_ms")
+
+_contexto = contextvars.ContextVar("contexto_log", default={})
+_lock = threading.Lock()
+_listener = None
+
+
+# === Contexto de la señal en curso ===
+
+@contextmanager
+def contexto(**campos):
+    """Agrega `campos` (p. ej. senal_id, symbol) a todos los logs del hilo mientras dure el bloque."""
+    token = _contexto.set({**_contexto.get(), **campos})
+    try:
+        yield
+    finally:
+        _contexto.reset(token)
+
+
+class _FiltroContexto(logging.Filter):
+    # Corre en el hilo que loguea, antes de encolar: ahí todavía está el contexto
+    def filter(self, record):
+        for campo, valor in _contexto.get().items():
+            if not hasattr(record, campo):
+                setattr(record, campo, valor)
+        return True
+
+
+# === Handler y formatos ===
+
+class _HandlerCola(logging.handlers.QueueHandler):
+    """Encola el registro sin formatearlo; si la cola está llena lo descarta en vez de esperar."""
+
+    def prepare(self, record):
+        # Mismo proceso: el registro viaja tal cual y el listener lo formatea en su hilo
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metricas.incrementar("logs_descartados_total")
+
+
+class FormatoJSON(logging.Formatter):
+    def format(self, record):
+        evento = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+            "hilo": record.threadName,
+        }
+        for campo in CAMPOS:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                evento[campo] = valor
+        if record.exc_info:
+            evento["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+def configurar(nivel=None, formato=None, salida=None):
+    """
+    Instala el pipeline en el logger raíz. Se puede llamar desde cada módulo: solo la primera
+    llamada tiene efecto.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        handler_salida = logging.StreamHandler(salida or sys.stdout)  # salida a consola, que Render captura
+        if (formato or os.getenv("LOG_FORMATO", "texto")) == "json":
+            handler_salida.setFormatter(FormatoJSON())
+        else:
+            handler_salida.setFormatter(logging.Formatter(FORMATO_TEXTO))
+
+        cola = queue.Queue(maxsize=TAMANO_COLA)
+        handler_cola = _HandlerCola(cola)
+        handler_cola.addFilter(_FiltroContexto())
+
+        raiz = logging.getLogger()
+        for handler in list(raiz.handlers):
+            raiz.removeHandler(handler)
+        raiz.addHandler(handler_cola)
+        raiz.setLevel(nivel or os.getenv("LOG_LEVEL", "INFO").upper())
+
+        _listener = logging.handlers.QueueListener(cola, handler_salida, respect_handler_level=True)
+        _listener.start()
+        atexit.register(detener)
+
+
+def detener():
+    """Escribe lo que quede en la cola y detiene el hilo del listener."""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
@@ -1,16 +1,13 @@
 from telegram_bot import enviar_telegram
+from libro_trades import libro_trades
 from datetime import datetime, timezone, timedelta
 from binance.um_futures import UMFutures
 import pytz
 import logging
-import sys
+import registro
 
 # === Funciones auxiliares ===
-logging.basicConfig(
-    level=logging.INFO,  # nivel mínimo de logs a mostrar (INFO y superiores)
-    format='%(asctime)s - %(levelname)s - %(message)s',  # formato con fecha, nivel y mensaje
-    handlers=[logging.StreamHandler(sys.stdout)]  # salida a consola, que Render captura
-)
+registro.configurar()
 
 logger = logging.getLogger()
 
@@ -20,39 +17,29 @@ def obtener_fecha_hora_arg():
     return datetime.now(zona_ar).strftime("%Y-%m-%d %H:%M:%S")
 
 # Obtener PnL por timestamp
-def obtener_pnl_por_timestamp(client: UMFutures, symbol: str, timestamp: int):
+def obtener_pnl_por_timestamp(client: UMFutures, symbol: str, timestamp: int, sincronizar=True, order_id_entrada=None):
+    # Con `order_id_entrada` se suman también los trades de la entrada (anteriores a `timestamp`)
     try:
-        fills = client.get_account_trades(symbol=symbol)  # ✅ CORRECTO PARA UMFutures
-        pnl_total = 0.0
-        comision_total = 0.0
-
-        for fill in fills:
-            if int(fill['time']) >= timestamp:
-                realized_pnl = float(fill.get('realizedPnl', 0))
-                commission = float(fill.get('commission', 0))
-                pnl_total += realized_pnl
-                comision_total += commission
-
-        return pnl_total, comision_total
+        if sincronizar:
+            libro_trades.sincronizar(client, symbol)
+        if order_id_entrada is not None:
+            return libro_trades.pnl_operacion(symbol, order_id_entrada, timestamp)
+        return libro_trades.pnl_desde(symbol, timestamp)
     except Exception as e:
-        logger.error(f"❌ Error al obtener PnL por timestamp: {e}")
+        logger.error("❌ Error al obtener PnL por timestamp: %s", e)
         return None, None
 
 
 # Verificar si el SL fue ejecutado por timestamp (cuando no se tiene order_id)
 
-def verificar_si_sl_fue_ejecutado(client: UMFutures, symbol: str, timestamp: int, side_entrada: str):
+def verificar_si_sl_fue_ejecutado(client: UMFutures, symbol: str, timestamp: int, side_entrada: str, sincronizar=True):
     try:
         opposite_side = "SELL" if side_entrada == "BUY" else "BUY"
-        fills = client.get_account_trades(symbol=symbol)  # <- FIXED
-
-        for fill in fills:
-            if int(fill['time']) >= timestamp and fill['side'] == opposite_side:
-                return True
-
-        return False
+        if sincronizar:
+            libro_trades.sincronizar(client, symbol)
+        return libro_trades.hay_fill_desde(symbol, timestamp, opposite_side)
     except Exception as e:
-        logger.error(f"❌ Error al verificar ejecución del SL: {e}")
+        logger.error("❌ Error al verificar ejecución del SL: %s", e)
         return False
 
 
@@ -63,25 +50,16 @@ def obtener_balance_usdt(client: UMFutures):
             if b['asset'] == 'USDT':
                 return float(b['balance'])
     except Exception as e:
-        logger.error(f"❌ Error al obtener balance: {e}")
+        logger.error("❌ Error al obtener balance: %s", e)
         return 0.0
 
-def obtener_pnl_por_order_id(client: UMFutures, symbol: str, order_id: int):
+def obtener_pnl_por_order_id(client: UMFutures, symbol: str, order_id: int, sincronizar=True):
     try:
-        trades = client.get_account_trades(symbol=symbol)  # ✅ Método correcto
-        pnl_total = 0.0
-        comision_total = 0.0
-
-        for trade in trades:
-            if int(trade['orderId']) == order_id:
-                realized_pnl = float(trade.get('realizedPnl', 0))
-                commission = float(trade.get('commission', 0))
-                pnl_total += realized_pnl
-                comision_total += commission
-
-        return pnl_total, comision_total
+        if sincronizar:
+            libro_trades.sincronizar(client, symbol)
+        return libro_trades.pnl_por_order_id(symbol, order_id)
     except Exception as e:
-        logger.error(f"❌ Error al obtener PnL por order_id: {e}")
+        logger.error("❌ Error al obtener PnL por order_id: %s", e)
         return None, None
 
 
@@ -90,47 +68,55 @@ def obtener_pnl_por_order_id(client: UMFutures, symbol: str, order_id: int):
 
 def verificar_salida_programada(client, estado_orden, scheduler=None, job_id=None):
     """
-    Verifica si se ejecutó el TP (por order_id) o el SL (por timestamp).
+    Verifica en el libro local de trades (una sola descarga incremental) si la posición ya
+    salió: por TP cuando los fills de las patas de TP cubren toda la cantidad, o por SL cuando
+    hay un fill de cierre de cualquier otra orden. El PnL y las comisiones se suman sobre todas
+    las patas de la salida.
     Si se detecta salida, envía mensaje con PnL, comisiones y balance, y opcionalmente cancela el job del scheduler.
+    Devuelve un dict con tipo ("TP" / "SL" / "TP+SL"), pnl, comision y balance si se detectó y reportó la salida;
+    None si todavía no hubo salida (puede haber TPs parciales de una escalera).
 
     Args:
         client: Cliente Binance.
-        estado_orden: dict con claves necesarias: timestamp_inicio, side, tp_order_id, symbol.
+        estado_orden: dict con claves necesarias: timestamp_inicio, side, qty, symbol y tp_order_id
+            o patas_tp ([{"order_id", "qty", ...}]).
         scheduler: (opcional) instancia de BackgroundScheduler.
         job_id: (opcional) id del job para eliminarlo tras completarse.
     """
     symbol = estado_orden["symbol"]
-    tp_order_id = estado_orden["tp_order_id"]
     timestamp_inicio = estado_orden["timestamp_inicio"]
     side_entrada = estado_orden["side"]
+    opposite_side = "SELL" if side_entrada == "BUY" else "BUY"
+    patas = estado_orden.get("patas_tp") or []
+    ids_tp = {p["order_id"] for p in patas} or {estado_orden.get("tp_order_id")}
 
-    # 1. Verificamos si se ejecutó el TP (por order_id)
+    # 1. Fills de cierre desde la entrada, por orden (TP, patas de la escalera o SL)
     try:
-        tp_info = client.query_order(symbol=symbol, orderId=tp_order_id)  # ✅ CORRECTO PARA UMFutures
-        tp_status = tp_info.get("status")
-
-        if tp_status == "FILLED":
-            pnl, comision = obtener_pnl_por_order_id(client, symbol, tp_order_id)
-            tipo = "TP"
-        else:
-            # 2. Si no se ejecutó el TP, verificamos el SL (por timestamp)
-            sl_ok = verificar_si_sl_fue_ejecutado(client, symbol, timestamp_inicio, side_entrada)
-            if sl_ok:
-                pnl, comision = obtener_pnl_por_timestamp(client, symbol, timestamp_inicio)
-                tipo = "SL"
-            else:
-                # Ninguna salida detectada aún
-                return
+        libro_trades.sincronizar(client, symbol)
+        ejecutadas = libro_trades.fills_por_orden(symbol, timestamp_inicio, opposite_side)
     except Exception as e:
-        logger.error(f"❌ Error al consultar TP/SL: {e}")
+        logger.error("❌ Error al consultar TP/SL: %s", e)
+        return
+
+    qty_tp = sum(cantidad for order_id, cantidad in ejecutadas.items() if order_id in ids_tp)
+    if any(order_id not in ids_tp for order_id in ejecutadas):
+        # 2. Cerró el SL (todo o lo que quedaba después de los TP parciales)
+        tipo = "TP+SL" if qty_tp else "SL"
+    elif qty_tp and qty_tp >= float(estado_orden["qty"]) - 1e-9:
+        tipo = "TP"
+    else:
+        # Ninguna salida completa aún
+        return
+    pnl, comision = obtener_pnl_por_timestamp(client, symbol, timestamp_inicio, sincronizar=False,
+                                              order_id_entrada=estado_orden.get("order_id"))
+    if pnl is None:
         return
 
-   
     # 3. Si se ejecutó alguna salida, preparamos el mensaje
     balance = obtener_balance_usdt(client)
     fecha = obtener_fecha_hora_arg()
     icono = "🟢" if pnl > 0 else "🔴"
-    tipo_texto = "Take Profit" if tipo == "TP" else "Stop Loss"
+    tipo_texto = {"TP": "Take Profit", "SL": "Stop Loss"}.get(tipo, "Salida escalonada (TP + SL)")
 
     mensaje = (
         f"{icono} *{tipo_texto} ejecutado*\n"
@@ -155,6 +141,8 @@ def verificar_salida_programada(client, estado_orden, scheduler=None, job_id=Non
     if scheduler and job_id:
         try:
             scheduler.remove_job(job_id)
-            logger.info(f"🛑 Scheduler '{job_id}' detenido tras detectar salida.")
+            logger.info("🛑 Scheduler '%s' detenido tras detectar salida.", job_id)
         except Exception as e:
-            logger.info(f"⚠️ No se pudo detener el scheduler '{job_id}': {e}")
+            logger.info("⚠️ No se pudo detener el scheduler '%s': %s", job_id, e)
+
+    return {"tipo": tipo, "pnl": pnl, "comision": comision, "balance": balance}
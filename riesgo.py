@@ -0,0 +1,284 @@
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from diario import ZONA_AR
+
+logger = logging.getLogger()
+
+
+def _entorno(nombre, defecto):
+    valor = os.getenv(nombre, "")
+    return float(valor) if valor else defecto
+
+
+def _grupos(texto):
+    """"BTCUSDT,ETHUSDT;SOLUSDT,AVAXUSDT" -> {symbol: nombre del grupo}."""
+    grupos = {}
+    for grupo in filter(None, (g.strip() for g in texto.split(";"))):
+        for symbol in filter(None, (s.strip().upper() for s in grupo.split(","))):
+            grupos[symbol] = grupo
+    return grupos
+
+
+class LimitesRiesgo:
+    """
+    Límites de la cartera, en % del balance salvo indicación. Un límite en 0 queda desactivado.
+
+    Args:
+        riesgo_abierto_pct: suma de lo que se pierde si todas las posiciones (y entradas
+            pendientes) tocan su SL.
+        riesgo_grupo_pct: lo mismo, por grupo de símbolos correlacionados.
+        nocional_max_x: nocional total como múltiplo del balance.
+        perdida_diaria_pct: PnL realizado del día (hora de Argentina) a partir del cual no
+            se abren más posiciones.
+        posiciones_max: posiciones abiertas o pendientes simultáneas.
+        apalancamiento_max: tope de apalancamiento por posición.
+        escala_minima: fracción mínima del tamaño pedido; si hay que achicar más, se rechaza.
+        grupos: {symbol: grupo} de símbolos correlacionados.
+    """
+
+    def __init__(self, riesgo_abierto_pct=6.0, riesgo_grupo_pct=0.0, nocional_max_x=10.0, perdida_diaria_pct=5.0,
+                 posiciones_max=5, apalancamiento_max=125, escala_minima=0.25, grupos=None):
+        self.riesgo_abierto_pct = riesgo_abierto_pct
+        self.riesgo_grupo_pct = riesgo_grupo_pct
+        self.nocional_max_x = nocional_max_x
+        self.perdida_diaria_pct = perdida_diaria_pct
+        self.posiciones_max = int(posiciones_max)
+        self.apalancamiento_max = int(apalancamiento_max)
+        self.escala_minima = escala_minima
+        self.grupos = grupos or {}
+
+    @classmethod
+    def desde_entorno(cls):
+        return cls(
+            riesgo_abierto_pct=_entorno("RIESGO_ABIERTO_MAX_PCT", 6.0),
+            riesgo_grupo_pct=_entorno("RIESGO_GRUPO_MAX_PCT", 0.0),
+            nocional_max_x=_entorno("RIESGO_NOCIONAL_MAX_X", 10.0),
+            perdida_diaria_pct=_entorno("RIESGO_PERDIDA_DIARIA_PCT", 5.0),
+            posiciones_max=_entorno("RIESGO_POSICIONES_MAX", 5),
+            apalancamiento_max=_entorno("RIESGO_APALANCAMIENTO_MAX", 125),
+            escala_minima=_entorno("RIESGO_ESCALA_MINIMA", 0.25),
+            grupos=_grupos(os.getenv("RIESGO_GRUPOS", "")),
+        )
+
+
+# qty aprobada (0 si se rechaza), factor aplicado al tamaño pedido, motivo del rechazo o del recorte
+Decision = namedtuple("Decision", "qty escala motivo")
+
+
+def _dia(ts_ms):
+    """(fecha en hora de Argentina, ms epoch en que empieza el día siguiente)."""
+    fecha = datetime.fromtimestamp(ts_ms / 1000, ZONA_AR)
+    siguiente = ZONA_AR.localize(datetime.combine(fecha.date() + timedelta(days=1), datetime.min.time()))
+    return fecha.strftime("%Y-%m-%d"), int(siguiente.timestamp() * 1000)
+
+
+# === Motor de riesgo de la cartera ===
+
+class MotorRiesgo:
+    """
+    Contadores en memoria del riesgo abierto (total y por grupo), el nocional y el PnL
+    realizado del día. Cada señal se evalúa contra `LimitesRiesgo` con unas pocas sumas, antes
+    de cualquier llamada a Binance, y se rechaza o se achica.
+
+    Una señal aprobada queda reservada hasta que su posición aparece en el gestor (`confirmar`)
+    o se descarta (`liberar`): así una ráfaga de señales no puede pasar toda junta el mismo
+    margen. `reconstruir` recalcula los contadores desde las posiciones activas cuando el
+    gestor informa cambios (cierres, cancelaciones, entradas de otros workers).
+
+    Las reservas viven en memoria, así que la garantía es por worker: las posiciones de los
+    otros workers se cuentan desde que quedan en el almacén compartido (cada señal sincroniza
+    antes de evaluarse), pero dos señales simultáneas en workers distintos pueden aprobarse
+    contra el mismo margen. Con límites estrictos conviene un solo worker.
+    """
+
+    def __init__(self, limites=None):
+        self.limites = limites or LimitesRiesgo.desde_entorno()
+        self._lock = threading.Lock()
+        self._abiertas = {}         # symbol -> (riesgo, nocional)
+        self._reservas = {}         # symbol -> (riesgo, nocional)
+        self._reemplazadas = {}     # symbol -> (riesgo, nocional) de la posición que reemplaza la reserva
+        self._riesgo = 0.0
+        self._nocional = 0.0
+        self._riesgo_grupo = {}     # grupo -> riesgo
+        self._dia, self._fin_dia_ms = _dia(int(time.time() * 1000))
+        self._pnl_dia = 0.0
+        self._balance_dia = None    # balance de referencia del límite de pérdida diaria
+
+    # === Evaluación de señales ===
+
+    def verificar(self, symbol):
+        """
+        Chequeo previo, sin balance ni tamaño: el corte por pérdida diaria y la cantidad de
+        posiciones. Devuelve el motivo del rechazo o None.
+        """
+        with self._lock:
+            self._rotar_dia()
+            return self._bloqueo(symbol)
+
+    def reservar(self, symbol, qty, entry, sl_distance, balance, ahora_ms=None) -> Decision:
+        """
+        Aprueba `qty` tal cual, la achica hasta el margen que dejan los límites o la rechaza
+        (qty=0). Si la aprueba, queda reservada a nombre de `symbol`.
+        """
+        l = self.limites
+        with self._lock:
+            self._rotar_dia(ahora_ms)
+            if self._balance_dia is None:
+                self._balance_dia = balance
+            motivo = self._bloqueo(symbol)
+            if motivo:
+                return Decision(0.0, 0.0, motivo)
+
+            # Una entrada pendiente en el mismo símbolo se cancela y la reemplaza esta
+            previa = self._abiertas.pop(symbol, None)
+            if previa is not None:
+                self._sumar(symbol, -previa[0], -previa[1])
+
+            # Cantidad máxima que admite cada límite
+            topes = []
+            if l.riesgo_abierto_pct:
+                topes.append(((balance * l.riesgo_abierto_pct / 100 - self._riesgo) / sl_distance, "riesgo_abierto"))
+            grupo = l.grupos.get(symbol)
+            if grupo and l.riesgo_grupo_pct:
+                disponible = balance * l.riesgo_grupo_pct / 100 - self._riesgo_grupo.get(grupo, 0.0)
+                topes.append((disponible / sl_distance, f"riesgo_grupo:{grupo}"))
+            if l.nocional_max_x:
+                topes.append(((balance * l.nocional_max_x - self._nocional) / entry, "nocional"))
+            if l.apalancamiento_max:
+                topes.append((balance * l.apalancamiento_max / entry, "apalancamiento"))
+
+            aprobada, motivo = qty, None
+            for tope, nombre in topes:
+                if tope < aprobada:
+                    aprobada, motivo = max(tope, 0.0), nombre
+            escala = aprobada / qty if qty else 0.0
+            if escala < l.escala_minima:
+                if previa is not None:
+                    self._abiertas[symbol] = previa
+                    self._sumar(symbol, *previa)
+                return Decision(0.0, 0.0, motivo)
+
+            self._sumar(symbol, aprobada * sl_distance, aprobada * entry)
+            self._reservas[symbol] = (aprobada * sl_distance, aprobada * entry)
+            if previa is not None:
+                self._reemplazadas[symbol] = previa
+            return Decision(aprobada, escala, motivo)
+
+    def ajustar(self, symbol, qty, entry, sl_distance):
+        """Corrige la reserva a la cantidad final (ya redondeada al stepSize)."""
+        with self._lock:
+            anterior = self._reservas.get(symbol)
+            if anterior is None:
+                return
+            self._sumar(symbol, -anterior[0], -anterior[1])
+            self._reservas[symbol] = (qty * sl_distance, qty * entry)
+            self._sumar(symbol, qty * sl_distance, qty * entry)
+
+    def confirmar(self, symbol):
+        """La entrada quedó registrada en el gestor: la reserva pasa a ser una posición abierta."""
+        with self._lock:
+            self._reemplazadas.pop(symbol, None)
+            reserva = self._reservas.pop(symbol, None)
+            if reserva is not None:
+                self._abiertas[symbol] = reserva
+
+    def liberar(self, symbol):
+        """
+        Descarta la reserva de una señal que no llegó a abrir la entrada; la posición del
+        símbolo que iba a reemplazar vuelve a contarse.
+        """
+        with self._lock:
+            reserva = self._reservas.pop(symbol, None)
+            if reserva is not None:
+                self._sumar(symbol, -reserva[0], -reserva[1])
+            previa = self._reemplazadas.pop(symbol, None)
+            if previa is not None:
+                self._abiertas[symbol] = previa
+                self._sumar(symbol, *previa)
+
+    # === Estado de la cartera ===
+
+    def registrar_pnl(self, pnl, ts_ms=None):
+        """PnL realizado (neto) de una salida."""
+        with self._lock:
+            self._rotar_dia(ts_ms)
+            self._pnl_dia += pnl
+
+    def reconstruir(self, posiciones, precio=None, pnl_dia=None):
+        """
+        Recalcula los contadores desde las posiciones activas del gestor, conservando las
+        reservas en curso.
+
+        Args:
+            precio: callable(symbol) con el precio para el nocional de las entradas pendientes.
+            pnl_dia: PnL realizado del día según el diario (compartido por los workers).
+        """
+        with self._lock:
+            anteriores, self._abiertas = self._abiertas, {}
+            for p in posiciones:
+                if p.symbol in self._reservas:
+                    continue
+                referencia = p.precio_entrada or (precio(p.symbol) if precio else None)
+                # Lo que sigue abierto después de los TP parciales de la escalera
+                qty = float(p.qty_abierta())
+                if referencia:
+                    nocional = qty * referencia
+                else:
+                    nocional = anteriores.get(p.symbol, (0.0, 0.0))[1]
+                # Con el SL ya movido (break-even / trailing) el riesgo es lo que queda hasta ese SL
+                distancia = float(p.sl_distance or 0)
+                if p.sl_precio and p.precio_entrada:
+                    direccion = 1 if p.side == "BUY" else -1
+                    distancia = max((p.precio_entrada - p.sl_precio) * direccion, 0.0)
+                self._abiertas[p.symbol] = (qty * distancia, nocional)
+
+            self._riesgo, self._nocional, self._riesgo_grupo = 0.0, 0.0, {}
+            for symbol, (riesgo, nocional) in (*self._abiertas.items(), *self._reservas.items()):
+                self._sumar(symbol, riesgo, nocional)
+
+            self._rotar_dia()
+            if pnl_dia is not None:
+                self._pnl_dia = pnl_dia
+
+    def estado(self):
+        with self._lock:
+            return {
+                "dia": self._dia,
+                "posiciones": len(self._abiertas) + len(self._reservas),
+                "reservas": len(self._reservas),
+                "riesgo_abierto": round(self._riesgo, 4),
+                "riesgo_por_grupo": {g: round(r, 4) for g, r in self._riesgo_grupo.items()},
+                "nocional": round(self._nocional, 2),
+                "pnl_dia": round(self._pnl_dia, 4),
+                "balance_dia": self._balance_dia,
+            }
+
+    # === Internos (con el lock tomado) ===
+
+    def _bloqueo(self, symbol):
+        l = self.limites
+        if l.perdida_diaria_pct and self._balance_dia and self._pnl_dia <= -self._balance_dia * l.perdida_diaria_pct / 100:
+            return "perdida_diaria"
+        if symbol in self._reservas:
+            return "senal_en_curso"
+        if l.posiciones_max and symbol not in self._abiertas and len(self._abiertas) + len(self._reservas) >= l.posiciones_max:
+            return "posiciones_max"
+        return None
+
+    def _sumar(self, symbol, riesgo, nocional):
+        self._riesgo += riesgo
+        self._nocional += nocional
+        grupo = self.limites.grupos.get(symbol)
+        if grupo:
+            self._riesgo_grupo[grupo] = self._riesgo_grupo.get(grupo, 0.0) + riesgo
+
+    def _rotar_dia(self, ahora_ms=None):
+        # Una comparación por señal; la fecha se recalcula solo al cruzar la medianoche
+        ahora_ms = ahora_ms or int(time.time() * 1000)
+        if ahora_ms >= self._fin_dia_ms:
+            self._dia, self._fin_dia_ms = _dia(ahora_ms)
+            self._pnl_dia, self._balance_dia = 0.0, None
@@ -0,0 +1,616 @@
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+import requests
+from binance.error import ClientError
+from cliente_binance import PESOS, PESO_OPEN_ORDERS_TODOS
+
+logger = logging.getLogger()
+
+# symbol -> (precio inicial, tickSize, stepSize)
+SIMBOLOS_DEFECTO = {
+    "BTCUSDT": (65000.0, "0.10", "0.001"),
+    "ETHUSDT": (3200.0, "0.01", "0.001"),
+    "SOLUSDT": (150.0, "0.0100", "1"),
+}
+
+COMISION_TAKER = 0.0004
+COMISION_MAKER = 0.0002
+MAX_ORDENES_BATCH = 5
+NOTIONAL_MINIMO = "5"
+
+
+def generar_simbolos(cantidad, precio=100.0):
+    """Símbolos sintéticos (SIM0USDT, SIM1USDT...) para ráfagas con muchas posiciones a la vez."""
+    return {f"SIM{i}USDT": (precio, "0.01", "0.1") for i in range(cantidad)}
+
+
+def _ms():
+    return int(time.time() * 1000)
+
+
+def _error(codigo, mensaje, status=400, header=None):
+    return ClientError(status, codigo, mensaje, header or {})
+
+
+# === Exchange de futuros USDT-M simulado en memoria ===
+
+class ExchangeSimulado:
+    """
+    Reemplazo en proceso de UMFutures con los métodos que usa el bot. Mantiene órdenes,
+    posiciones (modo one-way), trades y balance; las órdenes STOP / STOP_MARKET / LIMIT
+    se disparan al mover el precio con `mover_precio`. Los eventos del user-data stream
+    se entregan a los callbacks registrados con `suscribir`.
+
+    Args:
+        simbolos: dict symbol -> (precio, tickSize, stepSize).
+        balance: USDT iniciales de la cuenta.
+        latencia_ms: (mínimo, máximo) de ida y vuelta de cada llamada REST.
+        latencia_stream_ms: demora con la que llegan los eventos del stream.
+        tasa_error: probabilidad de que una llamada falle con un error transitorio (-1001).
+        semilla: semilla del generador aleatorio (latencias y errores reproducibles).
+        limite_peso: peso REST por minuto; al superarlo las llamadas responden 429 (-1003).
+    """
+
+    def __init__(self, simbolos=None, balance=10000.0, latencia_ms=(0, 0), latencia_stream_ms=0,
+                 tasa_error=0.0, semilla=None, limite_peso=2400):
+        self.simbolos = dict(simbolos or SIMBOLOS_DEFECTO)
+        self.precios = {s: float(p) for s, (p, _, _) in self.simbolos.items()}
+        self.billetera = float(balance)
+        self.latencia_ms = latencia_ms
+        self.latencia_stream_ms = latencia_stream_ms
+        self.tasa_error = tasa_error
+        self.limite_peso = limite_peso
+        self.session = requests.Session()
+        self.llamadas = deque(maxlen=10000)
+
+        self._azar = random.Random(semilla)
+        self._lock = threading.RLock()
+        self._ids_orden = itertools.count(1000)
+        self._ids_trade = itertools.count(1)
+        self._ordenes = {}              # orderId -> dict
+        self._posiciones = {}           # symbol -> [positionAmt, entryPrice]
+        self._apalancamiento = {s: 20 for s in self.simbolos}
+        self._trades = {}               # symbol -> [trade]
+        self._errores = {}              # método -> deque[(codigo, mensaje)]
+        self._respuestas_perdidas = {}  # método -> deque[(codigo, mensaje)] que se lanzan después de procesar
+        self._minuto = 0
+        self._peso = 0
+        self._suscriptores = []
+        self._suscriptores_mercado = []
+        self._eventos = deque()
+        self._hay_eventos = threading.Condition()
+        self._hilo_eventos = None
+
+    @classmethod
+    def desde_entorno(cls):
+        """
+        Configuración por variables de entorno: SIM_SIMBOLOS (cantidad de símbolos sintéticos,
+        0 = los de SIMBOLOS_DEFECTO), SIM_BALANCE, SIM_LATENCIA_MS ("min,max"),
+        SIM_LATENCIA_STREAM_MS, SIM_TASA_ERROR y SIM_SEMILLA.
+        """
+        cantidad = int(os.getenv("SIM_SIMBOLOS", "0"))
+        latencia = [float(x) for x in os.getenv("SIM_LATENCIA_MS", "0,0").split(",")]
+        semilla = os.getenv("SIM_SEMILLA")
+        return cls(
+            simbolos=generar_simbolos(cantidad) if cantidad else None,
+            balance=float(os.getenv("SIM_BALANCE", "10000")),
+            latencia_ms=(latencia[0], latencia[-1]),
+            latencia_stream_ms=float(os.getenv("SIM_LATENCIA_STREAM_MS", "0")),
+            tasa_error=float(os.getenv("SIM_TASA_ERROR", "0")),
+            semilla=int(semilla) if semilla else None,
+        )
+
+    # === Control de la simulación ===
+
+    def mover_precio(self, symbol, precio):
+        """Actualiza el precio de `symbol` y ejecuta las órdenes que se disparan."""
+        with self._lock:
+            self.precios[symbol] = float(precio)
+            for orden in [o for o in self._ordenes.values() if o["symbol"] == symbol and o["status"] == "NEW"]:
+                self._evaluar(orden)
+            libro = self._libro(symbol)
+
+        ahora = _ms()
+        self._emitir({"e": "markPriceUpdate", "E": ahora, "s": symbol, "p": f"{float(precio)}"}, self._suscriptores_mercado)
+        self._emitir({"e": "bookTicker", "E": ahora, "T": ahora, "s": symbol, "b": libro["bidPrice"],
+                      "B": libro["bidQty"], "a": libro["askPrice"], "A": libro["askQty"]}, self._suscriptores_mercado)
+
+    def inyectar_error(self, metodo, codigo=-1001, mensaje="Internal error; unable to process your request.", veces=1):
+        """
+        Las próximas `veces` llamadas a `metodo` fallan con el ClientError indicado. Con
+        "new_batch_order[i]" se rechaza solo la orden i de los próximos batches (el resto pasa).
+        """
+        with self._lock:
+            cola = self._errores.setdefault(metodo, deque())
+            cola.extend([(codigo, mensaje)] * veces)
+
+    def perder_respuesta(self, metodo, codigo=-1007, mensaje="Timeout waiting for response from backend server. "
+                         "Send status unknown; execution status unknown.", veces=1):
+        """
+        Las próximas `veces` llamadas a `metodo` sí se procesan, pero el cliente recibe el error
+        en lugar de la respuesta (timeout: Binance ejecutó la orden y el bot no se enteró).
+        """
+        with self._lock:
+            cola = self._respuestas_perdidas.setdefault(metodo, deque())
+            cola.extend([(codigo, mensaje)] * veces)
+
+    def suscribir(self, callback):
+        """Registra un callback que recibe cada evento del user-data stream (JSON, igual que el websocket)."""
+        self._suscriptores.append(callback)
+        self._asegurar_hilo_eventos()
+
+    def suscribir_mercado(self, callback):
+        """Registra un callback que recibe markPriceUpdate y bookTicker cada vez que se mueve un precio."""
+        self._suscriptores_mercado.append(callback)
+        self._asegurar_hilo_eventos()
+
+    def _asegurar_hilo_eventos(self):
+        if self._hilo_eventos is None:
+            self._hilo_eventos = threading.Thread(target=self._entregar_eventos, name="simulador_stream", daemon=True)
+            self._hilo_eventos.start()
+
+    def orden(self, order_id):
+        with self._lock:
+            return dict(self._ordenes[int(order_id)])
+
+    def ordenes(self, symbol=None, status=None):
+        with self._lock:
+            return [dict(o) for o in self._ordenes.values()
+                    if (symbol is None or o["symbol"] == symbol) and (status is None or o["status"] == status)]
+
+    # === Mercado y configuración ===
+
+    def exchange_info(self):
+        self._llamada("exchange_info")
+        return {"symbols": [
+            {
+                "symbol": symbol,
+                "status": "TRADING",
+                "filters": [
+                    {"filterType": "PRICE_FILTER", "tickSize": tick, "minPrice": tick, "maxPrice": "10000000"},
+                    {"filterType": "LOT_SIZE", "stepSize": step, "minQty": step, "maxQty": "1000000"},
+                    {"filterType": "MARKET_LOT_SIZE", "stepSize": step, "minQty": step, "maxQty": "1000000"},
+                    {"filterType": "MIN_NOTIONAL", "notional": NOTIONAL_MINIMO},
+                ],
+            }
+            for symbol, (_, tick, step) in self.simbolos.items()
+        ]}
+
+    def leverage_brackets(self, symbol=None, **kwargs):
+        self._llamada("leverage_brackets")
+        brackets = [
+            {"bracket": 1, "initialLeverage": 125, "notionalCap": 50000, "notionalFloor": 0, "maintMarginRatio": 0.004, "cum": 0.0},
+            {"bracket": 2, "initialLeverage": 50, "notionalCap": 1000000, "notionalFloor": 50000, "maintMarginRatio": 0.01, "cum": 300.0},
+            {"bracket": 3, "initialLeverage": 10, "notionalCap": 100000000, "notionalFloor": 1000000, "maintMarginRatio": 0.05, "cum": 40300.0},
+        ]
+        return [{"symbol": s, "brackets": brackets} for s in self.simbolos if symbol in (None, s)]
+
+    def mark_price(self, symbol=None, **kwargs):
+        self._llamada("mark_price")
+        with self._lock:
+            if symbol:
+                return {"symbol": symbol, "markPrice": str(self.precios[symbol]), "time": _ms()}
+            return [{"symbol": s, "markPrice": str(p), "time": _ms()} for s, p in self.precios.items()]
+
+    def book_ticker(self, symbol=None, **kwargs):
+        self._llamada("book_ticker")
+        with self._lock:
+            libros = [self._libro(s) for s in self.precios if symbol in (None, s)]
+        return libros[0] if symbol else libros
+
+    def change_leverage(self, symbol, leverage, **kwargs):
+        self._llamada("change_leverage")
+        with self._lock:
+            self._apalancamiento[symbol] = int(leverage)
+        self._emitir({"e": "ACCOUNT_CONFIG_UPDATE", "E": _ms(), "ac": {"s": symbol, "l": int(leverage)}})
+        return {"symbol": symbol, "leverage": int(leverage), "maxNotionalValue": "50000"}
+
+    # === Cuenta ===
+
+    def balance(self, **kwargs):
+        self._llamada("balance")
+        with self._lock:
+            return [{
+                "asset": "USDT",
+                "balance": f"{self.billetera:.8f}",
+                "crossWalletBalance": f"{self.billetera:.8f}",
+                "availableBalance": f"{self._disponible():.8f}",
+                "updateTime": _ms(),
+            }]
+
+    def get_position_risk(self, symbol=None, **kwargs):
+        self._llamada("get_position_risk")
+        with self._lock:
+            return [self._posicion_risk(s) for s in self.simbolos if symbol in (None, s)]
+
+    def get_account_trades(self, symbol, fromId=None, startTime=None, endTime=None, limit=500, **kwargs):
+        self._llamada("get_account_trades")
+        with self._lock:
+            trades = self._trades.get(symbol, [])
+            if fromId is not None:
+                trades = [t for t in trades if t["id"] >= int(fromId)]
+            if startTime is not None:
+                trades = [t for t in trades if t["time"] >= int(startTime)]
+            if endTime is not None:
+                trades = [t for t in trades if t["time"] <= int(endTime)]
+            return [dict(t) for t in trades[:int(limit)]]
+
+    def new_listen_key(self):
+        self._llamada("new_listen_key")
+        return {"listenKey": "simulado"}
+
+    def renew_listen_key(self, listenKey):
+        self._llamada("renew_listen_key")
+        return {}
+
+    def close_listen_key(self, listenKey):
+        self._llamada("close_listen_key")
+        return {}
+
+    # === Órdenes ===
+
+    def new_order(self, **params):
+        self._llamada("new_order")
+        with self._lock:
+            orden = self._crear_orden(params)
+            perdidas = self._respuestas_perdidas.get("new_order")
+            perdida = perdidas.popleft() if perdidas else None
+        if perdida:
+            raise _error(*perdida)
+        return orden
+
+    def new_batch_order(self, batchOrders):
+        self._llamada("new_batch_order")
+        if len(batchOrders) > MAX_ORDENES_BATCH:
+            raise _error(-1130, "Data sent for parameter 'batchOrders' is not valid.")
+
+        resultados = []
+        with self._lock:
+            for i, params in enumerate(batchOrders):
+                pendientes = self._errores.get(f"new_batch_order[{i}]")
+                if pendientes:
+                    codigo, mensaje = pendientes.popleft()
+                    resultados.append({"code": codigo, "msg": mensaje})
+                    continue
+                try:
+                    resultados.append(self._crear_orden(params))
+                except ClientError as e:
+                    resultados.append({"code": e.error_code, "msg": e.error_message})
+        return resultados
+
+    def query_order(self, symbol, orderId=None, origClientOrderId=None, **kwargs):
+        self._llamada("query_order")
+        with self._lock:
+            return dict(self._buscar_orden(symbol, orderId, origClientOrderId))
+
+    def cancel_order(self, symbol, orderId=None, origClientOrderId=None, **kwargs):
+        self._llamada("cancel_order")
+        with self._lock:
+            orden = self._buscar_orden(symbol, orderId, origClientOrderId)
+            if orden["status"] != "NEW":
+                raise _error(-2011, "Unknown order sent.")
+            self._finalizar(orden, "CANCELED")
+            return dict(orden)
+
+    def cancel_open_orders(self, symbol, **kwargs):
+        self._llamada("cancel_open_orders")
+        with self._lock:
+            for orden in [o for o in self._ordenes.values() if o["symbol"] == symbol and o["status"] == "NEW"]:
+                self._finalizar(orden, "CANCELED")
+        return {"code": 200, "msg": "The operation of cancel all open order is done."}
+
+    def get_open_orders(self, symbol=None, **kwargs):
+        self._llamada("get_open_orders", PESO_OPEN_ORDERS_TODOS if symbol is None else None)
+        with self._lock:
+            return [dict(o) for o in self._ordenes.values()
+                    if o["status"] == "NEW" and symbol in (None, o["symbol"])]
+
+    # === Internos: red ===
+
+    def _llamada(self, metodo, peso=None):
+        """Simula la latencia de ida y vuelta, el peso usado por minuto y los errores de la API."""
+        self.llamadas.append((metodo, time.monotonic()))
+        minimo, maximo = self.latencia_ms
+        if maximo:
+            time.sleep(self._azar.uniform(minimo, maximo) / 1000)
+
+        with self._lock:
+            minuto = int(time.time() // 60)
+            if minuto != self._minuto:
+                self._minuto, self._peso = minuto, 0
+            self._peso += PESOS.get(metodo, 1) if peso is None else peso
+            usado = self._peso
+            pendientes = self._errores.get(metodo)
+            inyectado = pendientes.popleft() if pendientes else None
+
+        if usado > self.limite_peso:
+            inyectado = (-1003, "Too many requests; current limit is exceeded.")
+        if inyectado:
+            codigo, mensaje = inyectado
+            if codigo == -1003:
+                raise _error(codigo, mensaje, status=429, header={"Retry-After": str(60 - int(time.time()) % 60)})
+            raise _error(codigo, mensaje)
+        if self.tasa_error and self._azar.random() < self.tasa_error:
+            raise _error(-1001, "Internal error; unable to process your request.")
+
+        # Los hooks de la sesión reciben los mismos headers que devolvería Binance
+        respuesta = SimpleNamespace(headers={"X-MBX-USED-WEIGHT-1M": str(usado)})
+        for hook in self.session.hooks.get("response", []):
+            hook(respuesta)
+
+    def _emitir(self, evento, suscriptores=None):
+        suscriptores = self._suscriptores if suscriptores is None else suscriptores
+        if not suscriptores:
+            return
+        with self._hay_eventos:
+            self._eventos.append((time.monotonic() + self.latencia_stream_ms / 1000, evento, suscriptores))
+            self._hay_eventos.notify()
+
+    def _entregar_eventos(self):
+        while True:
+            with self._hay_eventos:
+                while not self._eventos:
+                    self._hay_eventos.wait()
+                entrega, evento, suscriptores = self._eventos.popleft()
+
+            espera = entrega - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+
+            mensaje = json.dumps(evento)
+            for callback in list(suscriptores):
+                try:
+                    callback(mensaje)
+                except Exception as e:
+                    logger.error("❌ Error entregando evento simulado: %s", e)
+
+    # === Internos: motor de órdenes (se llaman con el lock tomado) ===
+
+    def _crear_orden(self, params):
+        symbol = params["symbol"]
+        if symbol not in self.simbolos:
+            raise _error(-1121, "Invalid symbol.")
+        cliente = params.get("newClientOrderId")
+        if cliente and any(o["clientOrderId"] == cliente and o["status"] == "NEW" for o in self._ordenes.values()):
+            raise _error(-4116, "ClientOrderId is duplicated.")
+
+        tipo = params["type"]
+        side = params["side"]
+        cerrar = str(params.get("closePosition", "false")).lower() == "true"
+        reduce_only = str(params.get("reduceOnly", "false")).lower() == "true"
+        cantidad = float(params.get("quantity", 0))
+        precio = float(params.get("price", 0))
+        stop = float(params.get("stopPrice", 0))
+        actual = self.precios[symbol]
+        posicion = self._posiciones.get(symbol, [0.0, 0.0])[0]
+
+        if tipo in ("STOP", "STOP_MARKET") and self._disparada(side, stop, actual):
+            raise _error(-2021, "Order would immediately trigger.")
+        if (reduce_only or cerrar) and not self._reduce(side, posicion):
+            raise _error(-2022, "ReduceOnly Order is rejected.")
+        if not cerrar and cantidad <= 0:
+            raise _error(-1102, "Mandatory parameter 'quantity' was not sent, was empty/null, or malformed.")
+
+        order_id = next(self._ids_orden)
+        orden = {
+            "orderId": order_id,
+            "symbol": symbol,
+            "status": "NEW",
+            "clientOrderId": params.get("newClientOrderId") or f"sim_{order_id}",
+            "price": f"{precio}",
+            "avgPrice": "0",
+            "origQty": f"{cantidad}",
+            "executedQty": "0",
+            "cumQuote": "0",
+            "timeInForce": params.get("timeInForce", "GTC"),
+            "type": tipo,
+            "origType": tipo,
+            "reduceOnly": reduce_only,
+            "closePosition": cerrar,
+            "side": side,
+            "positionSide": "BOTH",
+            "stopPrice": f"{stop}",
+            "goodTillDate": int(params.get("goodTillDate", 0)),
+            "time": _ms(),
+            "updateTime": _ms(),
+        }
+        self._ordenes[order_id] = orden
+        self._emitir_orden(orden, "NEW")
+        self._evaluar(orden, nueva=True)
+        return dict(orden)
+
+    def _evaluar(self, orden, nueva=False):
+        symbol = orden["symbol"]
+        side = orden["side"]
+        actual = self.precios[symbol]
+        libro = self._libro(symbol)
+        contraparte = float(libro["askPrice"] if side == "BUY" else libro["bidPrice"])
+
+        if orden["goodTillDate"] and _ms() >= orden["goodTillDate"]:
+            self._finalizar(orden, "EXPIRED")
+            return
+
+        tipo = orden["type"]
+        if tipo in ("STOP", "STOP_MARKET"):
+            if not self._disparada(side, float(orden["stopPrice"]), actual):
+                return
+            if tipo == "STOP_MARKET":
+                self._ejecutar(orden, contraparte, maker=False)
+                return
+            # STOP disparado: queda como LIMIT en el libro
+            orden["type"] = "LIMIT"
+            tipo = "LIMIT"
+
+        if tipo == "MARKET":
+            self._ejecutar(orden, contraparte, maker=False)
+        elif tipo == "LIMIT":
+            limite = float(orden["price"])
+            if (side == "BUY" and contraparte <= limite) or (side == "SELL" and contraparte >= limite):
+                # Un LIMIT que ya estaba en el libro se ejecuta a su precio (maker); el que cruza al llegar, taker
+                maker = not nueva and orden["origType"] == "LIMIT"
+                self._ejecutar(orden, limite if maker else contraparte, maker=maker)
+
+    def _ejecutar(self, orden, precio, maker):
+        symbol = orden["symbol"]
+        side = orden["side"]
+        amt, entrada = self._posiciones.get(symbol, [0.0, 0.0])
+
+        if orden["closePosition"]:
+            cantidad = abs(amt) if self._reduce(side, amt) else 0.0
+        elif orden["reduceOnly"]:
+            cantidad = min(float(orden["origQty"]), abs(amt)) if self._reduce(side, amt) else 0.0
+        else:
+            cantidad = float(orden["origQty"])
+
+        if cantidad <= 0:
+            self._finalizar(orden, "EXPIRED")
+            return
+
+        signo = 1 if side == "BUY" else -1
+        pnl = 0.0
+        if amt and (amt > 0) != (signo > 0):
+            cerrada = min(cantidad, abs(amt))
+            pnl = (precio - entrada) * cerrada * (1 if amt > 0 else -1)
+        nuevo = round(amt + signo * cantidad, 10)
+        if nuevo == 0:
+            entrada = 0.0
+        elif amt == 0 or (amt > 0) != (nuevo > 0):
+            entrada = precio
+        elif abs(nuevo) > abs(amt):
+            entrada = (entrada * abs(amt) + precio * cantidad) / abs(nuevo)
+        self._posiciones[symbol] = [nuevo, entrada]
+
+        comision = precio * cantidad * (COMISION_MAKER if maker else COMISION_TAKER)
+        self.billetera += pnl - comision
+
+        ahora = _ms()
+        trade = {
+            "symbol": symbol,
+            "id": next(self._ids_trade),
+            "orderId": orden["orderId"],
+            "side": side,
+            "price": f"{precio}",
+            "qty": f"{cantidad}",
+            "quoteQty": f"{precio * cantidad}",
+            "realizedPnl": f"{pnl:.8f}",
+            "marginAsset": "USDT",
+            "commission": f"{comision:.8f}",
+            "commissionAsset": "USDT",
+            "time": ahora,
+            "positionSide": "BOTH",
+            "buyer": side == "BUY",
+            "maker": maker,
+        }
+        self._trades.setdefault(symbol, []).append(trade)
+
+        orden.update(status="FILLED", avgPrice=f"{precio}", executedQty=f"{cantidad}",
+                     cumQuote=f"{precio * cantidad}", updateTime=ahora)
+        if orden["closePosition"]:
+            orden["origQty"] = f"{cantidad}"
+
+        self._emitir_orden(orden, "TRADE", trade)
+        self._emitir({
+            "e": "ACCOUNT_UPDATE",
+            "E": ahora,
+            "T": ahora,
+            "a": {
+                "m": "ORDER",
+                "B": [{"a": "USDT", "wb": f"{self.billetera:.8f}", "cw": f"{self.billetera:.8f}", "bc": "0"}],
+                "P": [{"s": symbol, "pa": f"{nuevo}", "ep": f"{entrada}", "up": "0", "mt": "cross", "ps": "BOTH"}],
+            },
+        })
+
+        # Sin posición no quedan órdenes de cierre vivas (closePosition se cancela solo en Binance)
+        if nuevo == 0:
+            for otra in list(self._ordenes.values()):
+                if otra["symbol"] == symbol and otra["status"] == "NEW" and otra["closePosition"]:
+                    self._finalizar(otra, "EXPIRED")
+
+    def _finalizar(self, orden, estado):
+        orden["status"] = estado
+        orden["updateTime"] = _ms()
+        self._emitir_orden(orden, estado)
+
+    def _emitir_orden(self, orden, ejecucion, trade=None):
+        self._emitir({
+            "e": "ORDER_TRADE_UPDATE",
+            "E": orden["updateTime"],
+            "T": orden["updateTime"],
+            "o": {
+                "s": orden["symbol"],
+                "c": orden["clientOrderId"],
+                "S": orden["side"],
+                "o": orden["type"],
+                "ot": orden["origType"],
+                "f": orden["timeInForce"],
+                "q": orden["origQty"],
+                "p": orden["price"],
+                "ap": orden["avgPrice"],
+                "sp": orden["stopPrice"],
+                "x": ejecucion,
+                "X": orden["status"],
+                "i": orden["orderId"],
+                "l": trade["qty"] if trade else "0",
+                "z": orden["executedQty"],
+                "L": trade["price"] if trade else "0",
+                "n": trade["commission"] if trade else "0",
+                "N": "USDT",
+                "T": orden["updateTime"],
+                "t": trade["id"] if trade else 0,
+                "m": trade["maker"] if trade else False,
+                "R": orden["reduceOnly"],
+                "ps": "BOTH",
+                "cp": orden["closePosition"],
+                "rp": trade["realizedPnl"] if trade else "0",
+            },
+        })
+
+    def _buscar_orden(self, symbol, order_id, client_order_id):
+        if order_id is not None:
+            orden = self._ordenes.get(int(order_id))
+        else:
+            orden = next((o for o in self._ordenes.values() if o["clientOrderId"] == client_order_id), None)
+        if orden is None or orden["symbol"] != symbol:
+            raise _error(-2013, "Order does not exist.")
+        return orden
+
+    def _libro(self, symbol):
+        precio = self.precios[symbol]
+        tick = float(self.simbolos[symbol][1])
+        return {"symbol": symbol, "bidPrice": f"{precio - tick}", "bidQty": "100",
+                "askPrice": f"{precio + tick}", "askQty": "100", "time": _ms()}
+
+    def _posicion_risk(self, symbol):
+        amt, entrada = self._posiciones.get(symbol, [0.0, 0.0])
+        precio = self.precios[symbol]
+        return {
+            "symbol": symbol,
+            "positionSide": "BOTH",
+            "positionAmt": f"{amt}",
+            "entryPrice": f"{entrada}",
+            "markPrice": f"{precio}",
+            "unRealizedProfit": f"{(precio - entrada) * amt if amt else 0.0}",
+            "notional": f"{precio * amt}",
+            "liquidationPrice": "0",
+            "updateTime": _ms(),
+        }
+
+    def _disponible(self):
+        margen = sum(abs(amt) * entrada / self._apalancamiento.get(s, 20)
+                     for s, (amt, entrada) in self._posiciones.items())
+        return self.billetera - margen
+
+    @staticmethod
+    def _disparada(side, stop, precio):
+        return precio >= stop if side == "BUY" else precio <= stop
+
+    @staticmethod
+    def _reduce(side, posicion):
+        return (posicion > 0 and side == "SELL") or (posicion < 0 and side == "BUY")
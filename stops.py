@@ -0,0 +1,152 @@
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from metricas import metricas
+
+logger = logging.getLogger()
+
+# Variables de entorno (break-even y trailing están desactivados salvo que se configuren):
+#   STOP_BREAKEVEN_R          múltiplo de R que lleva el SL a break-even, p. ej. 1 (0 = desactivado)
+#   STOP_BREAKEVEN_TICKS      ticks a favor sobre la entrada en break-even (por defecto 2)
+#   STOP_TRAILING_R           múltiplo de R desde el que el SL sigue al precio, p. ej. 1.5 (0 = desactivado)
+#   STOP_TRAILING_DISTANCIA_R distancia del SL al mejor precio, en R (por defecto 1)
+#   STOP_UMBRAL_TICKS / STOP_PASO_R / STOP_INTERVALO_MS  cuánto y cada cuánto se reemplaza el SL
+
+# Múltiplo de R a partir del cual el SL pasa a break-even (0 lo desactiva)
+BREAKEVEN_R = float(os.getenv("STOP_BREAKEVEN_R", "0"))
+# Ticks a favor sobre la entrada al pasar a break-even (cubren las comisiones)
+BREAKEVEN_TICKS = int(os.getenv("STOP_BREAKEVEN_TICKS", "2"))
+# Múltiplo de R a partir del cual el SL sigue al mejor precio, y a qué distancia (en R; 0 lo desactiva)
+TRAILING_R = float(os.getenv("STOP_TRAILING_R", "0"))
+TRAILING_DISTANCIA_R = float(os.getenv("STOP_TRAILING_DISTANCIA_R", "1"))
+# El SL solo se reemplaza si el nuevo precio avanza al menos esta cantidad de ticks
+UMBRAL_TICKS = int(os.getenv("STOP_UMBRAL_TICKS", "5"))
+# ... y al menos esta fracción de R (en símbolos de tick chico los ticks solos son muy poco)
+PASO_R = float(os.getenv("STOP_PASO_R", "0.1"))
+# Mínimo entre dos reemplazos del mismo símbolo
+INTERVALO_MIN_MS = int(os.getenv("STOP_INTERVALO_MS", "2000"))
+
+
+def _ms():
+    return int(time.time() * 1000)
+
+
+class StopSeguido:
+    __slots__ = ("symbol", "direccion", "entrada", "riesgo", "tick", "paso", "sl", "extremo", "ultimo_ms", "en_curso")
+
+    def __init__(self, symbol, direccion, entrada, riesgo, tick, sl, paso):
+        self.symbol = symbol
+        self.direccion = direccion
+        self.entrada = entrada
+        self.riesgo = riesgo            # distancia entrada → SL original (1R)
+        self.tick = tick
+        self.paso = paso                # avance mínimo del SL para reemplazarlo
+        self.sl = sl                    # precio del SL vigente en Binance
+        self.extremo = entrada          # mejor mark desde la entrada
+        self.ultimo_ms = 0
+        self.en_curso = False           # hay un reemplazo enviándose
+
+
+# === Gestión de stops: break-even y trailing ===
+
+class GestorStops:
+    """
+    Mueve el SL de las posiciones protegidas con cada mark price del stream (solo si se activó
+    STOP_BREAKEVEN_R y/o STOP_TRAILING_R; por defecto el SL queda fijo): a break-even al
+    alcanzar `breakeven_r` y, desde `trailing_r`, a `distancia_r` del mejor precio visto. El SL
+    solo avanza a favor y se reemplaza únicamente cuando el nuevo precio supera al vigente en
+    `umbral_ticks` (y en `paso_r` R), con un mínimo de `intervalo_ms` por símbolo: con muchas posiciones no se
+    inunda a Binance de cancel/replace.
+
+    El cálculo es O(1) en el hilo del stream; el reemplazo (llamadas REST) corre en un hilo
+    propio, uno por vez.
+
+    Args:
+        reemplazar: callable(symbol, nuevo_sl) que mueve el SL en Binance; devuelve True si quedó.
+        tick: callable(symbol) con el tickSize del símbolo.
+    """
+
+    def __init__(self, reemplazar, tick, breakeven_r=BREAKEVEN_R, breakeven_ticks=BREAKEVEN_TICKS,
+                 trailing_r=TRAILING_R, distancia_r=TRAILING_DISTANCIA_R, umbral_ticks=UMBRAL_TICKS,
+                 paso_r=PASO_R, intervalo_ms=INTERVALO_MIN_MS):
+        self.reemplazar = reemplazar
+        self.tick = tick
+        self.breakeven_r = breakeven_r
+        self.breakeven_ticks = breakeven_ticks
+        self.trailing_r = trailing_r
+        self.distancia_r = distancia_r
+        self.umbral_ticks = umbral_ticks
+        self.paso_r = paso_r
+        self.intervalo_ms = intervalo_ms
+        self._seguidos = {}         # symbol -> StopSeguido
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stops")
+
+    @property
+    def activo(self):
+        return bool(self.breakeven_r or self.trailing_r)
+
+    def registrar(self, symbol, side, entrada, sl, riesgo):
+        """Empieza a seguir una posición protegida con SL en `sl` (entrada y SL ya reales)."""
+        if not self.activo or not riesgo:
+            return
+        tick = float(self.tick(symbol))
+        paso = max(self.umbral_ticks * tick, self.paso_r * float(riesgo))
+        self._seguidos[symbol] = StopSeguido(
+            symbol, 1 if side == "BUY" else -1, float(entrada), float(riesgo), tick, float(sl), paso
+        )
+
+    def quitar(self, symbol):
+        self._seguidos.pop(symbol, None)
+
+    def seguidos(self):
+        return {s: {"sl": e.sl, "extremo": e.extremo} for s, e in list(self._seguidos.items())}
+
+    def on_mark(self, symbol, mark, ts=None):
+        seguido = self._seguidos.get(symbol)
+        if seguido is None:
+            return
+        d = seguido.direccion
+        if (mark - seguido.extremo) * d > 0:
+            seguido.extremo = mark
+
+        objetivo = self._objetivo(seguido)
+        if objetivo is None or (objetivo - seguido.sl) * d < seguido.paso:
+            return
+        ts = ts or _ms()
+        if seguido.en_curso or ts - seguido.ultimo_ms < self.intervalo_ms:
+            return
+        seguido.en_curso = True
+        seguido.ultimo_ms = ts
+        self._pool.submit(self._mover, seguido, objetivo)
+
+    # === Internos ===
+
+    def _objetivo(self, s):
+        """Nuevo SL según el mejor precio visto, redondeado al tick hacia el lado conservador."""
+        r = (s.extremo - s.entrada) * s.direccion / s.riesgo
+        objetivo = None
+        if self.trailing_r and r >= self.trailing_r:
+            objetivo = s.extremo - s.direccion * self.distancia_r * s.riesgo
+        if self.breakeven_r and r >= self.breakeven_r:
+            breakeven = s.entrada + s.direccion * self.breakeven_ticks * s.tick
+            if objetivo is None or (breakeven - objetivo) * s.direccion > 0:
+                objetivo = breakeven
+        if objetivo is None:
+            return None
+        # La tolerancia evita perder un tick por el error de coma flotante (65000.3 / 0.1 = 650002.999…)
+        pasos = objetivo / s.tick
+        pasos = math.floor(pasos + 1e-9) if s.direccion > 0 else math.ceil(pasos - 1e-9)
+        return round(pasos * s.tick, 10)
+
+    def _mover(self, seguido, objetivo):
+        try:
+            if self.reemplazar(seguido.symbol, objetivo):
+                logger.info("🪜 SL de %s: %s → %s", seguido.symbol, seguido.sl, objetivo)
+                metricas.incrementar("stops_movidos_total")
+                seguido.sl = objetivo
+        except Exception as e:
+            logger.error("❌ Error moviendo el SL de %s: %s", seguido.symbol, e)
+        finally:
+            seguido.en_curso = False
@@ -0,0 +1,177 @@
+import json
+import logging
+import threading
+from binance.websocket.um_futures.websocket_client import UMFuturesWebsocketClient
+
+logger = logging.getLogger()
+
+# Binance expira el listenKey a los 60 min sin keepalive; se renueva cada 30
+INTERVALO_KEEPALIVE = 30 * 60
+ESPERA_RECONEXION_MAX = 60
+
+
+# === Gestión del listenKey del user-data stream ===
+
+class GestorListenKey:
+    def __init__(self, client):
+        self.client = client
+        self.listen_key = None
+
+    def obtener(self):
+        respuesta = self.client.new_listen_key()
+        self.listen_key = respuesta["listenKey"]
+        return self.listen_key
+
+    def renovar(self):
+        if self.listen_key:
+            try:
+                self.client.renew_listen_key(listenKey=self.listen_key)
+                return self.listen_key
+            except Exception as e:
+                logger.warning("⚠️ No se pudo renovar el listenKey, se pide uno nuevo: %s", e)
+        return self.obtener()
+
+    def cerrar(self):
+        if not self.listen_key:
+            return
+        try:
+            self.client.close_listen_key(listenKey=self.listen_key)
+        except Exception as e:
+            logger.info("⚠️ No se pudo cerrar el listenKey: %s", e)
+        self.listen_key = None
+
+
+# === Stream de eventos de órdenes y cuenta (ORDER_TRADE_UPDATE / ACCOUNT_UPDATE) ===
+
+class StreamUsuario:
+    """
+    Mantiene abierta la conexión al user-data stream de futuros y reenvía los eventos.
+    Si la conexión cae, `activo` pasa a False (el bot vuelve al polling) y se reintenta
+    la conexión con espera exponencial.
+
+    Args:
+        client: Cliente Binance (para el listenKey).
+        on_orden: callback con el dict "o" de cada ORDER_TRADE_UPDATE.
+        on_cuenta: (opcional) callback con el dict "a" de cada ACCOUNT_UPDATE.
+        on_config: (opcional) callback con el dict "ac" de cada ACCOUNT_CONFIG_UPDATE (apalancamiento).
+        on_reconexion: (opcional) callback al reconectar, para reconciliar lo perdido.
+        stream_url: URL base del websocket (permite apuntar a un servidor local).
+    """
+
+    def __init__(self, client, on_orden, on_cuenta=None, on_reconexion=None,
+                 stream_url="wss://fstream.binance.com", on_config=None):
+        self.listen_keys = GestorListenKey(client)
+        self.on_orden = on_orden
+        self.on_cuenta = on_cuenta
+        self.on_config = on_config
+        self.on_reconexion = on_reconexion
+        self.stream_url = stream_url
+        self._ws = None
+        self._listen_key = None
+        self._conectado = threading.Event()
+        self._caida = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    @property
+    def activo(self):
+        return self._conectado.is_set()
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._supervisar, name="stream_usuario", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        self._caida.set()
+        self._cerrar_ws()
+        self.listen_keys.cerrar()
+
+    def conectar_local(self, suscribir):
+        """Recibe los eventos de una fuente en el mismo proceso (el exchange simulado) en lugar del websocket."""
+        suscribir(self.procesar_mensaje)
+        self._conectado.set()
+
+    def procesar_mensaje(self, mensaje):
+        evento = json.loads(mensaje) if isinstance(mensaje, (str, bytes)) else mensaje
+        tipo = evento.get("e")
+
+        if tipo == "ORDER_TRADE_UPDATE":
+            self.on_orden(evento["o"])
+        elif tipo == "ACCOUNT_UPDATE" and self.on_cuenta:
+            self.on_cuenta(evento["a"])
+        elif tipo == "ACCOUNT_CONFIG_UPDATE" and self.on_config and "ac" in evento:
+            self.on_config(evento["ac"])
+        elif tipo == "listenKeyExpired":
+            logger.warning("⚠️ listenKey expirado, reconectando stream de usuario...")
+            self.listen_keys.listen_key = None
+            self._caida.set()
+
+    # === Internos ===
+
+    def _supervisar(self):
+        espera = 1
+        primera_conexion = True
+
+        while not self._detener.is_set():
+            try:
+                self._conectar()
+                espera = 1
+                logger.info("📡 Stream de usuario conectado.")
+                if not primera_conexion and self.on_reconexion:
+                    self.on_reconexion()
+                primera_conexion = False
+                self._mantener_vivo()
+            except Exception as e:
+                logger.error("❌ Error en stream de usuario: %s", e)
+
+            self._conectado.clear()
+            self._cerrar_ws()
+            if self._detener.is_set():
+                break
+
+            logger.warning("🔁 Stream de usuario caído, usando polling. Reintento en %ss", espera)
+            self._detener.wait(espera)
+            espera = min(espera * 2, ESPERA_RECONEXION_MAX)
+
+    def _conectar(self):
+        self._caida.clear()
+        self._listen_key = self.listen_keys.renovar()
+        self._ws = UMFuturesWebsocketClient(
+            stream_url=self.stream_url,
+            on_message=self._on_message,
+            on_close=self._on_caida,
+            on_error=self._on_caida,
+        )
+        self._ws.user_data(listen_key=self._listen_key)
+        self._conectado.set()
+
+    def _mantener_vivo(self):
+        while not self._detener.is_set():
+            if self._caida.wait(INTERVALO_KEEPALIVE):
+                return
+            # Si Binance entregó otra key hay que resuscribirse
+            if self.listen_keys.renovar() != self._listen_key:
+                return
+
+    def _cerrar_ws(self):
+        ws, self._ws = self._ws, None
+        if ws is None:
+            return
+        try:
+            ws.stop()
+        except Exception:
+            pass
+
+    def _on_message(self, _, mensaje):
+        try:
+            self.procesar_mensaje(mensaje)
+        except Exception as e:
+            logger.error("❌ Error procesando evento del stream: %s", e)
+
+    def _on_caida(self, *_):
+        self._conectado.clear()
+        self._caida.set()
@@ -1,39 +1,149 @@
 import requests
 import logging
-import sys
+import registro
+import threading
+import time
+import atexit
+from collections import deque
+from metricas import metricas
 from dotenv import load_dotenv
 import os
 
+# Cargar las variables de entorno desde el archivo .env (antes del logging: LOG_LEVEL, LOG_FORMATO)
+load_dotenv()
+
 # === Funciones auxiliares ===
-logging.basicConfig(
-    level=logging.INFO,  # nivel mínimo de logs a mostrar (INFO y superiores)
-    format='%(asctime)s - %(levelname)s - %(message)s',  # formato con fecha, nivel y mensaje
-    handlers=[logging.StreamHandler(sys.stdout)]  # salida a consola, que Render captura
-)
+registro.configurar()
 
 logger = logging.getLogger()
 
-# Cargar las variables de entorno desde el archivo .env
-load_dotenv()
-
 # Obtener las variables de entorno
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
 
+# Límites de Telegram y del despachador
+LIMITE_MENSAJE = 4096
+TIMEOUT_TELEGRAM = 10
+TAMANO_COLA = int(os.getenv("TELEGRAM_COLA_MAX", "100"))
+VENTANA_AGRUPADO = 0.3
+
+
+# === Despachador en segundo plano ===
+
+class DespachadorTelegram:
+    """
+    Cola acotada de mensajes que se envían desde un hilo propio con una sesión HTTP reutilizada.
+    Si la cola se llena se descarta el mensaje más viejo; los mensajes que se acumulan durante
+    una ráfaga se agrupan en un solo envío y los repetidos se cuentan en vez de reenviarse.
+    Ante un 429 se respeta el `retry_after` que devuelve Telegram.
+    """
+
+    def __init__(self, token, chat_id, tamano_cola=TAMANO_COLA, intentos=3):
+        self.url = f"https://api.telegram.org/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.tamano_cola = tamano_cola
+        self.intentos = intentos
+        self.session = requests.Session()
+        self.descartados = 0
+        self._cola = deque()
+        self._cond = threading.Condition()
+        self._enviando = False
+        self._hilo = None
+
+    def encolar(self, mensaje: str):
+        with self._cond:
+            if len(self._cola) >= self.tamano_cola:
+                self._cola.popleft()
+                self.descartados += 1
+                metricas.incrementar("telegram_descartados_total")
+            self._cola.append(mensaje)
+            self._cond.notify()
+
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._trabajar, name="telegram", daemon=True)
+                self._hilo.start()
+
+    def vaciar(self, timeout=5.0):
+        """Espera (hasta `timeout` segundos) a que se envíe todo lo pendiente."""
+        limite = time.monotonic() + timeout
+        with self._cond:
+            while self._cola or self._enviando:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._cond.wait(restante)
+        return True
+
+    def _trabajar(self):
+        while True:
+            with self._cond:
+                while not self._cola:
+                    self._cond.wait()
+            # Pequeña espera para juntar los mensajes de una misma ráfaga
+            time.sleep(VENTANA_AGRUPADO)
+
+            with self._cond:
+                texto = self._agrupar()
+                self._enviando = True
+            try:
+                self._enviar(texto)
+            finally:
+                with self._cond:
+                    self._enviando = False
+                    self._cond.notify_all()
+
+    def _agrupar(self):
+        bloques = []  # [mensaje, repeticiones]
+        largo = 0
+        while self._cola:
+            mensaje = self._cola[0]
+            if bloques and bloques[-1][0] == mensaje:
+                bloques[-1][1] += 1
+                self._cola.popleft()
+                continue
+            if bloques and largo + len(mensaje) + 2 > LIMITE_MENSAJE - 20:
+                break
+            bloques.append([mensaje[:LIMITE_MENSAJE - 20], 1])
+            largo += len(mensaje) + 2
+            self._cola.popleft()
+
+        return "\n\n".join(m if n == 1 else f"{m} (x{n})" for m, n in bloques)
+
+    def _enviar(self, texto):
+        payload = {
+            "chat_id": self.chat_id,
+            "text": texto,
+            "parse_mode": "HTML"
+        }
+        for intento in range(1, self.intentos + 1):
+            try:
+                with metricas.cronometro("telegram_envio_seconds"):
+                    response = self.session.post(self.url, data=payload, timeout=TIMEOUT_TELEGRAM)
+                if response.status_code == 429:
+                    metricas.incrementar("telegram_reintentos_total", motivo="429")
+                    espera = response.json().get("parameters", {}).get("retry_after", 1)
+                    logger.info("⏳ Telegram limitó el envío, reintento en %ss", espera)
+                    time.sleep(espera)
+                    continue
+                logger.debug("✅ Telegram status: %s", response.status_code)
+                response.raise_for_status()
+                return True
+            except requests.exceptions.RequestException as e:
+                logger.warning("[Telegram Error] %s", e)
+                if intento < self.intentos:
+                    time.sleep(intento)
+        return False
+
+
+despachador = DespachadorTelegram(TELEGRAM_TOKEN, TELEGRAM_CHAT_ID)
+atexit.register(despachador.vaciar)
+
+
+@metricas.cronometrar("telegram_encolado_seconds")
 def enviar_telegram(mensaje: str):
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": mensaje,
-        "parse_mode": "HTML"
-    }
-    try:
-        response = requests.post(url, data=payload)
-        logger.info(f"✅ Telegram status: {response.status_code}")
-        logger.info(f"📨 Telegram response: {response.text}")
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        logger.info(f"[Telegram Error] {e}")
-
-    
\ No newline at end of file
+    # Sin token (benchmarks, simulación) no se envía nada
+    if not TELEGRAM_TOKEN:
+        return
+    # No bloquea: el envío real lo hace el hilo del despachador
+    despachador.encolar(mensaje)
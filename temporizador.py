@@ -0,0 +1,106 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from metricas import metricas
+
+logger = logging.getLogger()
+
+
+def _ms():
+    return int(time.time() * 1000)
+
+
+# === Temporizador de vencimientos ===
+
+class Temporizador:
+    """
+    Ejecuta funciones a una hora exacta (ms epoch) desde un solo hilo que duerme hasta el
+    próximo vencimiento: no hay ticks periódicos, así que mientras nada vence no consume CPU
+    ni llamadas a Binance. Cada tarea tiene una `clave` (p. ej. el orderId); volver a programar
+    la misma clave reemplaza la anterior y `cancelar` la descarta.
+    Las funciones corren en el hilo del temporizador, una por vez.
+    """
+
+    def __init__(self, nombre="temporizador"):
+        self.nombre = nombre
+        self._heap = []            # (vence_ms, secuencia, clave)
+        self._tareas = {}          # clave -> (vence_ms, secuencia, funcion, args)
+        self._secuencia = itertools.count()
+        self._cond = threading.Condition()
+        self._detener = False
+        self._hilo = None
+
+    def programar(self, clave, vence_ms, funcion, *args):
+        with self._cond:
+            actual = self._tareas.get(clave)
+            if actual is not None and actual[0] == vence_ms:
+                return
+            secuencia = next(self._secuencia)
+            self._tareas[clave] = (vence_ms, secuencia, funcion, args)
+            heapq.heappush(self._heap, (vence_ms, secuencia, clave))
+            # Solo hace falta despertar al hilo si cambió el próximo vencimiento
+            if self._heap[0][1] == secuencia:
+                self._cond.notify()
+            self._asegurar_hilo()
+
+    def cancelar(self, clave):
+        # La entrada del heap queda huérfana y se descarta cuando llega al tope
+        with self._cond:
+            return self._tareas.pop(clave, None) is not None
+
+    def pendientes(self):
+        with self._cond:
+            return len(self._tareas)
+
+    def proximo(self):
+        """ms epoch del próximo vencimiento, o None."""
+        with self._cond:
+            self._limpiar_tope()
+            return self._heap[0][0] if self._heap else None
+
+    def detener(self):
+        with self._cond:
+            self._detener = True
+            self._cond.notify()
+
+    # === Internos ===
+
+    def _asegurar_hilo(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener = False
+            self._hilo = threading.Thread(target=self._trabajar, name=self.nombre, daemon=True)
+            self._hilo.start()
+
+    def _limpiar_tope(self):
+        while self._heap:
+            vence_ms, secuencia, clave = self._heap[0]
+            tarea = self._tareas.get(clave)
+            if tarea is not None and tarea[1] == secuencia:
+                return
+            heapq.heappop(self._heap)
+
+    def _trabajar(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._detener:
+                        return
+                    self._limpiar_tope()
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    espera = (self._heap[0][0] - _ms()) / 1000
+                    if espera <= 0:
+                        break
+                    self._cond.wait(espera)
+
+                vence_ms, _, clave = heapq.heappop(self._heap)
+                _, _, funcion, args = self._tareas.pop(clave)
+
+            metricas.observar("temporizador_retraso_seconds", max(_ms() - vence_ms, 0) / 1000)
+            try:
+                funcion(*args)
+            except Exception as e:
+                logger.exception("❌ Error en la tarea programada %s: %s", clave, e)
@@ -0,0 +1,59 @@
+import itertools
+import os
+import sys
+
+import pytest
+
+# Los módulos del bot están en la raíz del repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py arma el cliente y los almacenes al importarse: exchange simulado y todo en memoria
+os.environ.update(
+    BINANCE_SIMULADO="1", TELEGRAM_TOKEN="", USAR_STREAM_USUARIO="0", USAR_STREAM_MERCADO="0",
+    ESTADO_DB=":memory:", LIBRO_TRADES_DB=":memory:", DIARIO_DB=":memory:", WEBHOOK_SECRET="",
+)
+
+
+@pytest.fixture
+def exchange():
+    """Exchange simulado del bot; al terminar deja todos los símbolos sin órdenes ni posiciones y en su precio inicial."""
+    import app
+    from posiciones import CANCELADA, CERRADA, PENDIENTE_ENTRADA
+
+    sim = app.exchange_simulado
+    precios = dict(sim.precios)
+    yield sim
+    for symbol in sim.simbolos:
+        sim.cancel_open_orders(symbol=symbol)
+        cantidad = float(sim.get_position_risk(symbol=symbol)[0]["positionAmt"])
+        if cantidad:
+            sim.new_order(symbol=symbol, side="SELL" if cantidad > 0 else "BUY", type="MARKET", quantity=str(abs(cantidad)))
+        posicion = app.gestor.obtener(symbol)
+        if posicion is not None:
+            app.vencimientos.cancelar(posicion.order_id)
+            app.gestor.transicion(posicion, posicion.estado, CANCELADA if posicion.estado == PENDIENTE_ENTRADA else CERRADA)
+        app.stops.quitar(symbol)
+        sim.mover_precio(symbol, precios[symbol])
+    app.motor_riesgo.reconstruir([])
+
+
+@pytest.fixture
+def bot(exchange, monkeypatch):
+    """Cliente del webhook, con el warm-up hecho y la señal ejecutada dentro del request."""
+    import app
+
+    monkeypatch.setattr(app, "modo_webhook", "sincrono")
+    app.arranque_listo.set()
+    return app.app.test_client()
+
+
+_ids = itertools.count(1)
+
+
+def enviar_senal(bot, symbol, side, entry, sl_distance, **extra):
+    # Cada señal con su propio id: si no, el índice de idempotencia la descarta como duplicada
+    datos = {"symbol": symbol, "side": side, "entry": entry, "sl_distance": sl_distance,
+             "tp_factor": 2, "risk_percent": 1, "id": f"test-{next(_ids)}", **extra}
+    respuesta = bot.post("/webhook", json=datos)
+    assert respuesta.status_code == 200, respuesta.json
+    return respuesta.json
@@ -0,0 +1,39 @@
+import pytest
+
+import app
+from conftest import enviar_senal
+
+
+def operacion(order_id):
+    return next(o for o in app.diario.operaciones(0) if o["order_id"] == order_id)
+
+
+def test_la_comision_de_la_operacion_incluye_la_entrada(bot, exchange):
+    p0 = exchange.precios["ETHUSDT"]
+    ultimo_trade = max((t["id"] for t in exchange.get_account_trades(symbol="ETHUSDT")), default=0)
+
+    order_id = enviar_senal(bot, "ETHUSDT", "BUY", p0 + 5, 30)["order_id"]
+    exchange.mover_precio("ETHUSDT", p0 + 6)
+    exchange.mover_precio("ETHUSDT", p0 + 4)
+    app.monitor_posiciones(forzar_polling=True)
+    exchange.mover_precio("ETHUSDT", p0 - 40)
+    app.monitor_posiciones(forzar_polling=True)
+
+    trades = [t for t in exchange.get_account_trades(symbol="ETHUSDT") if t["id"] > ultimo_trade]
+    assert {t["side"] for t in trades} == {"BUY", "SELL"}
+    fila = operacion(order_id)
+    assert fila["estado"] == "CERRADA"
+    assert fila["comision"] == pytest.approx(sum(float(t["commission"]) for t in trades))
+    assert fila["pnl"] == pytest.approx(sum(float(t["realizedPnl"]) for t in trades))
+
+
+def test_senal_que_reemplaza_una_entrada_pendiente_la_cancela_en_el_diario(bot, exchange):
+    p0 = exchange.precios["SOLUSDT"]
+    primera = enviar_senal(bot, "SOLUSDT", "BUY", p0 + 1, 2)["order_id"]
+    segunda = enviar_senal(bot, "SOLUSDT", "BUY", p0 + 2, 2)["order_id"]
+
+    assert exchange.orden(primera)["status"] == "CANCELED"
+    assert operacion(primera)["estado"] == "CANCELADA"
+    assert operacion(segunda)["estado"] == "PENDIENTE"
+    assert app.gestor.obtener("SOLUSDT").order_id == segunda
+    assert app.diario.reporte_periodo("dia", "SOLUSDT")["tasa_llenado"] == 0
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from ejecutor import COMPLETADA, EjecutorSenales
+
+
+def esperar(condicion, timeout=5):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_mismo_simbolo_en_orden_y_simbolos_distintos_en_paralelo():
+    ejecutadas, en_curso, maximo = [], {}, {}
+    lock = threading.Lock()
+    liberar_btc = threading.Event()
+
+    def procesar(senal):
+        symbol = senal.datos["symbol"]
+        with lock:
+            en_curso[symbol] = en_curso.get(symbol, 0) + 1
+            maximo[symbol] = max(maximo.get(symbol, 0), en_curso[symbol])
+        if symbol == "BTCUSDT":
+            liberar_btc.wait(5)
+        time.sleep(0.01)
+        with lock:
+            en_curso[symbol] -= 1
+            ejecutadas.append((symbol, senal.datos["n"]))
+        return {}, 200
+
+    ejecutor = EjecutorSenales(procesar, hilos=3)
+    senales = [ejecutor.encolar({"symbol": s, "n": n}) for n in range(4) for s in ("BTCUSDT", "ETHUSDT")]
+
+    # BTC está trabado en su primera señal y ETH igual termina todas las suyas
+    assert esperar(lambda: [n for s, n in ejecutadas if s == "ETHUSDT"] == [0, 1, 2, 3])
+    assert not any(s == "BTCUSDT" for s, _ in ejecutadas)
+    liberar_btc.set()
+
+    assert esperar(lambda: all(s.estado == COMPLETADA for s in senales))
+    assert [n for s, n in ejecutadas if s == "BTCUSDT"] == [0, 1, 2, 3]
+    assert maximo == {"BTCUSDT": 1, "ETHUSDT": 1}
+    assert ejecutor.pendientes() == 0
+
+
+def test_orden_por_simbolo_con_muchos_hilos():
+    ejecutadas = []
+    lock = threading.Lock()
+
+    def procesar(senal):
+        with lock:
+            ejecutadas.append((senal.datos["symbol"], senal.datos["n"]))
+        return {}, 200
+
+    ejecutor = EjecutorSenales(procesar, tamano_cola=1000, hilos=8)
+    simbolos = ("BTCUSDT", "ETHUSDT", "SOLUSDT")
+    senales = [ejecutor.encolar({"symbol": s, "n": n}) for n in range(100) for s in simbolos]
+
+    assert esperar(lambda: all(s.estado == COMPLETADA for s in senales))
+    for symbol in simbolos:
+        assert [n for s, n in ejecutadas if s == symbol] == list(range(100))
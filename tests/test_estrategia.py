@@ -0,0 +1,82 @@
+from decimal import Decimal
+
+import pytest
+
+import estrategia
+from filtros import ServicioFiltros
+from simulador import ExchangeSimulado
+
+
+@pytest.fixture(scope="module")
+def filtros():
+    return ServicioFiltros(ExchangeSimulado())
+
+
+def patas(filtros, symbol, entrada, qty, sl_distance, escalera, direccion=1, valida=None):
+    f = filtros.obtener(symbol)
+    return estrategia.patas_tp(
+        entrada, qty, sl_distance, escalera, direccion,
+        cuantizar=lambda cantidad: float(f.cantidad(cantidad)),
+        redondear=lambda precio: float(f.precio(precio)),
+        valida=valida or (lambda cantidad, precio: not f.validar_orden(cantidad, precio)),
+    )
+
+
+def en_pasos(cantidad, paso):
+    return Decimal(str(cantidad)) % Decimal(paso) == 0
+
+
+# === parsear_escalera ===
+
+def test_parsea_fracciones_y_multiplos_de_r():
+    assert estrategia.parsear_escalera(" 0.5@1, 0.3@2 ") == [(0.5, 1.0), (0.3, 2.0)]
+    assert estrategia.parsear_escalera("0.25@1,0.25@1.5,0.25@2,0.25@3") == [(0.25, 1.0), (0.25, 1.5), (0.25, 2.0), (0.25, 3.0)]
+    # Vacío = sin escalera (un solo TP)
+    assert estrategia.parsear_escalera("") == []
+
+
+@pytest.mark.parametrize("texto", [
+    ",", " , ",                             # con contenido pero sin patas
+    "0.5", "0.5@", "@1", "0.5@1@2", "a@1",  # mal formadas
+    "0@1", "-0.5@1", "0.5@0", "0.5@-1",     # fracción o R no positivas
+    "nan@1", "0.5@inf",
+    "0.7@1,0.4@2",                          # suman más que la posición
+    "0.2@1,0.2@2,0.2@3,0.2@4,0.2@5",        # más patas de las que entran en el batch
+])
+def test_escalera_invalida_se_rechaza(texto):
+    with pytest.raises(ValueError):
+        estrategia.parsear_escalera(texto)
+
+
+# === patas_tp ===
+
+def test_cantidades_en_el_step_y_la_ultima_se_lleva_el_resto(filtros):
+    escalera = estrategia.parsear_escalera("0.3333@1,0.3333@2,0.3334@3")
+
+    resultado = patas(filtros, "ETHUSDT", 3200.0, 0.1, 20.0, escalera)
+
+    assert resultado == [(0.033, 3220.0), (0.033, 3240.0), (0.034, 3260.0)]
+    assert all(en_pasos(cantidad, "0.001") for cantidad, _ in resultado)
+    assert sum(Decimal(str(cantidad)) for cantidad, _ in resultado) == Decimal("0.1")
+
+
+def test_escalera_parcial_deja_el_resto_para_el_sl(filtros):
+    resultado = patas(filtros, "SOLUSDT", 150.0, 5, 3.0, [(0.5, 1.0), (0.3, 2.0)])
+
+    # 2.5 y 1.5 se redondean hacia abajo al step de 1; lo que no cubre la escalera no se asigna
+    assert resultado == [(2.0, 153.0), (1.0, 156.0)]
+
+
+def test_short_pone_los_tp_por_debajo_de_la_entrada(filtros):
+    resultado = patas(filtros, "BTCUSDT", 65000.0, 0.01, 500.0, [(0.5, 1.0), (0.5, 2.0)], direccion=-1)
+
+    assert resultado == [(0.005, 64500.0), (0.005, 64000.0)]
+
+
+def test_pata_invalida_se_suma_a_la_siguiente_o_a_la_anterior(filtros):
+    valida = lambda cantidad, precio: cantidad >= 0.05
+
+    # La primera no llega al mínimo: pasa a la siguiente, que además es la última y cubre todo
+    assert patas(filtros, "ETHUSDT", 3200.0, 0.1, 20.0, [(0.2, 1.0), (0.8, 2.0)], valida=valida) == [(0.1, 3240.0)]
+    # La última no llega: se suma a la anterior
+    assert patas(filtros, "ETHUSDT", 3200.0, 0.1, 20.0, [(0.8, 1.0), (0.2, 2.0)], valida=valida) == [(0.1, 3220.0)]
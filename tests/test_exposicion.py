@@ -0,0 +1,75 @@
+import app
+from exposicion import MonitorExposicion
+from persistencia import AlmacenEstado
+from posiciones import Posicion
+
+
+def protegida(symbol="ETHUSDT", qty=1.0, entrada=3200.0, sl_distance=20.0, patas=None, escalera=None):
+    p = Posicion(symbol, order_id=1, side="BUY", qty=qty, sl_distance=sl_distance, tp_factor=2, escalera=escalera)
+    p.precio_entrada = entrada
+    p.patas_tp = patas
+    return p
+
+
+def actualizacion(symbol, qty, entrada, billetera):
+    return {"B": [{"a": "USDT", "wb": str(billetera), "cw": str(billetera)}],
+            "P": [{"s": symbol, "pa": str(qty), "ep": str(entrada), "mt": "cross", "iw": "0", "ps": "BOTH"}]}
+
+
+def test_reporta_las_patas_pendientes_de_la_escalera():
+    patas = [{"order_id": 11, "qty": 0.5, "precio": 3220.0, "llena": True},
+             {"order_id": 12, "qty": 0.3, "precio": 3240.0, "llena": False},
+             {"order_id": 13, "qty": 0.2, "precio": 3260.0, "llena": False}]
+    monitor = MonitorExposicion()
+    monitor.sincronizar([protegida(patas=patas)])
+    monitor.on_mark("ETHUSDT", 3230.0)
+
+    [m] = monitor.estado()["posiciones"]
+
+    assert m["qty"] == 0.5
+    assert [(t["qty"], t["precio"]) for t in m["tps"]] == [(0.3, 3240.0), (0.2, 3260.0)]
+    assert m["distancia_tp"] == round(10 / 3230, 5) == m["tps"][0]["distancia"]
+
+
+def test_escalera_sin_colocar_y_tp_unico():
+    monitor = MonitorExposicion()
+    monitor.sincronizar([protegida(escalera=[(0.5, 1.0), (0.5, 2.0)]), protegida("BTCUSDT", 0.01, 65000.0, 500.0)])
+
+    tps = {m["symbol"]: [(t["qty"], t["precio"]) for t in m["tps"]] for m in monitor.estado()["posiciones"]}
+
+    assert tps == {"ETHUSDT": [(0.5, 3220.0), (0.5, 3240.0)], "BTCUSDT": [(0.01, 66000.0)]}
+
+
+def test_seguidor_recibe_la_cuenta_que_guardo_el_lider(tmp_path):
+    ruta = str(tmp_path / "estado.db")
+    lider, seguidor = AlmacenEstado(ruta), AlmacenEstado(ruta)
+    monitor = MonitorExposicion()
+
+    lider.guardar_cuenta(actualizacion("ETHUSDT", 1.0, 3200.0, 1000))
+    lider.guardar_cuenta(actualizacion("ETHUSDT", 0.4, 3200.0, 1010))
+    datos, ultimo = seguidor.cuenta_desde(0)
+    monitor.on_evento_cuenta(datos)
+
+    estado = monitor.estado()
+    assert estado["total"]["billetera"] == 1010
+    assert [(p["symbol"], p["qty"]) for p in estado["posiciones"]] == [("ETHUSDT", 0.4)]
+    # Sin cambios nuevos no hay nada que aplicar
+    assert seguidor.cuenta_desde(ultimo) == (None, ultimo)
+
+    lider.guardar_cuenta(actualizacion("ETHUSDT", 0, 0, 1020))
+    datos, _ = seguidor.cuenta_desde(ultimo)
+    monitor.on_evento_cuenta(datos)
+    assert monitor.estado()["posiciones"] == [] and monitor.estado()["total"]["billetera"] == 1020
+
+
+def test_el_worker_seguidor_aplica_la_cuenta_compartida(monkeypatch):
+    monitor = MonitorExposicion()
+    monkeypatch.setattr(app, "exposicion", monitor)
+    assert not app.liderazgo.es_lider
+
+    app.gestor.almacen.guardar_cuenta(actualizacion("SOLUSDT", -3, 150.0, 5000))
+    app.sincronizar_cuenta()
+
+    estado = monitor.estado()
+    assert estado["total"]["billetera"] == 5000
+    assert [(p["symbol"], p["side"], p["qty"]) for p in estado["posiciones"]] == [("SOLUSDT", "SHORT", -3.0)]
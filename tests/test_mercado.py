@@ -0,0 +1,40 @@
+import pytest
+
+from mercado import GUARDIA_DESACTIVADA, GUARDIA_RECHAZAR, GUARDIA_REPRECIAR, GuardiaEntrada
+
+
+class MercadoFijo:
+    def __init__(self, precios):
+        self.precios = precios
+
+    def precio_referencia(self, symbol):
+        return self.precios.get(symbol)
+
+
+@pytest.fixture
+def mercado():
+    return MercadoFijo({"BTCUSDT": 65000.0})
+
+
+def test_por_defecto_solo_avisa(mercado, monkeypatch, caplog):
+    monkeypatch.delenv("GUARDIA_ENTRADA", raising=False)
+    guardia = GuardiaEntrada(mercado)
+
+    assert guardia.evaluar("BTCUSDT", "BUY", 66000.0) == (66000.0, None)
+    assert "desviado" in caplog.text
+
+
+def test_rechazar_y_repreciar_son_opcionales(mercado):
+    entry, error = GuardiaEntrada(mercado, modo=GUARDIA_RECHAZAR).evaluar("BTCUSDT", "BUY", 66000.0)
+    assert entry == 66000.0 and "desviado" in error
+
+    assert GuardiaEntrada(mercado, modo=GUARDIA_REPRECIAR).evaluar("BTCUSDT", "BUY", 66000.0) == (65000.0, None)
+    assert GuardiaEntrada(mercado, modo=GUARDIA_DESACTIVADA).evaluar("BTCUSDT", "BUY", 66000.0) == (66000.0, None)
+
+
+@pytest.mark.parametrize("modo", [GUARDIA_RECHAZAR, GUARDIA_REPRECIAR])
+def test_dentro_del_desvio_o_sin_datos_pasa_igual(mercado, modo):
+    guardia = GuardiaEntrada(mercado, max_desvio=0.005, modo=modo)
+
+    assert guardia.evaluar("BTCUSDT", "BUY", 65300.0) == (65300.0, None)
+    assert guardia.evaluar("ETHUSDT", "BUY", 3200.0) == (3200.0, None)
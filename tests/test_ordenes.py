@@ -0,0 +1,59 @@
+import pytest
+
+import app
+
+
+@pytest.fixture(autouse=True)
+def sin_espera(monkeypatch):
+    monkeypatch.setattr(app, "espera_reintento", lambda intento: 0)
+
+
+def colocar(exchange, symbol, client_order_id=None):
+    precio = exchange.precios[symbol]
+    return app.colocar_orden_stop_limit(symbol, "BUY", 1, precio + 5, precio + 6, client_order_id=client_order_id)
+
+
+def con_id(exchange, symbol, client_order_id):
+    return [o for o in exchange.ordenes(symbol) if o["clientOrderId"] == client_order_id]
+
+
+def llamadas_desde(exchange, inicio):
+    # Solo las de órdenes (los filtros se cargan con la primera)
+    return [metodo for metodo, _ in list(exchange.llamadas)[inicio:] if metodo in ("new_order", "query_order")]
+
+
+@pytest.mark.parametrize("codigo", [-1007, -1001])
+def test_respuesta_perdida_se_recupera_por_client_order_id(exchange, codigo):
+    cliente = f"idem_perdida{codigo}"
+    exchange.perder_respuesta("new_order", codigo, "Timeout waiting for response from backend server.")
+    inicio = len(exchange.llamadas)
+
+    order_id = colocar(exchange, "SOLUSDT", cliente)
+
+    # La orden llegó a Binance en el primer intento: el reintento la encuentra y no la reenvía
+    [orden] = con_id(exchange, "SOLUSDT", cliente)
+    assert order_id == orden["orderId"]
+    assert llamadas_desde(exchange, inicio) == ["new_order", "query_order"]
+
+
+def test_error_antes_de_procesar_se_reenvia_una_sola_vez(exchange):
+    cliente = "idem_no_llego"
+    exchange.inyectar_error("new_order", -1001)
+    inicio = len(exchange.llamadas)
+
+    order_id = colocar(exchange, "SOLUSDT", cliente)
+
+    [orden] = con_id(exchange, "SOLUSDT", cliente)
+    assert order_id == orden["orderId"]
+    assert llamadas_desde(exchange, inicio) == ["new_order", "query_order", "new_order"]
+
+
+def test_sin_client_order_id_no_se_reintenta_a_ciegas(exchange):
+    exchange.perder_respuesta("new_order", -1007, "Timeout waiting for response from backend server.")
+    antes = len(exchange.ordenes("SOLUSDT"))
+    inicio = len(exchange.llamadas)
+
+    assert colocar(exchange, "SOLUSDT") is None
+
+    assert llamadas_desde(exchange, inicio) == ["new_order"]
+    assert len(exchange.ordenes("SOLUSDT")) == antes + 1
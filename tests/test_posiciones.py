@@ -0,0 +1,78 @@
+from persistencia import AlmacenEstado
+from posiciones import GestorPosiciones, PENDIENTE_ENTRADA, EJECUTADA, PROTEGIDA, CERRADA, CANCELADA
+
+
+def abrir(gestor, symbol, order_id):
+    return gestor.abrir(symbol, order_id=order_id, side="BUY", qty=1.0, sl_distance=10, tp_factor=2)
+
+
+def test_filas_viejas_propias_no_reviven_una_posicion_cerrada(tmp_path):
+    gestor = GestorPosiciones(AlmacenEstado(str(tmp_path / "estado.db")))
+    anterior = abrir(gestor, "ETHUSDT", 1)
+    gestor.transicion(anterior, PENDIENTE_ENTRADA, EJECUTADA)
+    gestor.transicion(anterior, EJECUTADA, PROTEGIDA)
+    gestor.transicion(anterior, PROTEGIDA, CERRADA)
+    nueva = abrir(gestor, "ETHUSDT", 2)
+
+    gestor.sincronizar()
+
+    assert gestor.obtener("ETHUSDT") is nueva
+    assert [p.order_id for p in gestor.activas()] == [2]
+
+
+def test_otro_worker_no_revive_posiciones_cerradas_o_canceladas(tmp_path):
+    ruta = str(tmp_path / "estado.db")
+    lider = GestorPosiciones(AlmacenEstado(ruta))
+    seguidor = GestorPosiciones(AlmacenEstado(ruta))
+
+    cerrada = abrir(lider, "ETHUSDT", 1)
+    lider.transicion(cerrada, PENDIENTE_ENTRADA, EJECUTADA)
+    lider.transicion(cerrada, EJECUTADA, CERRADA)
+    cancelada = abrir(lider, "BTCUSDT", 2)
+    lider.transicion(cancelada, PENDIENTE_ENTRADA, CANCELADA)
+    abierta = abrir(lider, "SOLUSDT", 3)
+
+    assert seguidor.sincronizar()
+    assert [(p.symbol, p.order_id, p.estado) for p in seguidor.activas()] == [("SOLUSDT", 3, PENDIENTE_ENTRADA)]
+    assert abierta.estado == PENDIENTE_ENTRADA
+
+
+def test_fila_leida_antes_de_un_actualizar_no_revierte_el_sl(tmp_path):
+    gestor = GestorPosiciones(AlmacenEstado(str(tmp_path / "estado.db")))
+    posicion = abrir(gestor, "ETHUSDT", 1)
+    gestor.transicion(posicion, PENDIENTE_ENTRADA, EJECUTADA)
+    gestor.transicion(posicion, EJECUTADA, PROTEGIDA, sl_order_id=10, sl_precio=3180.0)
+
+    # El stop se mueve mientras sincronizar ya leyó las filas anteriores del almacén
+    leer = gestor.almacen.cambios_desde
+
+    def leer_y_mover_stop(ultimo_id):
+        filas = leer(ultimo_id)
+        gestor.actualizar(posicion, sl_order_id=11, sl_precio=3200.0)
+        return filas
+
+    gestor.almacen.cambios_desde = leer_y_mover_stop
+    assert gestor.sincronizar()
+    gestor.almacen.cambios_desde = leer
+
+    assert (posicion.estado, posicion.sl_order_id, posicion.sl_precio) == (PROTEGIDA, 11, 3200.0)
+    gestor.sincronizar()
+    assert (posicion.estado, posicion.sl_order_id, posicion.sl_precio) == (PROTEGIDA, 11, 3200.0)
+
+
+def test_el_cambio_de_otro_worker_si_se_aplica(tmp_path):
+    ruta = str(tmp_path / "estado.db")
+    lider = GestorPosiciones(AlmacenEstado(ruta))
+    seguidor = GestorPosiciones(AlmacenEstado(ruta))
+    posicion = abrir(lider, "ETHUSDT", 1)
+    lider.transicion(posicion, PENDIENTE_ENTRADA, EJECUTADA)
+    lider.transicion(posicion, EJECUTADA, PROTEGIDA, sl_order_id=10)
+    seguidor.sincronizar()
+    copia = seguidor.obtener("ETHUSDT")
+
+    lider.actualizar(posicion, sl_order_id=11)
+    seguidor.sincronizar()
+
+    assert seguidor.obtener("ETHUSDT") is copia
+    assert (copia.estado, copia.sl_order_id) == (PROTEGIDA, 11)
+    assert "version" not in posicion.a_dict()
@@ -0,0 +1,67 @@
+import time
+
+import app
+from posiciones import CERRADA, PENDIENTE_ENTRADA
+
+
+def abrir_long(sim, symbol, cantidad):
+    return sim.new_order(symbol=symbol, side="BUY", type="MARKET", quantity=str(cantidad))
+
+
+def abiertas(sim, symbol):
+    return [o for o in sim.ordenes(symbol) if o["status"] == "NEW"]
+
+
+def test_batch_completo_coloca_sl_y_tp(exchange):
+    precio = exchange.precios["BTCUSDT"]
+    abrir_long(exchange, "BTCUSDT", 0.01)
+
+    sl, tps = app.colocar_proteccion("BTCUSDT", "SELL", precio - 500, [(0.01, precio + 1000)])
+
+    assert sl["type"] == "STOP_MARKET" and sl["closePosition"]
+    assert len(tps) == 1 and tps[0]["type"] == "LIMIT" and tps[0]["reduceOnly"]
+    assert {o["orderId"] for o in abiertas(exchange, "BTCUSDT")} == {sl["orderId"], tps[0]["orderId"]}
+
+
+def test_tp_rechazado_en_el_batch_se_reintenta_solo(exchange):
+    precio = exchange.precios["ETHUSDT"]
+    abrir_long(exchange, "ETHUSDT", 1.0)
+    exchange.inyectar_error("new_batch_order[1]", -1008, "Server is currently overloaded with other requests.")
+
+    sl, tps = app.colocar_proteccion("ETHUSDT", "SELL", precio - 30, [(1.0, precio + 60)])
+
+    assert tps[0] is not None and tps[0]["price"] == f"{float(app.filtros.ajustar_precio('ETHUSDT', precio + 60))}"
+    # El SL del batch quedó y el TP vino del reintento individual
+    assert [m for m, _ in exchange.llamadas][-2:] == ["new_batch_order", "new_order"]
+    assert {o["orderId"] for o in abiertas(exchange, "ETHUSDT")} == {sl["orderId"], tps[0]["orderId"]}
+
+
+def test_tp_rechazado_dos_veces_queda_solo_el_sl(exchange):
+    precio = exchange.precios["ETHUSDT"]
+    abrir_long(exchange, "ETHUSDT", 1.0)
+    exchange.inyectar_error("new_batch_order[1]", -4164, "Order's notional must be no smaller than 5.")
+    exchange.inyectar_error("new_order", -4164, "Order's notional must be no smaller than 5.")
+
+    sl, tps = app.colocar_proteccion("ETHUSDT", "SELL", precio - 30, [(1.0, precio + 60)])
+
+    assert tps == [None]
+    assert [o["orderId"] for o in abiertas(exchange, "ETHUSDT")] == [sl["orderId"]]
+
+
+def test_sl_rechazado_cierra_la_posicion_de_emergencia(exchange):
+    entrada = abrir_long(exchange, "SOLUSDT", 2)
+    posicion = app.gestor.abrir(
+        "SOLUSDT", order_id=entrada["orderId"], side="BUY", qty=2.0, sl_distance=3, tp_factor=2,
+        timestamp_inicio=int(time.time() * 1000),
+    )
+    assert posicion.estado == PENDIENTE_ENTRADA
+    exchange.inyectar_error("new_batch_order[0]", -2021, "Order would immediately trigger.")
+    exchange.inyectar_error("new_order", -2021, "Order would immediately trigger.")
+
+    app.procesar_entrada_ejecutada(posicion, entrada)
+
+    assert posicion.estado == CERRADA
+    assert app.gestor.obtener("SOLUSDT") is None
+    assert float(exchange.get_position_risk(symbol="SOLUSDT")[0]["positionAmt"]) == 0
+    # El TP que sí entró en el batch se canceló junto con el cierre
+    assert abiertas(exchange, "SOLUSDT") == []
@@ -0,0 +1,103 @@
+import time
+
+from riesgo import LimitesRiesgo, MotorRiesgo, _dia
+
+BALANCE = 1000.0
+
+
+def motor(**limites):
+    # Sin tope de nocional ni de apalancamiento salvo que el test los pida: solo cuenta el riesgo
+    base = dict(riesgo_abierto_pct=0.0, riesgo_grupo_pct=0.0, nocional_max_x=0.0, perdida_diaria_pct=0.0,
+                posiciones_max=0, apalancamiento_max=0)
+    base.update(limites)
+    return MotorRiesgo(LimitesRiesgo(**base))
+
+
+def abrir(m, symbol, qty, sl_distance, entry=100.0, ahora_ms=None):
+    decision = m.reservar(symbol, qty, entry, sl_distance, BALANCE, ahora_ms=ahora_ms)
+    if decision.qty:
+        m.confirmar(symbol)
+    return decision
+
+
+def test_corte_por_perdida_diaria():
+    m = motor(perdida_diaria_pct=5.0)
+    assert abrir(m, "BTCUSDT", 1, 10).qty == 1
+    m.registrar_pnl(-49.0)
+    assert m.verificar("ETHUSDT") is None
+
+    m.registrar_pnl(-1.0)
+
+    assert m.verificar("ETHUSDT") == "perdida_diaria"
+    assert m.reservar("ETHUSDT", 1, 100.0, 10, BALANCE) == (0.0, 0.0, "perdida_diaria")
+
+
+def test_el_dia_nuevo_levanta_el_corte():
+    m = motor(perdida_diaria_pct=5.0)
+    ahora = int(time.time() * 1000)
+    hoy, manana_ms = _dia(ahora)
+    abrir(m, "BTCUSDT", 1, 10, ahora_ms=ahora)
+    m.registrar_pnl(-80.0, ts_ms=ahora)
+    assert m.reservar("ETHUSDT", 1, 100.0, 10, BALANCE, ahora_ms=ahora).motivo == "perdida_diaria"
+
+    decision = abrir(m, "ETHUSDT", 1, 10, ahora_ms=manana_ms)
+
+    assert decision.qty == 1 and decision.motivo is None
+    estado = m.estado()
+    assert estado["dia"] == _dia(manana_ms)[0] != hoy
+    assert estado["pnl_dia"] == 0
+    # Las posiciones abiertas del día anterior siguen contando
+    assert estado["riesgo_abierto"] == 20
+
+
+def test_tope_de_riesgo_abierto_achica_y_rechaza():
+    m = motor(riesgo_abierto_pct=6.0)
+    assert abrir(m, "BTCUSDT", 1, 40).qty == 1
+
+    decision = abrir(m, "ETHUSDT", 1, 40)
+    assert (decision.qty, decision.escala, decision.motivo) == (0.5, 0.5, "riesgo_abierto")
+    assert m.estado()["riesgo_abierto"] == 60
+
+    # Sin margen: debajo de la escala mínima se rechaza y no reserva nada
+    assert abrir(m, "SOLUSDT", 1, 40) == (0.0, 0.0, "riesgo_abierto")
+    assert m.estado()["posiciones"] == 2
+
+
+def test_tope_por_grupo_solo_afecta_a_los_correlacionados():
+    m = motor(riesgo_grupo_pct=3.0, grupos={"BTCUSDT": "mayores", "ETHUSDT": "mayores"})
+    assert abrir(m, "BTCUSDT", 1, 20).qty == 1
+
+    eth = abrir(m, "ETHUSDT", 1, 20)
+    sol = abrir(m, "SOLUSDT", 1, 20)
+
+    assert (eth.qty, eth.motivo) == (0.5, "riesgo_grupo:mayores")
+    assert (sol.qty, sol.motivo) == (1, None)
+    assert m.estado()["riesgo_por_grupo"] == {"mayores": 30}
+    assert m.estado()["riesgo_abierto"] == 50
+
+
+def test_reserva_liberada_devuelve_el_margen():
+    m = motor(riesgo_abierto_pct=6.0, posiciones_max=1)
+    assert m.reservar("BTCUSDT", 1, 100.0, 40, BALANCE).qty == 1
+    # Mientras la reserva está en curso no entra otra señal del símbolo ni de otro
+    assert m.reservar("BTCUSDT", 1, 100.0, 40, BALANCE).motivo == "senal_en_curso"
+    assert m.verificar("ETHUSDT") == "posiciones_max"
+
+    m.liberar("BTCUSDT")
+
+    assert m.estado()["riesgo_abierto"] == 0 and m.estado()["posiciones"] == 0
+    assert abrir(m, "ETHUSDT", 1, 40).qty == 1
+
+
+def test_liberar_un_reemplazo_restituye_la_posicion_previa():
+    m = motor(riesgo_abierto_pct=6.0)
+    abrir(m, "BTCUSDT", 1, 40)
+
+    # La señal nueva del mismo símbolo reemplaza a la entrada previa: puede usar su margen
+    assert m.reservar("BTCUSDT", 1.5, 100.0, 40, BALANCE).qty == 1.5
+    assert m.estado()["riesgo_abierto"] == 60
+
+    m.liberar("BTCUSDT")
+
+    assert m.estado()["riesgo_abierto"] == 40
+    assert m.estado()["posiciones"] == 1
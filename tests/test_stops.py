@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+import app
+from posiciones import PROTEGIDA
+
+
+def esperar(condicion, timeout=5):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def stops(monkeypatch, exchange):
+    # Break-even y trailing vienen apagados por defecto: se activan solo para estos tests
+    monkeypatch.setattr(app.stops, "breakeven_r", 1.0)
+    monkeypatch.setattr(app.stops, "trailing_r", 0.0)
+    monkeypatch.setattr(app.stops, "intervalo_ms", 0)
+    return app.stops
+
+
+def protegida(exchange, symbol, qty, sl_distance):
+    entrada = exchange.new_order(symbol=symbol, side="BUY", type="MARKET", quantity=str(qty))
+    posicion = app.gestor.abrir(
+        symbol, order_id=entrada["orderId"], side="BUY", qty=qty, sl_distance=sl_distance, tp_factor=3,
+        timestamp_inicio=int(time.time() * 1000),
+    )
+    app.procesar_entrada_ejecutada(posicion, entrada)
+    assert posicion.estado == PROTEGIDA
+    return posicion
+
+
+def stops_vivos(exchange, symbol):
+    return [o for o in exchange.ordenes(symbol) if o["status"] == "NEW" and o["type"] == "STOP_MARKET"]
+
+
+def marcar(exchange, stops, symbol, precio):
+    exchange.mover_precio(symbol, precio)
+    stops.on_mark(symbol, precio)
+
+
+def test_break_even_reemplaza_el_sl_por_uno_sobre_la_entrada(exchange, stops):
+    posicion = protegida(exchange, "BTCUSDT", 0.01, 500)
+    entrada, sl_original = posicion.precio_entrada, posicion.sl_order_id
+
+    marcar(exchange, stops, "BTCUSDT", entrada + 300)
+    time.sleep(0.1)
+    assert posicion.sl_order_id == sl_original
+
+    marcar(exchange, stops, "BTCUSDT", entrada + 500)
+
+    breakeven = round(entrada + 2 * 0.1, 1)
+    assert esperar(lambda: posicion.sl_precio == breakeven)
+    assert exchange.orden(sl_original)["status"] == "CANCELED"
+    [vivo] = stops_vivos(exchange, "BTCUSDT")
+    assert vivo["orderId"] == posicion.sl_order_id and float(vivo["stopPrice"]) == breakeven
+    assert vivo["reduceOnly"] and float(vivo["origQty"]) == 0.01
+
+
+def test_trailing_sigue_al_mejor_precio_y_no_retrocede(exchange, stops, monkeypatch):
+    monkeypatch.setattr(stops, "breakeven_r", 0.0)
+    monkeypatch.setattr(stops, "trailing_r", 1.0)
+    monkeypatch.setattr(stops, "distancia_r", 1.0)
+    posicion = protegida(exchange, "BTCUSDT", 0.01, 500)
+    entrada = posicion.precio_entrada
+
+    marcar(exchange, stops, "BTCUSDT", entrada + 600)
+    assert esperar(lambda: posicion.sl_precio == entrada + 100)
+    marcar(exchange, stops, "BTCUSDT", entrada + 900)
+    assert esperar(lambda: posicion.sl_precio == entrada + 400)
+
+    # El precio vuelve: el SL queda donde estaba
+    marcar(exchange, stops, "BTCUSDT", entrada + 700)
+    time.sleep(0.1)
+    assert posicion.sl_precio == entrada + 400
+    assert [float(o["stopPrice"]) for o in stops_vivos(exchange, "BTCUSDT")] == [entrada + 400]
+
+    # Y si toca el SL movido, la salida queda en ganancia
+    exchange.mover_precio("BTCUSDT", entrada + 390)
+    assert float(exchange.get_position_risk(symbol="BTCUSDT")[0]["positionAmt"]) == 0
+
+
+def test_si_no_se_cancela_el_sl_anterior_se_cancela_el_nuevo(exchange, stops):
+    posicion = protegida(exchange, "BTCUSDT", 0.01, 500)
+    sl_original, sl_precio = posicion.sl_order_id, posicion.sl_precio
+    exchange.mover_precio("BTCUSDT", posicion.precio_entrada + 600)
+    # Binance no responde al cancel del SL anterior (las órdenes no se reintentan)
+    exchange.inyectar_error("cancel_order", -1001)
+
+    assert app.reemplazar_stop("BTCUSDT", posicion.precio_entrada) is False
+
+    # Sigue solo el SL original, y el gestor no se enteró de ningún cambio
+    assert [o["orderId"] for o in stops_vivos(exchange, "BTCUSDT")] == [sl_original]
+    assert (posicion.sl_order_id, posicion.sl_precio) == (sl_original, sl_precio)
@@ -0,0 +1,140 @@
+import json
+import threading
+import time
+
+import pytest
+from websockets.sync.server import serve
+
+from simulador import ExchangeSimulado
+from stream_usuario import StreamUsuario
+
+
+class ServidorStreamLocal:
+    """Websocket local que hace de user-data stream de Binance: anota las suscripciones y empuja eventos."""
+
+    def __init__(self):
+        self.sesiones = []
+        # El cliente de binance-connector no cierra el socket después del CLOSE: no hace falta esperarlo
+        self._servidor = serve(self._atender, "127.0.0.1", 0, close_timeout=0.2)
+        self.url = f"ws://127.0.0.1:{self._servidor.socket.getsockname()[1]}"
+        threading.Thread(target=self._servidor.serve_forever, name="servidor_stream_local", daemon=True).start()
+
+    def _atender(self, conexion):
+        sesion = {"ruta": conexion.request.path, "listen_keys": [], "conexion": conexion, "cerrada": False}
+        self.sesiones.append(sesion)
+        try:
+            for mensaje in conexion:
+                pedido = json.loads(mensaje)
+                if pedido.get("method") == "SUBSCRIBE":
+                    sesion["listen_keys"].extend(pedido["params"])
+                    conexion.send(json.dumps({"result": None, "id": pedido["id"]}))
+        finally:
+            sesion["cerrada"] = True
+
+    def apagar(self):
+        self._servidor.shutdown()
+
+    # === Lo que haría Binance ===
+
+    def suscripto(self):
+        return bool(self.sesiones) and bool(self.sesiones[-1]["listen_keys"])
+
+    def enviar(self, evento):
+        self.sesiones[-1]["conexion"].send(json.dumps(evento))
+
+    def cerrar(self):
+        self.sesiones[-1]["conexion"].close()
+
+
+def esperar(condicion, timeout=5):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def servidor():
+    servidor = ServidorStreamLocal()
+    yield servidor
+    servidor.apagar()
+
+
+@pytest.fixture
+def stream(servidor):
+    exchange = ExchangeSimulado()
+    eventos = {"orden": [], "cuenta": [], "config": [], "reconexion": 0}
+
+    def on_reconexion():
+        eventos["reconexion"] += 1
+
+    s = StreamUsuario(
+        exchange,
+        on_orden=eventos["orden"].append,
+        on_cuenta=eventos["cuenta"].append,
+        on_config=eventos["config"].append,
+        on_reconexion=on_reconexion,
+        stream_url=servidor.url,
+    )
+    s.iniciar()
+    assert esperar(lambda: s.activo and servidor.suscripto())
+    yield s, eventos
+    s.detener()
+
+
+def test_suscribe_con_listen_key_y_reenvia_eventos(stream, servidor):
+    s, eventos = stream
+    assert [(x["ruta"], x["listen_keys"]) for x in servidor.sesiones] == [("/ws", [s.listen_keys.listen_key])]
+
+    servidor.enviar({"e": "ORDER_TRADE_UPDATE", "o": {"i": 1, "X": "FILLED"}})
+    servidor.enviar({"e": "ACCOUNT_UPDATE", "a": {"B": [], "P": []}})
+    servidor.enviar({"e": "ACCOUNT_CONFIG_UPDATE", "ac": {"s": "BTCUSDT", "l": 10}})
+    servidor.enviar({"e": "ACCOUNT_CONFIG_UPDATE", "ai": {"j": True}})
+
+    assert esperar(lambda: eventos["config"])
+    assert eventos["orden"] == [{"i": 1, "X": "FILLED"}]
+    assert eventos["cuenta"] == [{"B": [], "P": []}]
+    assert eventos["config"] == [{"s": "BTCUSDT", "l": 10}]
+
+
+def test_error_en_callback_no_corta_el_stream(stream, servidor):
+    s, eventos = stream
+    s.on_orden = lambda orden: 1 / 0
+    servidor.enviar({"e": "ORDER_TRADE_UPDATE", "o": {"i": 1}})
+    servidor.enviar({"e": "ACCOUNT_UPDATE", "a": {"B": [], "P": []}})
+
+    assert esperar(lambda: eventos["cuenta"])
+    assert s.activo
+    assert len(servidor.sesiones) == 1
+
+
+def test_caida_pasa_a_polling_y_reconecta_con_reconciliacion(stream, servidor):
+    s, eventos = stream
+    anterior = servidor.sesiones[-1]
+
+    servidor.cerrar()
+    assert esperar(lambda: not s.activo)
+    assert esperar(lambda: len(servidor.sesiones) == 2 and servidor.suscripto() and s.activo)
+    assert anterior["cerrada"]
+    assert esperar(lambda: eventos["reconexion"] == 1)
+
+    # La reconexión reutiliza el listenKey vigente (se renueva, no se pide otro)
+    assert servidor.sesiones[-1]["listen_keys"] == anterior["listen_keys"]
+
+    # Y los eventos vuelven a llegar por la conexión nueva
+    servidor.enviar({"e": "ORDER_TRADE_UPDATE", "o": {"i": 2, "X": "NEW"}})
+    assert esperar(lambda: eventos["orden"] == [{"i": 2, "X": "NEW"}])
+
+
+def test_listen_key_expirado_pide_uno_nuevo(stream, servidor):
+    s, eventos = stream
+    exchange = s.listen_keys.client
+    pedidos = lambda: sum(1 for metodo, _ in exchange.llamadas if metodo == "new_listen_key")
+    assert pedidos() == 1
+
+    servidor.enviar({"e": "listenKeyExpired"})
+    assert esperar(lambda: len(servidor.sesiones) == 2 and servidor.suscripto() and s.activo)
+    assert pedidos() == 2
+    assert servidor.sesiones[-1]["listen_keys"] == [s.listen_keys.listen_key]
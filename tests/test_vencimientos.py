@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+import app
+import estrategia
+from conftest import enviar_senal
+from coordinacion import Liderazgo
+from posiciones import CANCELADA, PROTEGIDA
+from temporizador import Temporizador
+
+ESPERA_MS = 300
+
+
+def esperar(condicion, timeout=5):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def operacion(order_id):
+    return next(o for o in app.diario.operaciones(0) if o["order_id"] == order_id)
+
+
+def ms():
+    return int(time.time() * 1000)
+
+
+# === Temporizador ===
+
+def test_temporizador_ejecuta_a_la_hora_y_respeta_reemplazos_y_cancelaciones():
+    temporizador = Temporizador("test")
+    ejecutadas = []
+    listo = threading.Event()
+    registrar = lambda nombre: ejecutadas.append((nombre, ms()))
+
+    inicio = ms()
+    temporizador.programar("a", inicio + 100, registrar, "a")
+    temporizador.programar("b", inicio + 50, registrar, "b")
+    temporizador.programar("b", inicio + 150, registrar, "b reprogramada")
+    temporizador.programar("c", inicio + 80, registrar, "c")
+    temporizador.cancelar("c")
+    temporizador.programar("fin", inicio + 200, listo.set)
+
+    assert listo.wait(2)
+    assert [nombre for nombre, _ in ejecutadas] == ["a", "b reprogramada"]
+    assert ejecutadas[0][1] >= inicio + 100 and ejecutadas[1][1] >= inicio + 150
+    assert temporizador.pendientes() == 0
+    temporizador.detener()
+
+
+# === Vencimiento de la entrada STOP LIMIT ===
+
+@pytest.fixture
+def lider(bot, monkeypatch):
+    # El vencimiento se agenda solo en el líder; el scheduler del monitor no hace falta
+    monkeypatch.setattr(Liderazgo, "es_lider", True)
+    monkeypatch.setattr(app, "asegurar_monitor", lambda: None)
+    monkeypatch.setattr(estrategia, "ESPERA_ENTRADA_MS", ESPERA_MS)
+    return bot
+
+
+@pytest.fixture
+def vencidas(monkeypatch):
+    """orderIds cuya alarma de vencimiento llegó a sonar."""
+    vencidas = []
+    original = app.vencer_entrada
+    monkeypatch.setattr(app, "vencer_entrada", lambda symbol, order_id: (vencidas.append(order_id), original(symbol, order_id)))
+    return vencidas
+
+
+def test_entrada_vencida_se_cancela_en_binance_y_en_el_diario(lider, exchange, vencidas):
+    p0 = exchange.precios["SOLUSDT"]
+    order_id = enviar_senal(lider, "SOLUSDT", "BUY", p0 + 1, 2)["order_id"]
+    posicion = app.gestor.obtener("SOLUSDT")
+
+    # El diario se escribe en el hilo del temporizador, después de la transición
+    assert esperar(lambda: operacion(order_id)["estado"] == "CANCELADA")
+    assert posicion.estado == CANCELADA
+    assert vencidas == [order_id]
+    assert exchange.orden(order_id)["status"] == "CANCELED"
+    assert app.gestor.obtener("SOLUSDT") is None
+
+
+def test_entrada_ejecutada_desarma_el_vencimiento(lider, exchange, vencidas):
+    p0 = exchange.precios["ETHUSDT"]
+    order_id = enviar_senal(lider, "ETHUSDT", "BUY", p0 + 5, 30)["order_id"]
+    exchange.mover_precio("ETHUSDT", p0 + 6)
+    exchange.mover_precio("ETHUSDT", p0 + 4)
+    app.monitor_posiciones(forzar_polling=True)
+    posicion = app.gestor.obtener("ETHUSDT")
+    assert posicion.estado == PROTEGIDA
+
+    time.sleep(2 * ESPERA_MS / 1000)
+
+    assert vencidas == []
+    assert posicion.estado == PROTEGIDA
+
+
+def test_entrada_reemplazada_desarma_su_vencimiento(lider, exchange, vencidas):
+    p0 = exchange.precios["SOLUSDT"]
+
+    primera = enviar_senal(lider, "SOLUSDT", "BUY", p0 + 1, 2)["order_id"]
+    segunda = enviar_senal(lider, "SOLUSDT", "BUY", p0 + 2, 2)["order_id"]
+
+    # Solo vence la entrada vigente: la alarma de la reemplazada ya no está
+    assert esperar(lambda: app.gestor.obtener("SOLUSDT") is None)
+    assert vencidas == [segunda]
+    assert exchange.orden(primera)["status"] == "CANCELED"
+    assert exchange.orden(segunda)["status"] == "CANCELED"